@@ -1,55 +1,304 @@
-from fastapi import APIRouter, HTTPException
-from app.models.consultation import ConsultationRequest, ConsultationResult
-from app.services.ai_service import AIService
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from app.models.consultation import (
+    BatchConsultationRequest,
+    ConsultationRequest,
+    ConsultationResponse,
+    ConsultationResult,
+    StoredConsultationResponse,
+)
+from app.services.ai_service import get_ai_service
+from app.services.cache import request_key
+from app.services.consultation_store import get_consultation_store
+from app.services.consultation_jobs import enqueue_consultation
+from app.services.job_queue import get_job_queue
+from app.services.pdf_report import get_pdf_renderer, iter_file
+from app.services.preview_engine import get_preview_engine
+from app.services.singleflight import SingleFlight
+from app.settings import get_settings
+from contextlib import aclosing
+from typing import Optional, Set
+import hashlib
+import logging
+import os
+import time
 import uuid
+import orjson
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
-ai_service = AIService()
 
-@router.post("/consultation/analyze", response_model=dict)
-async def analyze_consultation(request: ConsultationRequest):
+# Double submits and client retries of an identical profile share one pipeline
+_analyze_flight = SingleFlight("analyze")
+_preview_flight = SingleFlight("preview")
+
+FIELDS_DESCRIPTION = f"Comma-separated result fields to return (default all): {', '.join(ConsultationResult.model_fields)}"
+
+def _parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """Result fields selected by the `fields` query parameter, None for all"""
+    if not fields:
+        return None
+    selected = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = selected - set(ConsultationResult.model_fields)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    # The id is always returned so partial results can be matched up
+    return selected | {"consultation_id"}
+
+def _encode(response: BaseModel, fields: Optional[Set[str]]) -> bytes:
+    """
+    Serialize a response wrapping a ConsultationResult, keeping only the
+    selected result fields. Encoded once by pydantic's serializer instead of
+    FastAPI's generic validate-and-encode pass.
+    """
+    include = None
+    if fields is not None:
+        include = {name: True for name in type(response).model_fields}
+        include["result"] = fields
+    return response.model_dump_json(include=include).encode("utf-8")
+
+def _etag(body: bytes) -> str:
+    # Weak: the body may be re-encoded by the compression middleware
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+@router.post("/consultation/analyze", response_model=ConsultationResponse)
+async def analyze_consultation(
+    request: ConsultationRequest,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
+):
     """
     Analyze user's visa consultation request and generate personalized guidance
     """
-    try:
+    selected = _parse_fields(fields)
+    
+    async def analyze() -> ConsultationResult:
         consultation_id = str(uuid.uuid4())
         
         # Generate AI-powered consultation result
-        result = await ai_service.generate_consultation(request, consultation_id)
+        result = await get_ai_service().generate_consultation(request, consultation_id)
+        
+        # Queued for write-behind; does not wait on disk
+        await get_consultation_store().save(result)
+        return result
+    
+    try:
+        result = await _analyze_flight.do(request_key(request, "analyze"), analyze)
+        
+        response = ConsultationResponse(consultation_id=result.consultation_id, result=result)
+        return Response(content=_encode(response, selected), media_type="application/json")
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+def _sse(event: str, data) -> str:
+    """Format one Server-Sent Event"""
+    if isinstance(data, BaseModel):
+        data = data.model_dump()
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+@router.post("/consultation/stream")
+async def stream_consultation(request: ConsultationRequest):
+    """
+    Stream consultation generation as Server-Sent Events: research, each
+    checklist item, cover-letter text deltas, then the full result
+    """
+    consultation_id = str(uuid.uuid4())
+    
+    async def events():
+        yield _sse("start", {"consultation_id": consultation_id})
+        try:
+            async for event, data in get_ai_service().stream_consultation(request, consultation_id):
+                if event == "cover_letter":
+                    data = {"delta": data}
+                elif event == "result":
+                    await get_consultation_store().save(data)
+                yield _sse(event, data)
+        except Exception as e:
+            logger.exception("Consultation streaming error", extra={"consultation_id": consultation_id})
+            yield _sse("error", {"detail": f"Analysis failed: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _ndjson(data: dict) -> bytes:
+    """Format one newline-delimited JSON record"""
+    return orjson.dumps(data) + b"\n"
+
+@router.post("/consultation/batch")
+async def batch_consultation(batch: BatchConsultationRequest):
+    """
+    Generate consultations for many applicants at once, streamed as NDJSON:
+    a start record with every consultation id, one record per applicant as it
+    finishes (completion order, carrying its index in the request), then a
+    summary. Research and checklists shared by applicants are generated once.
+    """
+    settings = get_settings()
+    if len(batch.applicants) > settings.batch_max_size:
+        raise HTTPException(status_code=422, detail=f"At most {settings.batch_max_size} applicants per batch")
+    
+    applicants = [(str(uuid.uuid4()), request) for request in batch.applicants]
+    
+    async def records():
+        start = time.perf_counter()
+        counts = {"ok": 0, "degraded": 0, "failed": 0}
+        yield _ndjson({
+            "type": "start",
+            "count": len(applicants),
+            "consultation_ids": [consultation_id for consultation_id, _ in applicants]
+        })
+        results = get_ai_service().generate_batch(applicants, settings.batch_concurrency)
+        async with aclosing(results):
+            async for index, consultation_id, result, run, error in results:
+                record = {"type": "item", "index": index, "consultation_id": consultation_id}
+                if error is not None:
+                    record.update(status="failed", error=f"Analysis failed: {str(error)}")
+                else:
+                    await get_consultation_store().save(result)
+                    stages = {name: timing.status for name, timing in run.timings.items()}
+                    # Degraded: a stage fell back to its generic content
+                    status = "ok" if all(stage == "ok" for stage in stages.values()) else "degraded"
+                    record.update(status=status, stages=stages, result=result.model_dump())
+                counts[record["status"]] += 1
+                yield _ndjson(record)
+        yield _ndjson({
+            "type": "summary",
+            "total": len(applicants),
+            **counts,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1)
+        })
+    
+    return StreamingResponse(
+        records(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/consultation/submit")
+async def submit_consultation(request: ConsultationRequest):
+    """
+    Queue consultation generation and return immediately; poll the status endpoint
+    """
+    try:
+        consultation_id = str(uuid.uuid4())
+        
+        await get_consultation_store().save_request(consultation_id, request)
+        job = await enqueue_consultation(consultation_id)
         
         return {
             "success": True,
             "consultation_id": consultation_id,
-            "result": result
+            "job": job.to_dict()
         }
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Submission failed: {str(e)}")
 
-@router.get("/consultation/{consultation_id}")
-async def get_consultation(consultation_id: str):
+@router.get("/consultation/{consultation_id}/status")
+async def get_consultation_status(consultation_id: str):
     """
-    Retrieve consultation results by ID
+    Report the generation status of a consultation
     """
-    # For MVP, this would normally fetch from database
-    # For now, return placeholder
+    job = get_job_queue().get(consultation_id)
+    if job is not None:
+        return {
+            "consultation_id": consultation_id,
+            "status": job.status.value,
+            "job": job.to_dict()
+        }
+    
+    # Jobs are kept in memory only; fall back to what has been stored
+    store = get_consultation_store()
+    if await store.get(consultation_id) is not None:
+        status = "succeeded"
+    elif await store.get_request(consultation_id) is not None:
+        status = "awaiting_payment"
+    else:
+        raise HTTPException(status_code=404, detail="Consultation not found")
+    
     return {
         "consultation_id": consultation_id,
-        "status": "completed",
-        "message": "Consultation results would be stored and retrieved here"
+        "status": status,
+        "job": None
     }
 
+@router.get("/consultation/{consultation_id}", response_model=StoredConsultationResponse)
+async def get_consultation(
+    consultation_id: str,
+    http_request: Request,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)
+):
+    """
+    Retrieve consultation results by ID. Responses carry an ETag; a request
+    with a matching If-None-Match gets an empty 304.
+    """
+    selected = _parse_fields(fields)
+    result = await get_consultation_store().get(consultation_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Consultation not found")
+    
+    body = _encode(StoredConsultationResponse(consultation_id=consultation_id, result=result), selected)
+    # Results are personal: browsers may keep them but must revalidate
+    headers = {"ETag": _etag(body), "Cache-Control": "private, no-cache"}
+    if _etag_matches(http_request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/consultation/{consultation_id}/pdf")
+async def get_consultation_pdf(consultation_id: str):
+    """
+    Download the consultation report as a PDF. Rendered once per template
+    version, then served from disk.
+    """
+    result = await get_consultation_store().get(consultation_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Consultation not found")
+    
+    try:
+        path = await get_pdf_renderer().get_report(result)
+    except Exception as e:
+        logger.exception("PDF rendering error", extra={"consultation_id": consultation_id})
+        raise HTTPException(status_code=500, detail=f"PDF generation failed: {str(e)}")
+    
+    return StreamingResponse(
+        iter_file(path),
+        media_type="application/pdf",
+        headers={
+            "Content-Length": str(os.path.getsize(path)),
+            "Content-Disposition": f'attachment; filename="visa-consultation-{consultation_id}.pdf"'
+        }
+    )
+
 @router.post("/consultation/preview")
 async def preview_consultation(request: ConsultationRequest):
     """
     Generate a preview of consultation without payment
     """
+    async def generate_preview():
+        # Served from the precomputed corridor table, no LLM call
+        preview = get_preview_engine().preview(request)
+        
+        # Keep the profile so the paid consultation can be generated from it
+        consultation_id = str(uuid.uuid4())
+        await get_consultation_store().save_request(consultation_id, request)
+        return consultation_id, preview
+    
     try:
-        # Generate basic preview (limited version)
-        preview = await ai_service.generate_preview(request)
+        consultation_id, preview = await _preview_flight.do(request_key(request, "preview"), generate_preview)
         
         return {
             "success": True,
+            "consultation_id": consultation_id,
             "preview": preview,
             "message": "This is a preview. Full consultation available after payment."
         }
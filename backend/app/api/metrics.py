@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+from app.services.metrics import render_metrics
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics endpoint"""
+    body, content_type = render_metrics()
+    # Passed as a header: content_type already carries the charset, which a
+    # media_type would get a second time
+    return Response(content=body, headers={"Content-Type": content_type})
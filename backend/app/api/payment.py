@@ -1,15 +1,20 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
+import logging
 import stripe
-import os
-from dotenv import load_dotenv
+from app.services.consultation_jobs import enqueue_consultation
+from app.services.consultation_store import get_consultation_store
+from app.services.job_queue import Job, JobPriority
+from app.services.stripe_client import call_stripe
+from app.settings import get_settings
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Configure Stripe
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+# Checkout events that mean the customer has paid; the async variant covers
+# delayed payment methods (bank debits)
+FULFILLMENT_EVENTS = ("checkout.session.completed", "checkout.session.async_payment_succeeded")
 
 class PaymentRequest(BaseModel):
     consultation_id: str
@@ -25,7 +30,8 @@ async def create_checkout_session(payment_request: PaymentRequest):
     Create Stripe checkout session for visa consultation payment
     """
     try:
-        checkout_session = stripe.checkout.Session.create(
+        checkout_session = await call_stripe(
+            stripe.checkout.Session.create,
             payment_method_types=['card'],
             line_items=[
                 {
@@ -41,8 +47,8 @@ async def create_checkout_session(payment_request: PaymentRequest):
                 },
             ],
             mode='payment',
-            success_url=f"{os.getenv('FRONTEND_URL', 'http://localhost:3000')}/success?session_id={{CHECKOUT_SESSION_ID}}&consultation_id={payment_request.consultation_id}",
-            cancel_url=f"{os.getenv('FRONTEND_URL', 'http://localhost:3000')}/cancel",
+            success_url=f"{get_settings().frontend_url}/success?session_id={{CHECKOUT_SESSION_ID}}&consultation_id={payment_request.consultation_id}",
+            cancel_url=f"{get_settings().frontend_url}/cancel",
             customer_email=payment_request.email,
             metadata={
                 'consultation_id': payment_request.consultation_id,
@@ -57,23 +63,40 @@ async def create_checkout_session(payment_request: PaymentRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Payment session creation failed: {str(e)}")
 
+async def fulfill_checkout(session) -> Job:
+    """
+    Queue the paid consultation for a completed checkout session. Idempotent:
+    the webhook, its redeliveries and manual verification share one job.
+    """
+    consultation_id = (session.get("metadata") or {}).get("consultation_id")
+    if not consultation_id:
+        raise ValueError(f"Checkout session {session['id']} has no consultation_id")
+    
+    return await enqueue_consultation(
+        consultation_id,
+        priority=JobPriority.PAID,
+        aliases=[session["id"]]
+    )
+
 @router.post("/payment/verify")
 async def verify_payment(session_id: str):
     """
-    Verify payment completion and trigger consultation generation
+    Verify payment completion and trigger consultation generation. Fulfillment
+    normally happens through the webhook; this is kept for reconciliation.
+    Clients should poll /consultation/{id}/status instead.
     """
     try:
-        session = stripe.checkout.Session.retrieve(session_id)
+        session = await call_stripe(stripe.checkout.Session.retrieve, session_id)
         
         if session.payment_status == 'paid':
-            consultation_id = session.metadata.get('consultation_id')
+            job = await fulfill_checkout(session)
+            consultation_id = job.id
             
-            # Here we would trigger the full consultation generation
-            # For now, return success status
             return {
                 "success": True,
                 "payment_status": "completed",
                 "consultation_id": consultation_id,
+                "job": job.to_dict(),
                 "message": "Payment verified. Generating your personalized consultation..."
             }
         else:
@@ -87,10 +110,43 @@ async def verify_payment(session_id: str):
         raise HTTPException(status_code=500, detail=f"Payment verification failed: {str(e)}")
 
 @router.post("/payment/webhook")
-async def stripe_webhook(request):
+async def stripe_webhook(request: Request):
     """
-    Handle Stripe webhooks for payment events
+    Handle Stripe webhooks for payment events. Paid checkouts are fulfilled
+    here; each event id is processed once however often Stripe redelivers it.
     """
-    # This would handle Stripe webhook events
-    # For MVP, we'll use the verify endpoint instead
+    webhook_secret = get_settings().stripe_webhook_secret
+    if not webhook_secret:
+        # Unverifiable events are refused; Stripe keeps retrying until configured
+        logger.error("Stripe webhook received but STRIPE_WEBHOOK_SECRET is not set")
+        raise HTTPException(status_code=503, detail="Webhook endpoint is not configured")
+    
+    payload = await request.body()
+    try:
+        event = stripe.Webhook.construct_event(
+            payload,
+            request.headers.get("stripe-signature"),
+            webhook_secret
+        )
+    except (ValueError, stripe.error.SignatureVerificationError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid webhook: {str(e)}")
+    
+    store = get_consultation_store()
+    if await store.has_event(event["id"]):
+        return {"received": True, "duplicate": True}
+    
+    if event["type"] in FULFILLMENT_EVENTS:
+        session = event["data"]["object"]
+        # Delayed payment methods complete the session before the money arrives
+        if session.get("payment_status") == "paid":
+            try:
+                job = await fulfill_checkout(session)
+            except Exception as e:
+                # Not recorded, so Stripe's retry gets another chance
+                logger.exception("Checkout fulfillment error", extra={"event_id": event["id"]})
+                raise HTTPException(status_code=500, detail=f"Fulfillment failed: {str(e)}")
+            logger.info("Checkout fulfilled", extra={"event_id": event["id"], "consultation_id": job.id})
+    
+    # Recorded only after handling succeeded
+    await store.record_event(event["id"], event["type"])
     return {"received": True}
\ No newline at end of file
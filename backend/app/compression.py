@@ -0,0 +1,127 @@
+import zlib
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - responses fall back to gzip
+    brotli = None
+
+# Streamed as small events the client must see immediately, or already compressed
+SKIPPED_CONTENT_TYPES = ("text/event-stream", "application/pdf", "image/", "application/zip", "application/gzip")
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        # Sync-flush every streamed chunk so NDJSON records are not held back
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def encode(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.process(data) + (self._compressor.finish() if final else self._compressor.flush())
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q=") and params[2:] in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(coding.strip())
+    return accepted
+
+
+def _compressible(headers: Headers) -> bool:
+    return "content-encoding" not in headers and not headers.get("content-type", "").startswith(SKIPPED_CONTENT_TYPES)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli when the client accepts it and the brotli
+    package is installed, gzip otherwise. Bodies smaller than `minimum_size`,
+    event streams and already-compressed content are sent as is; streamed
+    responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1000, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _negotiate(self, accept_encoding: str) -> Optional[str]:
+        accepted = _accepted_encodings(accept_encoding)
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    @staticmethod
+    def _vary(send: Send) -> Send:
+        # Sent as is, but another client could have been sent it compressed
+        async def send_with_vary(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if _compressible(headers):
+                    headers.add_vary_header("Accept-Encoding")
+            await send(message)
+        return send_with_vary
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, self._vary(send))
+            return
+
+        start_message: Optional[Message] = None
+        encoder = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, encoder
+            if message["type"] == "http.response.start":
+                # Held until the first body chunk shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                initial, start_message = start_message, None
+                headers = MutableHeaders(raw=initial["headers"])
+                compressible = _compressible(headers)
+                if compressible:
+                    headers.add_vary_header("Accept-Encoding")
+                if compressible and (more_body or len(body) >= self.minimum_size):
+                    encoder = _BrotliEncoder(self.brotli_quality) if encoding == "br" else _GzipEncoder(self.gzip_level)
+                    body = encoder.encode(body, final=not more_body)
+                    headers["Content-Encoding"] = encoding
+                    if more_body:
+                        del headers["Content-Length"]
+                    else:
+                        headers["Content-Length"] = str(len(body))
+                    message = {**message, "body": body}
+                await send(initial)
+                await send(message)
+                return
+
+            if encoder is not None:
+                message = {**message, "body": encoder.encode(body, final=not more_body)}
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -1,16 +1,75 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
+from fastapi.responses import ORJSONResponse
 
-from app.api import consultation, payment, health
+from app.settings import get_settings
+from app.logging_config import configure_logging
+from app.compression import CompressionMiddleware
+from app.api import consultation, payment, health, metrics
+from app.services.ai_service import get_ai_service, close_ai_service
+from app.services.llm_client import close_llm_client
+from app.services.consultation_store import get_consultation_store, close_consultation_store
+from app.services.job_queue import get_job_queue, close_job_queue
+from app.services.visa_rules import get_visa_rules, close_visa_rules
+from app.services.pdf_report import get_pdf_renderer, close_pdf_renderer
+from app.services.preview_engine import get_preview_engine, close_preview_engine
+from app.services.stripe_client import close_stripe
+from app.services.prompts import warm_tokenizer
+from app.services.metrics import monitor_event_loop
 
-# Load environment variables
-load_dotenv()
+configure_logging()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs once per worker process. Clients and pools are created here rather
+    # than at import, so workers forked from a preloaded app never share sockets.
+    started = time.perf_counter()
+    await get_consultation_store().start()
+    await get_job_queue().start()
+    await asyncio.to_thread(warm_tokenizer)
+    # LLM client, gateway, router and stage cache, ready before the first request
+    get_ai_service()
+    get_visa_rules().start_refresh(get_settings().visa_rules_refresh_interval)
+    await get_preview_engine().start(get_settings().preview_reload_interval)
+    await get_pdf_renderer().start()
+    loop_monitor = asyncio.create_task(monitor_event_loop())
+    logger.info("Worker started", extra={
+        "pid": os.getpid(),
+        "startup_ms": round((time.perf_counter() - started) * 1000, 1),
+        "event_loop": type(asyncio.get_running_loop()).__module__,
+    })
+    yield
+    loop_monitor.cancel()
+    # Stop workers, flush queued consultation writes and release pooled LLM connections
+    await close_job_queue()
+    await close_preview_engine()
+    await close_visa_rules()
+    await close_pdf_renderer()
+    await close_stripe()
+    await close_consultation_store()
+    await close_ai_service()
+    await close_llm_client()
 
 app = FastAPI(
     title="Visa Guru API",
     description="AI-powered visa consultation service",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
+)
+
+# Compress JSON bodies (full consultations carry the cover letter)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=get_settings().compression_min_size,
+    gzip_level=get_settings().compression_gzip_level,
+    brotli_quality=get_settings().compression_brotli_quality,
 )
 
 # CORS middleware for frontend communication
@@ -26,6 +85,7 @@ app.add_middleware(
 app.include_router(health.router, prefix="/api", tags=["health"])
 app.include_router(consultation.router, prefix="/api", tags=["consultation"])
 app.include_router(payment.router, prefix="/api", tags=["payment"])
+app.include_router(metrics.router, prefix="/api", tags=["metrics"])
 
 @app.get("/")
 async def root():
@@ -47,6 +47,9 @@ class DocumentItem(BaseModel):
     description: str
     notes: Optional[str] = None
 
+class DocumentChecklist(BaseModel):
+    documents: List[DocumentItem]
+
 class ConsultationResult(BaseModel):
     consultation_id: str
     risk_assessment: str
@@ -55,4 +58,18 @@ class ConsultationResult(BaseModel):
     cover_letter: str
     strategic_notes: List[str]
     sources: List[str]
-    estimated_processing_time: str
\ No newline at end of file
+    estimated_processing_time: str
+
+class ConsultationResponse(BaseModel):
+    success: bool = True
+    consultation_id: str
+    result: ConsultationResult
+
+class StoredConsultationResponse(BaseModel):
+    consultation_id: str
+    status: str = "completed"
+    result: ConsultationResult
+
+class BatchConsultationRequest(BaseModel):
+    # Applicants are independent; they typically share a trip (corridor)
+    applicants: List[ConsultationRequest] = Field(..., min_length=1, description="Applicants to consult for")
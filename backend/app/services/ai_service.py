@@ -1,31 +1,214 @@
-import os
+import asyncio
+import logging
+import time
 import openai
-import httpx
-from typing import List, Dict
-from app.models.consultation import ConsultationRequest, ConsultationResult, DocumentItem
-from dotenv import load_dotenv
+from contextlib import AsyncExitStack, aclosing
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
+from dataclasses import dataclass
+from pydantic import TypeAdapter, ValidationError
+from app.models.consultation import ConsultationRequest, ConsultationResult, DocumentItem, DocumentChecklist
+from app.services.llm_client import get_llm_client, LLM_TIMEOUT
+from app.services.llm_gateway import LLMGateway, failure_reason, get_llm_gateway
+from app.services.model_router import ModelRouter, Route, get_model_router
+from app.services.pipeline import Pipeline, PipelineRun, SharedTasks, Stage
+from app.services.cache import ConsultationCache, create_consultation_cache, profile_key, stage_key
+from app.services.visa_rules import get_visa_rules
+from app.services.scoring import get_scoring_model
+from app.services.prompts import (
+    ADDITIONAL_INFO_TOKEN_BUDGET,
+    CHECKLIST_TOOL_NAME,
+    BuiltPrompt,
+    build_checklist_prompt,
+    build_cover_letter_prompt,
+    count_tokens,
+)
+from app.services.metrics import observe_pipeline, record_llm_call, record_route_call, stage_span
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Upper bound for each consultation stage, including any fallbacks the stage
+# method handles itself
+STAGE_TIMEOUTS = {
+    "research": 15.0,
+    "checklist": LLM_TIMEOUT + 10,
+    "cover_letter": LLM_TIMEOUT + 10,
+}
+
+# Request fields research reads: the visa rules corridor. Research is not
+# cached, but a batch still shares one lookup per corridor
+RESEARCH_FIELDS = ("nationality", "residency_status", "current_country", "destination_country", "travel_purpose")
+
+# Kept back from the stage budget when the fallback model takes over, so the
+# fallback call times out on its own before the stage is cancelled
+FALLBACK_BUDGET_MARGIN = 1.0
+
+# Expected completion size per stage, reserved against the tokens-per-minute
+# limit until the call reports actual usage
+COMPLETION_TOKEN_ESTIMATES = {
+    "checklist": 800,
+    "cover_letter": 600,
+}
+
+# Events buffered between the LLM producers and a slow streaming client
+# before producers are made to wait
+STREAM_BUFFER_SIZE = 64
+
+# Function-calling schema mirroring DocumentChecklist / DocumentItem
+CHECKLIST_TOOL = {
+    "type": "function",
+    "function": {
+        "name": CHECKLIST_TOOL_NAME,
+        "description": "Record the applicant's prioritized visa document checklist",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "documents": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string", "description": "Clear document name"},
+                            "priority": {"type": "string", "enum": ["high", "medium", "low"]},
+                            "description": {"type": "string", "description": "Requirements for this applicant's situation"},
+                            "notes": {"type": "string", "description": "Why it matters for their specific case"}
+                        },
+                        "required": ["name", "priority", "description"]
+                    }
+                }
+            },
+            "required": ["documents"]
+        }
+    }
+}
+
+_CHECKLIST_ADAPTER = TypeAdapter(DocumentChecklist)
+
+def _fallback_timeout(stage: str, started: float) -> float:
+    """
+    Time the fallback model may take: what is left of the stage budget since
+    `started` (perf_counter), so it is not cancelled by the stage timeout
+    """
+    remaining = STAGE_TIMEOUTS[stage] - (time.perf_counter() - started) - FALLBACK_BUDGET_MARGIN
+    return min(LLM_TIMEOUT, remaining)
+
+class _ChecklistItemParser:
+    """
+    Incremental parser for streamed checklist arguments
+    ({"documents": [{...}, ...]}): `feed` returns each document as soon as
+    the closing brace of its object arrives
+    """
 
-class AIService:
     def __init__(self):
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        self.client = openai.OpenAI()
+        self._containers: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._item: Optional[List[str]] = None
+
+    def feed(self, text: str) -> List[DocumentItem]:
+        documents = []
+        for char in text:
+            if self._item is not None:
+                self._item.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                # An object directly inside the top-level object's array
+                if char == "{" and self._containers == ["{", "["]:
+                    self._item = [char]
+                self._containers.append(char)
+            elif char in "}]":
+                if self._containers:
+                    self._containers.pop()
+                if char == "}" and self._item is not None and self._containers == ["{", "["]:
+                    documents.append(DocumentItem.model_validate_json("".join(self._item)))
+                    self._item = None
+        return documents
+
+def _checklist_delta(chunk) -> Optional[str]:
+    """Text of a streamed checklist chunk: tool-call arguments, else content"""
+    if not chunk.choices:
+        return None
+    delta = chunk.choices[0].delta
+    if delta.tool_calls:
+        function = delta.tool_calls[0].function
+        return function.arguments if function else None
+    # Some models answer in content despite tool_choice
+    return delta.content
+
+@dataclass
+class ChecklistStats:
+    """
+    Parse outcomes and token usage of checklist LLM calls
+    """
+    calls: int = 0
+    parsed: int = 0
+    parse_failures: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    
+    def record_usage(self, usage) -> None:
+        self.calls += 1
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens
+            self.completion_tokens += usage.completion_tokens
+    
+    @property
+    def parse_success_rate(self) -> float:
+        attempts = self.parsed + self.parse_failures
+        return self.parsed / attempts if attempts else 0.0
+    
+    def to_dict(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "parsed": self.parsed,
+            "parse_failures": self.parse_failures,
+            "parse_success_rate": round(self.parse_success_rate, 4),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_tokens_per_call": round((self.prompt_tokens + self.completion_tokens) / self.calls, 1) if self.calls else 0.0,
+        }
+
+class AIService:
+    def __init__(
+        self,
+        client: Optional[openai.AsyncOpenAI] = None,
+        cache: Optional[ConsultationCache] = None,
+        gateway: Optional[LLMGateway] = None,
+        router: Optional[ModelRouter] = None
+    ):
+        # Shared async client so LLM calls never block the event loop
+        self.client = client or get_llm_client()
+        # Rate limits, adaptive concurrency, retries and circuit breaking
+        self.gateway = gateway or get_llm_gateway()
+        # Model per stage and profile complexity
+        self.router = router or get_model_router()
+        # Per-stage result cache keyed on the normalized applicant profile
+        self.cache = cache or create_consultation_cache()
+        self.checklist_stats = ChecklistStats()
+        # Input token counts of the most recent prompt of each kind
+        self.prompt_tokens: Dict[str, Dict[str, int]] = {}
     
     async def research_visa_requirements(self, request: ConsultationRequest) -> Dict:
         """
-        Use web search to research current visa requirements
+        Look up current visa requirements for the applicant's corridor
         """
-        # Construct search query
-        search_query = f"{request.nationality} citizen {request.residency_status} {request.current_country} visa requirements {request.destination_country} {request.travel_purpose}"
-        
-        # For MVP, we'll use a basic web search approach
-        # In production, this could use Perplexity API or other search APIs
-        
+        # Served from the local rules index; live search only feeds the
+        # index's background refresh, never this request path
         try:
-            # Mock research results for MVP
-            # In real implementation, this would make API calls to search engines
-            research_data = {
+            rules = get_visa_rules()
+            rule = rules.lookup(request)
+            if rule is not None:
+                return rule.to_research(rules.version)
+            
+            # No rule, not even a default: generic guidance
+            return {
                 "visa_required": True,
                 "processing_time": "5-15 business days",
                 "validity": "90 days",
@@ -36,241 +219,683 @@ class AIService:
                     "Consulate general information"
                 ]
             }
-            
-            return research_data
-        except Exception as e:
-            print(f"Research error: {e}")
+        except Exception:
+            logger.exception("Research error")
             return {"error": "Research temporarily unavailable"}
     
     async def generate_document_checklist(self, request: ConsultationRequest, research_data: Dict) -> List[DocumentItem]:
         """
         Generate personalized document checklist using AI
         """
-        prompt = f"""
-        Generate a personalized visa document checklist for:
-        
-        Applicant Profile:
-        - Nationality: {request.nationality}
-        - Dual Citizenship: {request.dual_citizenship or 'None'}
-        - Current Country: {request.current_country}
-        - Residency Status: {request.residency_status}
-        - Destination: {request.destination_country}
-        - Travel Purpose: {request.travel_purpose}
-        - Duration: {request.duration}
-        - Previous Rejections: {request.previous_rejections}
+        cached = await self.cache.get("checklist", request)
+        if cached is not None:
+            return [DocumentItem(**item) for item in cached]
         
-        Additional Context: {request.additional_info or 'None'}
+        route = self.router.route("checklist", request)
+        try:
+            response = await self._complete(
+                route,
+                build_checklist_prompt(request, route.model),
+                tools=[CHECKLIST_TOOL],
+                tool_choice={"type": "function", "function": {"name": CHECKLIST_TOOL_NAME}},
+                temperature=0.3
+            )
+        except Exception as e:
+            logger.warning("Document generation error: %s", e)
+            return self._static_documents(request)
         
-        Based on this profile, generate a prioritized document checklist with:
-        1. HIGH priority (absolutely required)
-        2. MEDIUM priority (strongly recommended)
-        3. LOW priority (helpful but optional)
+        self.checklist_stats.record_usage(response.usage)
         
-        For each document, provide:
-        - Clear name
-        - Specific requirements/notes for this applicant's situation
-        - Why it's important for their specific case
+        documents = self._parse_checklist(response)
+        if documents is None:
+            self.checklist_stats.parse_failures += 1
+            return self._static_documents(request)
         
-        Focus on edge cases and nuances that generic checklists miss.
+        self.checklist_stats.parsed += 1
+        await self.cache.set("checklist", request, [document.model_dump() for document in documents])
+        return documents
+    
+    def _parse_checklist(self, response) -> Optional[List[DocumentItem]]:
+        """
+        Validate the tool-call arguments straight from the JSON string
+        """
+        try:
+            message = response.choices[0].message
+            if message.tool_calls:
+                raw = message.tool_calls[0].function.arguments
+            else:
+                # Some models answer in content despite tool_choice
+                raw = message.content
+            documents = _CHECKLIST_ADAPTER.validate_json(raw).documents
+        except Exception as e:
+            logger.warning("Document checklist parse error: %s", e)
+            return None
+        return documents or None
+    
+    async def stream_document_checklist(self, request: ConsultationRequest, research_data: Dict) -> AsyncIterator[DocumentItem]:
+        """
+        Yield checklist items as the model produces them: each document is
+        parsed once its object in the streamed tool-call arguments is complete.
+        Closing the iterator aborts the upstream LLM request.
         """
+        cached = await self.cache.get("checklist", request)
+        if cached is not None:
+            for item in cached:
+                yield DocumentItem(**item)
+            return
+        
+        route = self.router.route("checklist", request)
+        model = route.model
+        built = build_checklist_prompt(request, model)
+        messages = self._prompt(built)
+        parser = _ChecklistItemParser()
+        documents: List[DocumentItem] = []
+        received = []
+        stream = None
+        outcome = "cancelled"
+        start = time.perf_counter()
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a visa application expert who specializes in complex immigration scenarios. Provide detailed, personalized guidance."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3
+            async with AsyncExitStack() as stack:
+                stream, model = await self._open_stream(
+                    stack,
+                    route,
+                    messages,
+                    built,
+                    start,
+                    tools=[CHECKLIST_TOOL],
+                    tool_choice={"type": "function", "function": {"name": CHECKLIST_TOOL_NAME}},
+                    temperature=0.3
+                )
+                self.checklist_stats.record_usage(None)
+                async for chunk in stream:
+                    text = _checklist_delta(chunk)
+                    if not text:
+                        continue
+                    received.append(text)
+                    for document in parser.feed(text):
+                        documents.append(document)
+                        yield document
+            outcome = "fallback" if model != route.model else "ok"
+        except ValidationError as e:
+            outcome = "error"
+            self.checklist_stats.parse_failures += 1
+            logger.warning("Document checklist parse error: %s", e)
+        except Exception as e:
+            outcome = "error"
+            logger.warning("Document generation error: %s", e)
+        finally:
+            if stream is not None:
+                await stream.response.aclose()
+            duration = time.perf_counter() - start
+            # Streamed responses carry no usage block; count locally
+            record_llm_call(
+                "checklist",
+                model,
+                duration,
+                "ok" if outcome == "fallback" else outcome,
+                built.total_tokens if stream is not None else 0,
+                count_tokens("".join(received), model) if received else 0
             )
-            
-            # Parse the AI response and convert to DocumentItem objects
-            content = response.choices[0].message.content
-            
-            # For MVP, create structured response
-            # In production, this would parse the AI response more sophisticatedly
-            documents = [
-                DocumentItem(
-                    name="Valid Passport",
-                    priority="high",
-                    description=f"Your {request.nationality} passport with at least 6 months validity",
-                    notes="Ensure signature is clear and passport is not damaged"
-                ),
-                DocumentItem(
-                    name="Visa Application Form",
-                    priority="high",
-                    description=f"Complete {request.destination_country} visa application form",
-                    notes="Fill out accurately - any mistakes can cause delays"
-                ),
-                DocumentItem(
-                    name="Passport Photos",
-                    priority="high",
-                    description="Recent passport-sized photographs meeting specific requirements",
-                    notes="Check embassy website for exact photo specifications"
-                ),
-                DocumentItem(
-                    name="Proof of Residency",
-                    priority="high" if request.residency_status != "citizen" else "medium",
-                    description=f"Evidence of your {request.residency_status} status in {request.current_country}",
-                    notes="Green card, visa stamp, or residence permit as applicable"
+            record_route_call(route, model, outcome, duration)
+        
+        if outcome == "error" or not documents:
+            if outcome != "error":
+                self.checklist_stats.parse_failures += 1
+            # Items already sent stay; the generic list fills in the rest
+            for document in self._missing_documents(request, documents):
+                yield document
+            return
+        
+        self.checklist_stats.parsed += 1
+        await self.cache.set("checklist", request, [document.model_dump() for document in documents])
+    
+    def _prompt(self, built: BuiltPrompt) -> List[Dict[str, str]]:
+        """
+        Record the prompt's token counts and return its messages
+        """
+        self.prompt_tokens[built.name] = built.token_counts()
+        if built.additional_info_truncated:
+            logger.info(
+                "Truncated additional_info",
+                extra={"prompt": built.name, "budget_tokens": ADDITIONAL_INFO_TOKEN_BUDGET}
+            )
+        return built.messages
+
+    async def _complete(self, route: Route, built: BuiltPrompt, **kwargs):
+        """
+        Chat completion on the route's model; if the primary model times out
+        the route's fallback model answers instead
+        """
+        messages = self._prompt(built)
+        start = time.perf_counter()
+        outcome = "error"
+        model = route.model
+        try:
+            try:
+                response = await self._call_model(
+                    route.stage,
+                    route.model,
+                    messages,
+                    built,
+                    timeout=route.timeout or LLM_TIMEOUT,
+                    retry_timeouts=route.fallback is None,
+                    **kwargs
+                )
+                outcome = "ok"
+            except Exception as e:
+                fallback_timeout = _fallback_timeout(route.stage, start)
+                if route.fallback is None or failure_reason(e) != "timeout" or fallback_timeout <= 0:
+                    raise
+                logger.warning("Primary model timed out, using fallback", extra={
+                    "stage": route.stage,
+                    "route": route.name,
+                    "model": route.model,
+                    "fallback": route.fallback,
+                    "fallback_timeout_s": round(fallback_timeout, 1)
+                })
+                model = route.fallback
+                response = await self._call_model(
+                    route.stage,
+                    route.fallback,
+                    messages,
+                    built,
+                    timeout=fallback_timeout,
+                    retry_timeouts=False,
+                    **kwargs
+                )
+                outcome = "fallback"
+        finally:
+            record_route_call(route, model, outcome, time.perf_counter() - start)
+        return response
+
+    async def _call_model(
+        self,
+        stage: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        built: BuiltPrompt,
+        timeout: float = LLM_TIMEOUT,
+        retry_timeouts: bool = True,
+        **kwargs
+    ):
+        """
+        One chat completion through the gateway, with latency, token and cost accounting
+        """
+        start = time.perf_counter()
+        try:
+            response = await self.gateway.call(
+                stage,
+                lambda: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    timeout=timeout,
+                    **kwargs
                 ),
-                DocumentItem(
-                    name="Travel Itinerary",
-                    priority="medium",
-                    description="Detailed travel plans including accommodation",
-                    notes="Can be provisional but should show realistic planning"
+                built.total_tokens + COMPLETION_TOKEN_ESTIMATES.get(stage, 0),
+                retry_timeouts=retry_timeouts
+            )
+        except Exception:
+            record_llm_call(stage, model, time.perf_counter() - start, "error")
+            raise
+
+        duration = time.perf_counter() - start
+        usage = response.usage
+        prompt_tokens = usage.prompt_tokens if usage else 0
+        completion_tokens = usage.completion_tokens if usage else 0
+        cost = record_llm_call(stage, model, duration, "ok", prompt_tokens, completion_tokens)
+        logger.info("LLM call", extra={
+            "stage": stage,
+            "model": model,
+            "duration_ms": round(duration * 1000, 1),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": round(cost, 6)
+        })
+        return response
+    
+    async def _open_stream(
+        self,
+        stack: AsyncExitStack,
+        route: Route,
+        messages: List[Dict[str, str]],
+        built: BuiltPrompt,
+        started: float,
+        **kwargs
+    ) -> Tuple[Any, str]:
+        """
+        Open a streamed completion on the route's model, held open by `stack`;
+        returns the stream and the model answering. Only opening the stream
+        can fall back: once output has been sent it cannot switch models.
+        """
+        def open_stream(model: str, timeout: float, retry_timeouts: bool):
+            return self.gateway.stream(
+                route.stage,
+                lambda: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    timeout=timeout,
+                    stream=True,
+                    **kwargs
                 ),
-                DocumentItem(
-                    name="Financial Documentation",
-                    priority="high",
-                    description="Bank statements showing sufficient funds",
-                    notes=f"Show ability to support yourself during {request.duration} stay"
-                )
-            ]
-            
-            return documents
-            
+                built.total_tokens + COMPLETION_TOKEN_ESTIMATES[route.stage],
+                retry_timeouts=retry_timeouts
+            )
+
+        try:
+            stream = await stack.enter_async_context(
+                open_stream(route.model, route.timeout or LLM_TIMEOUT, route.fallback is None)
+            )
+            return stream, route.model
         except Exception as e:
-            print(f"Document generation error: {e}")
-            # Return basic fallback documents
-            return [
-                DocumentItem(
-                    name="Passport",
-                    priority="high",
-                    description="Valid passport with 6+ months validity",
-                    notes="Required for all visa applications"
-                )
-            ]
+            fallback_timeout = _fallback_timeout(route.stage, started)
+            if route.fallback is None or failure_reason(e) != "timeout" or fallback_timeout <= 0:
+                raise
+            logger.warning("Primary model timed out, using fallback", extra={
+                "stage": route.stage,
+                "route": route.name,
+                "model": route.model,
+                "fallback": route.fallback,
+                "fallback_timeout_s": round(fallback_timeout, 1)
+            })
+        stream = await stack.enter_async_context(open_stream(route.fallback, fallback_timeout, False))
+        return stream, route.fallback
     
     async def generate_cover_letter(self, request: ConsultationRequest, research_data: Dict) -> str:
         """
         Generate personalized cover letter using AI
         """
-        prompt = f"""
-        Write a professional visa application cover letter for:
-        
-        Applicant: {request.nationality} citizen
-        Current Status: {request.residency_status} in {request.current_country}
-        Applying for: {request.destination_country} visa
-        Purpose: {request.travel_purpose}
-        Duration: {request.duration}
-        Travel Dates: {request.travel_dates}
-        
-        Key points to address:
-        - Why they want to visit {request.destination_country}
-        - Their ties to {request.current_country} (why they will return)
-        - Their specific situation as a {request.nationality} {request.residency_status}
-        - Financial capability and travel planning
-        
-        Additional context: {request.additional_info or 'Standard application'}
-        Previous rejections: {request.previous_rejections}
-        
-        Write a compelling but honest letter that addresses potential visa officer concerns.
-        Keep it professional, concise (1-2 pages), and specific to their situation.
-        """
+        cached = await self.cache.get("cover_letter", request)
+        if cached is not None:
+            return cached
         
+        route = self.router.route("cover_letter", request)
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an immigration consultant who writes compelling visa application cover letters. Focus on addressing visa officer concerns while highlighting applicant strengths."},
-                    {"role": "user", "content": prompt}
-                ],
+            response = await self._complete(
+                route,
+                build_cover_letter_prompt(request, route.model),
                 temperature=0.4
             )
             
-            return response.choices[0].message.content
+            cover_letter = response.choices[0].message.content
+            await self.cache.set("cover_letter", request, cover_letter)
+            return cover_letter
             
         except Exception as e:
-            print(f"Cover letter generation error: {e}")
-            return f"""
-Dear Visa Officer,
-
-I am writing to apply for a {request.destination_country} visa for {request.travel_purpose} purposes.
-
-[This cover letter could not be generated due to a technical error. Please contact support.]
+            logger.warning("Cover letter generation error: %s", e)
+            return self._fallback_cover_letter(request)
+    
+    async def stream_cover_letter(self, request: ConsultationRequest, research_data: Dict) -> AsyncIterator[str]:
+        """
+        Yield the cover letter as it is generated. Closing the iterator aborts
+        the upstream LLM request.
+        """
+        cached = await self.cache.get("cover_letter", request)
+        if cached is not None:
+            yield cached
+            return
+        
+        route = self.router.route("cover_letter", request)
+        model = route.model
+        built = build_cover_letter_prompt(request, model)
+        messages = self._prompt(built)
+        chunks = []
+        stream = None
+        outcome = "cancelled"
+        start = time.perf_counter()
 
-Sincerely,
-[Applicant Name]
-"""
+        try:
+            async with AsyncExitStack() as stack:
+                stream, model = await self._open_stream(stack, route, messages, built, start, temperature=0.4)
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        chunks.append(delta)
+                        yield delta
+            outcome = "fallback" if model != route.model else "ok"
+        except Exception as e:
+            outcome = "error"
+            logger.warning("Cover letter streaming error: %s", e)
+            if not chunks:
+                yield self._fallback_cover_letter(request)
+            # A partial letter has already been sent; never cache it
+            return
+        finally:
+            if stream is not None:
+                await stream.response.aclose()
+            duration = time.perf_counter() - start
+            # Streamed responses carry no usage block; count locally
+            record_llm_call(
+                "cover_letter",
+                model,
+                duration,
+                "ok" if outcome == "fallback" else outcome,
+                built.total_tokens if stream is not None else 0,
+                count_tokens("".join(chunks), model) if chunks else 0
+            )
+            record_route_call(route, model, outcome, duration)
+        
+        await self.cache.set("cover_letter", request, "".join(chunks))
     
-    async def generate_consultation(self, request: ConsultationRequest, consultation_id: str) -> ConsultationResult:
+    async def stream_consultation(self, request: ConsultationRequest, consultation_id: str) -> AsyncIterator[Tuple[str, Any]]:
         """
-        Generate complete consultation including research, documents, and cover letter
+        Yield (event, data) pairs while the consultation is generated: research
+        first, then checklist items and cover-letter text as the models produce
+        them, and finally the assembled ConsultationResult.
+        
+        Producers write into a bounded queue, so a slow client slows the LLM
+        reads down instead of buffering without limit. Closing the iterator
+        cancels both producers and aborts their upstream requests.
         """
         try:
-            # Step 1: Research visa requirements
-            research_data = await self.research_visa_requirements(request)
-            
-            # Step 2: Generate document checklist
-            documents = await self.generate_document_checklist(request, research_data)
-            
-            # Step 3: Generate cover letter
-            cover_letter = await self.generate_cover_letter(request, research_data)
-            
-            # Step 4: Generate strategic notes
-            strategic_notes = [
-                f"Apply through {request.current_country} consulate to leverage your {request.residency_status} status",
-                f"Emphasize your ties to {request.current_country} in your application",
-                "Submit application at least 2-3 weeks before travel dates",
-                "Ensure all documents are current and properly certified"
-            ]
+            with stage_span("research"):
+                research_data = await asyncio.wait_for(self.research_visa_requirements(request), STAGE_TIMEOUTS["research"])
+        except Exception:
+            logger.exception("Research error")
+            research_data = {"error": "Research temporarily unavailable"}
+        yield "research", research_data
+        
+        queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_BUFFER_SIZE)
+        parts: Dict[str, Any] = {}
+        
+        async def produce_checklist():
+            documents: List[DocumentItem] = []
             
-            # Step 5: Calculate confidence score
-            confidence_score = self._calculate_confidence_score(request, research_data)
+            async def forward():
+                async with aclosing(self.stream_document_checklist(request, research_data)) as items:
+                    async for document in items:
+                        documents.append(document)
+                        await queue.put(("document", document))
             
-            return ConsultationResult(
-                consultation_id=consultation_id,
-                risk_assessment=f"Based on your profile as a {request.nationality} {request.residency_status} in {request.current_country}, your visa application has a good chance of approval if properly documented.",
-                confidence_score=confidence_score,
-                documents_required=documents,
-                cover_letter=cover_letter,
-                strategic_notes=strategic_notes,
-                sources=research_data.get("sources", ["AI-generated guidance"]),
-                estimated_processing_time=research_data.get("processing_time", "7-14 business days")
-            )
+            try:
+                with stage_span("checklist"):
+                    await asyncio.wait_for(forward(), STAGE_TIMEOUTS["checklist"])
+            except Exception as e:
+                logger.warning("Document generation error: %s", e)
+                for document in self._missing_documents(request, documents):
+                    documents.append(document)
+                    await queue.put(("document", document))
+            parts["checklist"] = documents
+        
+        async def produce_cover_letter():
+            chunks = []
+            # aclosing() makes cancellation close the upstream stream right away
+            with stage_span("cover_letter"):
+                async with aclosing(self.stream_cover_letter(request, research_data)) as deltas:
+                    async for delta in deltas:
+                        chunks.append(delta)
+                        await queue.put(("cover_letter", delta))
+            parts["cover_letter"] = "".join(chunks)
+        
+        async def run_producer(producer):
+            try:
+                await producer()
+            finally:
+                # Marks this producer as finished even if it failed
+                await queue.put(None)
+        
+        producers = [
+            asyncio.create_task(run_producer(produce_checklist)),
+            asyncio.create_task(run_producer(produce_cover_letter)),
+        ]
+        try:
+            remaining = len(producers)
+            while remaining:
+                item = await queue.get()
+                if item is None:
+                    remaining -= 1
+                    continue
+                yield item
+            # Surface producer exceptions
+            await asyncio.gather(*producers)
+        finally:
+            for task in producers:
+                task.cancel()
+            await asyncio.gather(*producers, return_exceptions=True)
+        
+        yield "result", self._build_result(
+            request, consultation_id, research_data, parts["checklist"], parts["cover_letter"]
+        )
+    
+    async def generate_consultation(self, request: ConsultationRequest, consultation_id: str) -> ConsultationResult:
+        """
+        Generate complete consultation including research, documents, and cover letter
+        """
+        try:
+            result, _ = await self._run_consultation(request, consultation_id)
+            return result
             
         except Exception as e:
-            print(f"Consultation generation error: {e}")
+            logger.exception("Consultation generation error", extra={"consultation_id": consultation_id})
             raise e
     
-    async def generate_preview(self, request: ConsultationRequest) -> Dict:
+    async def generate_batch(
+        self,
+        applicants: List[Tuple[str, ConsultationRequest]],
+        concurrency: int
+    ) -> AsyncIterator[Tuple[int, str, Optional[ConsultationResult], Optional[PipelineRun], Optional[Exception]]]:
         """
-        Generate a limited preview without full consultation
+        Generate consultations for (consultation_id, request) pairs, yielding
+        (index, consultation_id, result, run, error) as each one finishes.
+        Research, checklists and cover letters are computed once per distinct
+        stage profile in the batch; at most `concurrency` applicant pipelines
+        (so at most that many cover letters) run at a time.
         """
-        return {
-            "sample_documents": [
-                "Valid passport (6+ months validity)",
-                "Visa application form",
-                "Passport photographs",
-                "Proof of residency status",
-                "Financial documentation"
-            ],
-            "estimated_processing": "7-15 business days",
-            "confidence_preview": "Based on your profile, this appears to be a standard application case.",
-            "note": "Full personalized checklist, cover letter, and strategic guidance available with complete consultation."
+        shared = SharedTasks()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def generate(index: int, consultation_id: str, request: ConsultationRequest):
+            async with slots:
+                try:
+                    result, run = await self._run_consultation(request, consultation_id, shared)
+                    return index, consultation_id, result, run, None
+                except Exception as e:
+                    logger.exception("Consultation generation error", extra={"consultation_id": consultation_id})
+                    return index, consultation_id, None, None, e
+
+        pending = {
+            asyncio.ensure_future(generate(index, consultation_id, request))
+            for index, (consultation_id, request) in enumerate(applicants)
         }
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            logger.info("Batch generated", extra={
+                "applicants": len(applicants),
+                "stage_runs": shared.executed,
+                "stage_requests": shared.requested
+            })
+        finally:
+            # Client gone or generator closed early: stop the remaining work
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            await shared.close()
     
-    def _calculate_confidence_score(self, request: ConsultationRequest, research_data: Dict) -> int:
+    async def _run_consultation(
+        self,
+        request: ConsultationRequest,
+        consultation_id: str,
+        shared: Optional[SharedTasks] = None
+    ) -> Tuple[ConsultationResult, PipelineRun]:
+        # Steps 1-3: research first, then checklist and cover letter
+        # concurrently since both only depend on the research data
+        run = await self._consultation_pipeline(request, shared).run()
+        observe_pipeline(run)
+        logger.info(
+            "Consultation generated",
+            extra={"consultation_id": consultation_id, "timings_ms": run.summary()}
+        )
+
+        result = self._build_result(
+            request,
+            consultation_id,
+            run.results["research"],
+            run.results["checklist"],
+            run.results["cover_letter"]
+        )
+        return result, run
+    
+    def _build_result(
+        self,
+        request: ConsultationRequest,
+        consultation_id: str,
+        research_data: Dict,
+        documents: List[DocumentItem],
+        cover_letter: str
+    ) -> ConsultationResult:
         """
-        Calculate confidence score based on applicant profile
+        Assemble the final result from the stage outputs
         """
-        score = 75  # Base score
-        
-        # Adjust based on residency status
-        if request.residency_status == "permanent_resident":
-            score += 10
-        elif request.residency_status == "citizen":
-            score += 15
-        elif request.residency_status == "temporary_worker":
-            score += 5
+        # Step 4: Generate strategic notes
+        strategic_notes = [
+            f"Apply through {request.current_country} consulate to leverage your {request.residency_status} status",
+            f"Emphasize your ties to {request.current_country} in your application",
+            "Submit application at least 2-3 weeks before travel dates",
+            "Ensure all documents are current and properly certified"
+        ]
         
-        # Adjust based on previous rejections
-        if request.previous_rejections:
-            score -= 20
+        # Step 5: Calculate confidence score
+        confidence_score = self._calculate_confidence_score(request, research_data)
         
-        # Adjust based on travel purpose
-        if request.travel_purpose in ["tourism", "business"]:
-            score += 5
-        
-        return max(30, min(95, score))  # Keep score between 30-95
\ No newline at end of file
+        return ConsultationResult(
+            consultation_id=consultation_id,
+            risk_assessment=f"Based on your profile as a {request.nationality} {request.residency_status} in {request.current_country}, your visa application has a good chance of approval if properly documented.",
+            confidence_score=confidence_score,
+            documents_required=documents,
+            cover_letter=cover_letter,
+            strategic_notes=strategic_notes,
+            sources=research_data.get("sources", ["AI-generated guidance"]),
+            estimated_processing_time=research_data.get("processing_time", "7-14 business days")
+        )
+    
+    def _consultation_pipeline(self, request: ConsultationRequest, shared: Optional[SharedTasks] = None) -> Pipeline:
+        """
+        Build the stage graph for a full consultation. With `shared`, stage
+        work is reused by every request with the same stage profile.
+        """
+        def once(key: str, func):
+            if shared is None:
+                return func()
+            # Each stage's profile fields include the research fields, so
+            # equal keys also mean equal research input
+            return shared.run(key, func)
+
+        return Pipeline([
+            Stage(
+                "research",
+                lambda deps: once(profile_key(request, RESEARCH_FIELDS, namespace="research"), lambda: self.research_visa_requirements(request)),
+                timeout=STAGE_TIMEOUTS["research"],
+                fallback=lambda: {"error": "Research temporarily unavailable"}
+            ),
+            Stage(
+                "checklist",
+                lambda deps: once(stage_key("checklist", request), lambda: self.generate_document_checklist(request, deps["research"])),
+                depends_on=("research",),
+                timeout=STAGE_TIMEOUTS["checklist"],
+                fallback=lambda: self._static_documents(request)
+            ),
+            Stage(
+                "cover_letter",
+                lambda deps: once(stage_key("cover_letter", request), lambda: self.generate_cover_letter(request, deps["research"])),
+                depends_on=("research",),
+                timeout=STAGE_TIMEOUTS["cover_letter"],
+                fallback=lambda: self._fallback_cover_letter(request)
+            ),
+        ])
+    
+    def _missing_documents(self, request: ConsultationRequest, sent: List[DocumentItem]) -> List[DocumentItem]:
+        """
+        Generic checklist items not already among `sent`, to complete a
+        streamed checklist that failed part way
+        """
+        names = {document.name.lower() for document in sent}
+        return [document for document in self._static_documents(request) if document.name.lower() not in names]
+    
+    def _static_documents(self, request: ConsultationRequest) -> List[DocumentItem]:
+        """
+        Generic checklist used when the AI checklist cannot be generated or
+        parsed, including when the gateway fails fast with its circuit open
+        """
+        return [
+            DocumentItem(
+                name="Valid Passport",
+                priority="high",
+                description=f"Your {request.nationality} passport with at least 6 months validity",
+                notes="Ensure signature is clear and passport is not damaged"
+            ),
+            DocumentItem(
+                name="Visa Application Form",
+                priority="high",
+                description=f"Complete {request.destination_country} visa application form",
+                notes="Fill out accurately - any mistakes can cause delays"
+            ),
+            DocumentItem(
+                name="Passport Photos",
+                priority="high",
+                description="Recent passport-sized photographs meeting specific requirements",
+                notes="Check embassy website for exact photo specifications"
+            ),
+            DocumentItem(
+                name="Proof of Residency",
+                priority="high" if request.residency_status != "citizen" else "medium",
+                description=f"Evidence of your {request.residency_status} status in {request.current_country}",
+                notes="Green card, visa stamp, or residence permit as applicable"
+            ),
+            DocumentItem(
+                name="Travel Itinerary",
+                priority="medium",
+                description="Detailed travel plans including accommodation",
+                notes="Can be provisional but should show realistic planning"
+            ),
+            DocumentItem(
+                name="Financial Documentation",
+                priority="high",
+                description="Bank statements showing sufficient funds",
+                notes=f"Show ability to support yourself during {request.duration} stay"
+            )
+        ]
+    
+    def _fallback_cover_letter(self, request: ConsultationRequest) -> str:
+        """
+        Placeholder letter used when the AI cover letter cannot be generated
+        """
+        return f"""
+Dear Visa Officer,
+
+I am writing to apply for a {request.destination_country} visa for {request.travel_purpose} purposes.
+
+[This cover letter could not be generated due to a technical error. Please contact support.]
+
+Sincerely,
+[Applicant Name]
+"""
+    
+    def _calculate_confidence_score(self, request: ConsultationRequest, research_data: Dict) -> int:
+        """
+        Calculate confidence score based on applicant profile and corridor history
+        """
+        return get_scoring_model().score(request)
+
+
+_service: Optional[AIService] = None
+
+
+def get_ai_service() -> AIService:
+    """
+    Return the process-wide AIService so every caller shares one cache
+    """
+    global _service
+    if _service is None:
+        _service = AIService()
+    return _service
+
+
+async def close_ai_service() -> None:
+    """
+    Drop the shared service; its LLM client is closed by close_llm_client
+    """
+    global _service
+    _service = None
@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+from app.models.consultation import ConsultationRequest
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when prompts or the cached value shapes change so stale entries are
+# never served after a deploy
+CACHE_VERSION = "3"
+
+# Request fields each stage actually depends on. Anything not listed here
+# (email, travel_dates for the checklist, ...) must not change the cache key.
+# Research is answered from the visa rules index and not cached.
+STAGE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "checklist": (
+        "nationality",
+        "dual_citizenship",
+        "residency_status",
+        "current_country",
+        "destination_country",
+        "travel_purpose",
+        "duration",
+        "previous_rejections",
+        "additional_info",
+    ),
+    "cover_letter": (
+        "nationality",
+        # Escalates the route to the premium model
+        "dual_citizenship",
+        "residency_status",
+        "current_country",
+        "destination_country",
+        "travel_purpose",
+        "duration",
+        "travel_dates",
+        "previous_rejections",
+        "additional_info",
+    ),
+}
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, Enum):
+        value = value.value
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return " ".join(value.split()).lower()
+    return value
+
+
+def profile_key(request: ConsultationRequest, fields: Tuple[str, ...], namespace: str = "") -> str:
+    """
+    Content hash of the normalized subset of `request` given by `fields`
+    """
+    profile = {name: _normalize(getattr(request, name)) for name in fields}
+    payload = json.dumps([CACHE_VERSION, namespace, profile], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def stage_key(stage: str, request: ConsultationRequest) -> str:
+    return profile_key(request, STAGE_FIELDS[stage], namespace=stage)
+
+
+def request_key(request: ConsultationRequest, namespace: str = "") -> str:
+    """Key over every request field, for telling identical submissions apart"""
+    return profile_key(request, tuple(ConsultationRequest.model_fields), namespace=namespace)
+
+
+class CacheBackend:
+    """
+    Key/value store for serialized stage results. Implementations evict by
+    TTL and least-recent use.
+    """
+    # Whether calls touch disk and should be moved off the event loop
+    blocking = False
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryCache(CacheBackend):
+    def __init__(self, max_entries: int = 1024, ttl: float = 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache(CacheBackend):
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl: float = 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS stage_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_stage_cache_accessed ON stage_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM stage_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM stage_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE stage_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stage_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            self._conn.execute("DELETE FROM stage_cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                """
+                DELETE FROM stage_cache WHERE key IN (
+                    SELECT key FROM stage_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM stage_cache")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM stage_cache").fetchone()[0]
+
+
+class ConsultationCache:
+    """
+    Per-stage cache in front of AIService with hit/miss counters
+    """
+
+    def __init__(self, backend: Optional[CacheBackend]):
+        self.backend = backend
+        self.hits: Dict[str, int] = {stage: 0 for stage in STAGE_FIELDS}
+        self.misses: Dict[str, int] = {stage: 0 for stage in STAGE_FIELDS}
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    async def _call(self, func, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    async def get(self, stage: str, request: ConsultationRequest) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        try:
+            raw = await self._call(self.backend.get, stage_key(stage, request))
+        except Exception as e:
+            logger.warning("Cache read error: %s", e, extra={"stage": stage})
+            raw = None
+        if raw is None:
+            self.misses[stage] += 1
+            return None
+        self.hits[stage] += 1
+        return json.loads(raw)
+
+    async def set(self, stage: str, request: ConsultationRequest, value: Any) -> None:
+        if not self.enabled:
+            return
+        try:
+            raw = json.dumps(value, separators=(",", ":"))
+            await self._call(self.backend.set, stage_key(stage, request), raw)
+        except Exception as e:
+            logger.warning("Cache write error: %s", e, extra={"stage": stage})
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        stats = {}
+        for stage in STAGE_FIELDS:
+            hits, misses = self.hits[stage], self.misses[stage]
+            total = hits + misses
+            stats[stage] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+            }
+        return stats
+
+
+def create_consultation_cache() -> ConsultationCache:
+    """
+    Build the cache configured by CONSULTATION_CACHE_* environment variables
+    """
+    settings = get_settings()
+    backend_name = settings.cache_backend
+    ttl = settings.cache_ttl
+    max_entries = settings.cache_size
+
+    if backend_name == "none":
+        return ConsultationCache(None)
+    if backend_name == "sqlite":
+        return ConsultationCache(SQLiteCache(settings.cache_path, max_entries=max_entries, ttl=ttl))
+    if backend_name == "memory":
+        return ConsultationCache(MemoryCache(max_entries=max_entries, ttl=ttl))
+    raise ValueError(f"Unknown CONSULTATION_CACHE_BACKEND '{backend_name}'")
@@ -0,0 +1,38 @@
+from typing import Iterable
+from app.services.ai_service import get_ai_service
+from app.services.consultation_store import get_consultation_store
+from app.services.job_queue import Job, JobPriority, get_job_queue
+
+
+async def run_consultation_job(consultation_id: str) -> None:
+    """
+    Generate and store the consultation for a previously submitted profile
+    """
+    store = get_consultation_store()
+
+    # Retries (or a duplicate trigger) must not regenerate a stored result
+    if await store.get(consultation_id) is not None:
+        return
+
+    request = await store.get_request(consultation_id)
+    if request is None:
+        raise ValueError(f"No consultation request stored for {consultation_id}")
+
+    result = await get_ai_service().generate_consultation(request, consultation_id)
+    await store.save(result)
+
+
+async def enqueue_consultation(
+    consultation_id: str,
+    priority: int = JobPriority.STANDARD,
+    aliases: Iterable[str] = (),
+) -> Job:
+    """
+    Queue consultation generation; idempotent on consultation_id and aliases
+    """
+    return await get_job_queue().enqueue(
+        consultation_id,
+        lambda: run_consultation_job(consultation_id),
+        priority=priority,
+        aliases=aliases,
+    )
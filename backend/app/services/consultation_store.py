@@ -0,0 +1,298 @@
+import asyncio
+import logging
+import time
+import zlib
+from typing import Dict, List, Optional
+import aiosqlite
+from app.models.consultation import ConsultationRequest, ConsultationResult
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of queued results written in a single transaction
+WRITE_BATCH_SIZE = 64
+
+# Backoff between attempts to write a failed batch (e.g. "database is locked")
+WRITE_RETRY_DELAY = 0.1
+WRITE_RETRY_MAX_DELAY = 5.0
+
+# Attempts per write once the store is closing, before giving up
+CLOSE_WRITE_ATTEMPTS = 3
+
+
+def encode_result(result: ConsultationResult) -> bytes:
+    """Compact on-disk payload: compressed JSON of the result"""
+    return zlib.compress(result.model_dump_json().encode("utf-8"))
+
+
+def decode_result(payload: bytes) -> ConsultationResult:
+    return ConsultationResult.model_validate_json(zlib.decompress(payload))
+
+
+class ConsultationRepository:
+    """
+    Storage interface for generated consultations
+    """
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def save(self, result: ConsultationResult) -> None:
+        raise NotImplementedError
+
+    async def get(self, consultation_id: str) -> Optional[ConsultationResult]:
+        raise NotImplementedError
+
+    async def save_request(self, consultation_id: str, request: ConsultationRequest) -> None:
+        """Store the applicant profile a consultation will be generated from"""
+        raise NotImplementedError
+
+    async def get_request(self, consultation_id: str) -> Optional[ConsultationRequest]:
+        raise NotImplementedError
+
+    async def has_event(self, event_id: str) -> bool:
+        """Whether a webhook event has already been processed"""
+        raise NotImplementedError
+
+    async def record_event(self, event_id: str, event_type: str) -> None:
+        """Mark a webhook event as processed so redeliveries are ignored"""
+        raise NotImplementedError
+
+
+class InMemoryConsultationRepository(ConsultationRepository):
+    """
+    Non-persistent repository for local development
+    """
+
+    def __init__(self):
+        self._results: Dict[str, ConsultationResult] = {}
+        self._requests: Dict[str, ConsultationRequest] = {}
+        self._events: Dict[str, str] = {}
+
+    async def save(self, result: ConsultationResult) -> None:
+        self._results[result.consultation_id] = result
+
+    async def get(self, consultation_id: str) -> Optional[ConsultationResult]:
+        return self._results.get(consultation_id)
+
+    async def save_request(self, consultation_id: str, request: ConsultationRequest) -> None:
+        self._requests[consultation_id] = request
+
+    async def get_request(self, consultation_id: str) -> Optional[ConsultationRequest]:
+        return self._requests.get(consultation_id)
+
+    async def has_event(self, event_id: str) -> bool:
+        return event_id in self._events
+
+    async def record_event(self, event_id: str, event_type: str) -> None:
+        self._events[event_id] = event_type
+
+
+class SQLiteConsultationRepository(ConsultationRepository):
+    """
+    SQLite-backed repository with write-behind: `save` only queues the
+    result, and a background task persists queued results in batches. Results
+    that are queued but not yet written are served from memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._pending: Dict[str, ConsultationResult] = {}
+        self._start_lock = asyncio.Lock()
+        self._closing = False
+
+    async def start(self) -> None:
+        async with self._start_lock:
+            if self._conn is not None:
+                return
+            conn = await aiosqlite.connect(self.path)
+            await conn.execute("PRAGMA journal_mode=WAL")
+            await conn.execute("PRAGMA synchronous=NORMAL")
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS consultations (
+                    consultation_id TEXT PRIMARY KEY,
+                    payload BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS consultation_requests (
+                    consultation_id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS processed_events (
+                    event_id TEXT PRIMARY KEY,
+                    event_type TEXT NOT NULL,
+                    processed_at REAL NOT NULL
+                )
+                """
+            )
+            await conn.commit()
+            self._conn = conn
+            self._queue = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._writer())
+
+    async def close(self) -> None:
+        if self._conn is None:
+            return
+        # Drain everything still queued before closing the connection
+        self._closing = True
+        await self._queue.put(None)
+        await self._writer_task
+        if self._pending:
+            # Left over when the writer gave up: one last direct attempt
+            if not await self._write_with_retry(list(self._pending.values())):
+                logger.critical("Consultation results lost at shutdown", extra={"consultation_ids": list(self._pending)})
+        await self._conn.close()
+        self._closing = False
+        self._conn = None
+        self._queue = None
+        self._writer_task = None
+
+    async def save(self, result: ConsultationResult) -> None:
+        await self.start()
+        self._pending[result.consultation_id] = result
+        self._queue.put_nowait(result)
+
+    async def get(self, consultation_id: str) -> Optional[ConsultationResult]:
+        pending = self._pending.get(consultation_id)
+        if pending is not None:
+            return pending
+
+        await self.start()
+        async with self._conn.execute(
+            "SELECT payload FROM consultations WHERE consultation_id = ?", (consultation_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return decode_result(row[0]) if row else None
+
+    async def save_request(self, consultation_id: str, request: ConsultationRequest) -> None:
+        # Written through: the profile must survive a restart before payment
+        await self.start()
+        await self._conn.execute(
+            "INSERT OR REPLACE INTO consultation_requests (consultation_id, payload, created_at) VALUES (?, ?, ?)",
+            (consultation_id, request.model_dump_json(), time.time()),
+        )
+        await self._conn.commit()
+
+    async def get_request(self, consultation_id: str) -> Optional[ConsultationRequest]:
+        await self.start()
+        async with self._conn.execute(
+            "SELECT payload FROM consultation_requests WHERE consultation_id = ?", (consultation_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return ConsultationRequest.model_validate_json(row[0]) if row else None
+
+    async def has_event(self, event_id: str) -> bool:
+        await self.start()
+        async with self._conn.execute(
+            "SELECT 1 FROM processed_events WHERE event_id = ?", (event_id,)
+        ) as cursor:
+            return await cursor.fetchone() is not None
+
+    async def record_event(self, event_id: str, event_type: str) -> None:
+        # Written through, like requests: a redelivery after a restart must
+        # still be recognised
+        await self.start()
+        await self._conn.execute(
+            "INSERT OR IGNORE INTO processed_events (event_id, event_type, processed_at) VALUES (?, ?, ?)",
+            (event_id, event_type, time.time()),
+        )
+        await self._conn.commit()
+
+    async def _writer(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            while len(batch) < WRITE_BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            if None in batch:
+                stopping = True
+                batch = [result for result in batch if result is not None]
+            if batch and not await self._write_with_retry(batch):
+                # Closing; close() writes whatever is still pending
+                return
+
+    async def _write(self, results: List[ConsultationResult]) -> None:
+        now = time.time()
+        rows = [(result.consultation_id, encode_result(result), now) for result in results]
+        await self._conn.executemany(
+            "INSERT OR REPLACE INTO consultations (consultation_id, payload, created_at) VALUES (?, ?, ?)",
+            rows,
+        )
+        await self._conn.commit()
+
+        for result in results:
+            if self._pending.get(result.consultation_id) is result:
+                del self._pending[result.consultation_id]
+
+    async def _write_with_retry(self, results: List[ConsultationResult]) -> bool:
+        """
+        Write results, retrying with backoff until it succeeds. Once the store
+        is closing, gives up after CLOSE_WRITE_ATTEMPTS and returns False.
+        Results stay in the pending map, and readable, until written.
+        """
+        delay = WRITE_RETRY_DELAY
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                await self._write(results)
+                return True
+            except Exception as e:
+                logger.error("Consultation store write error: %s", e, extra={"batch_size": len(results), "attempt": attempt})
+                try:
+                    await self._conn.rollback()
+                except Exception:
+                    pass
+            if self._closing and attempt >= CLOSE_WRITE_ATTEMPTS:
+                return False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, WRITE_RETRY_MAX_DELAY)
+
+
+_store: Optional[ConsultationRepository] = None
+
+
+def create_consultation_store() -> ConsultationRepository:
+    """
+    Build the repository configured by CONSULTATION_STORE / CONSULTATION_DB_PATH
+    """
+    backend_name = get_settings().store_backend
+    if backend_name == "memory":
+        return InMemoryConsultationRepository()
+    if backend_name == "sqlite":
+        return SQLiteConsultationRepository(get_settings().db_path)
+    raise ValueError(f"Unknown CONSULTATION_STORE '{backend_name}'")
+
+
+def get_consultation_store() -> ConsultationRepository:
+    """
+    Return the process-wide consultation repository
+    """
+    global _store
+    if _store is None:
+        _store = create_consultation_store()
+    return _store
+
+
+async def close_consultation_store() -> None:
+    global _store
+    if _store is not None:
+        await _store.close()
+        _store = None
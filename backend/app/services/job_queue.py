@@ -0,0 +1,222 @@
+import asyncio
+import itertools
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from enum import Enum, IntEnum
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    RETRYING = "retrying"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobPriority(IntEnum):
+    # Lower values are picked up first
+    PAID = 0
+    STANDARD = 10
+
+
+@dataclass
+class Job:
+    id: str
+    func: Callable[[], Awaitable[Any]]
+    priority: int = JobPriority.STANDARD
+    status: JobStatus = JobStatus.QUEUED
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status.value,
+            "priority": int(self.priority),
+            "attempts": self.attempts,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    In-process async job queue with a fixed worker pool, priorities and
+    retry with exponential backoff. Enqueueing is idempotent on the job id
+    and any alias keys (e.g. a Stripe session id).
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_attempts: int = 3,
+        backoff_base: float = 2.0,
+        backoff_max: float = 60.0,
+        max_retained: int = 10000,
+    ):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retained = max_retained
+        self._jobs: Dict[str, Job] = {}
+        self._aliases: Dict[str, str] = {}
+        self._counter = itertools.count()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._worker_tasks = []
+        self._retry_tasks = set()
+
+    @property
+    def depth(self) -> int:
+        """Number of jobs waiting for a worker"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    @property
+    def running(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == JobStatus.RUNNING)
+
+    async def start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self) -> None:
+        tasks = self._worker_tasks + list(self._retry_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._retry_tasks.clear()
+        self._queue = None
+
+    def get(self, key: str) -> Optional[Job]:
+        """Look up a job by id or alias"""
+        return self._jobs.get(self._aliases.get(key, key))
+
+    async def enqueue(
+        self,
+        job_id: str,
+        func: Callable[[], Awaitable[Any]],
+        priority: int = JobPriority.STANDARD,
+        aliases: Iterable[str] = (),
+    ) -> Job:
+        """
+        Queue `func` under `job_id`. If a job with the same id or alias is
+        already queued, running or done, that job is returned instead; failed
+        jobs are queued again.
+        """
+        await self.start()
+        aliases = tuple(aliases)
+
+        existing = self.get(job_id)
+        if existing is None:
+            existing = next((self.get(alias) for alias in aliases if self.get(alias)), None)
+        if existing is not None and existing.status != JobStatus.FAILED:
+            for alias in aliases:
+                self._aliases.setdefault(alias, existing.id)
+            # A paid request can upgrade a job that is still waiting
+            if priority < existing.priority and existing.status == JobStatus.QUEUED:
+                existing.priority = priority
+                self._put(existing)
+            return existing
+
+        job = Job(id=job_id, func=func, priority=priority)
+        self._jobs[job_id] = job
+        for alias in aliases:
+            self._aliases[alias] = job_id
+        self._prune()
+        self._put(job)
+        return job
+
+    def _put(self, job: Job) -> None:
+        self._queue.put_nowait((job.priority, next(self._counter), job.id))
+
+    def _prune(self) -> None:
+        if len(self._jobs) <= self.max_retained:
+            return
+        finished = [
+            job for job in self._jobs.values()
+            if job.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+        ]
+        finished.sort(key=lambda job: job.finished_at or 0)
+        for job in finished[: len(self._jobs) - self.max_retained]:
+            del self._jobs[job.id]
+        live = set(self._jobs)
+        self._aliases = {alias: job_id for alias, job_id in self._aliases.items() if job_id in live}
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _retry_later(self, job: Job, delay: float) -> None:
+        await asyncio.sleep(delay)
+        job.status = JobStatus.QUEUED
+        self._put(job)
+
+    async def _worker(self) -> None:
+        while True:
+            priority, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            # Skip stale entries left behind by a priority upgrade
+            if job is None or job.status != JobStatus.QUEUED or priority != job.priority:
+                continue
+
+            job.status = JobStatus.RUNNING
+            job.attempts += 1
+            job.started_at = time.time()
+            try:
+                await job.func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.error = str(e)
+                if job.attempts < self.max_attempts:
+                    job.status = JobStatus.RETRYING
+                    logger.warning("Job failed, retrying: %s", e, extra={"job_id": job.id, "attempts": job.attempts})
+                    task = asyncio.create_task(self._retry_later(job, self._backoff(job.attempts)))
+                    self._retry_tasks.add(task)
+                    task.add_done_callback(self._retry_tasks.discard)
+                else:
+                    job.status = JobStatus.FAILED
+                    job.finished_at = time.time()
+                    logger.error("Job failed permanently: %s", e, extra={"job_id": job.id, "attempts": job.attempts})
+            else:
+                job.status = JobStatus.SUCCEEDED
+                job.error = None
+                job.finished_at = time.time()
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """
+    Return the process-wide job queue. JOB_WORKERS caps how many consultations
+    (and therefore LLM pipelines) run at once.
+    """
+    global _queue
+    if _queue is None:
+        _queue = JobQueue(
+            workers=get_settings().job_workers,
+            max_attempts=get_settings().job_max_attempts,
+        )
+    return _queue
+
+
+async def close_job_queue() -> None:
+    global _queue
+    if _queue is not None:
+        await _queue.close()
+        _queue = None
@@ -0,0 +1,58 @@
+import httpx
+import openai
+from typing import Optional
+from app.settings import get_settings
+
+# Per-call timeout for LLM requests (seconds). GPT-4 completions for a full
+# cover letter regularly take 20-40s, so the read timeout is generous while
+# connecting to the provider should fail fast.
+LLM_TIMEOUT = get_settings().openai_timeout
+LLM_CONNECT_TIMEOUT = get_settings().openai_connect_timeout
+
+_client: Optional[openai.AsyncOpenAI] = None
+
+
+def create_llm_client() -> openai.AsyncOpenAI:
+    """
+    Build an AsyncOpenAI client backed by a bounded, keep-alive httpx pool
+    shared by every AIService call in this worker
+    """
+    settings = get_settings()
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_keepalive,
+            keepalive_expiry=settings.openai_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+    )
+
+    return openai.AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        # Allows pointing the service at a local stub server
+        base_url=settings.openai_base_url,
+        http_client=http_client,
+        timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        # Retries (and Retry-After handling) belong to the LLM gateway
+        max_retries=0,
+    )
+
+
+def get_llm_client() -> openai.AsyncOpenAI:
+    """
+    Return the process-wide LLM client, creating it on first use
+    """
+    global _client
+    if _client is None:
+        _client = create_llm_client()
+    return _client
+
+
+async def close_llm_client() -> None:
+    """
+    Close the shared client and release pooled connections
+    """
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
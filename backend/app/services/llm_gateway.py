@@ -0,0 +1,351 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Optional, Tuple
+import openai
+from app.services.metrics import record_llm_rejected, record_llm_retry, record_llm_throttle_wait
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit is open"""
+
+
+class TokenBucket:
+    """
+    Refills continuously at `per_minute / 60` per second up to `capacity`.
+    Debits may be corrected after the fact (e.g. with actual token usage),
+    so the level can go negative and make later callers wait longer.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float) -> None:
+        # A single request larger than the bucket could otherwise never run
+        amount = min(amount, self.capacity)
+        # The lock keeps waiters first-come first-served
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                # Bounded so refunds from settled calls are picked up early
+                await asyncio.sleep(min(0.5, (amount - self.level) / self.rate))
+
+    def adjust(self, delta: float) -> None:
+        """Debit (positive) or refund (negative) without waiting"""
+        self._refill()
+        self.level = min(self.capacity, self.level - delta)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: grows by roughly one slot per window of
+    successful calls and halves on overload signals (429s, timeouts). Only
+    calls started since the last decrease can trigger another one, so a burst
+    of failures from the same window counts as a single signal.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 64, backoff: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.limit = float(max(minimum, min(maximum, initial)))
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._epoch = 0
+
+    async def acquire(self) -> int:
+        """Wait for a slot; returns the token to pass back to `release`"""
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return self._epoch
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as the caller went away
+                self.release(self._epoch)
+            else:
+                self._waiters.remove(waiter)
+            raise
+        return self._epoch
+
+    def release(self, epoch: int, outcome: Optional[str] = None) -> None:
+        """`outcome` is "ok", "overload" or None for signals that say nothing about load"""
+        self.in_flight -= 1
+        if outcome == "ok":
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+        elif outcome == "overload" and epoch == self._epoch:
+            self.limit = max(self.minimum, self.limit * self.backoff)
+            self._epoch += 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive provider failures; while open
+    every call fails immediately. After `reset_timeout` one probe call is let
+    through and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def before_call(self) -> None:
+        if self.state == CircuitState.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError("LLM provider circuit is open")
+            self.state = CircuitState.HALF_OPEN
+        if self.state == CircuitState.HALF_OPEN:
+            if self._probing:
+                raise CircuitOpenError("LLM provider circuit is half-open, probe in flight")
+            self._probing = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        self.state = CircuitState.CLOSED
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != CircuitState.OPEN:
+                logger.warning("LLM circuit opened", extra={"failures": self.failures})
+            self.state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+
+    def record_neutral(self) -> None:
+        """A call that failed for reasons unrelated to provider health"""
+        self._probing = False
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the provider asked us to wait, from Retry-After(-Ms) headers"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def failure_reason(error: BaseException) -> Optional[str]:
+    """Retryable provider failures by kind; None for errors a retry will not fix"""
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limited"
+    if isinstance(error, (openai.APITimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    if isinstance(error, openai.InternalServerError):
+        return "server_error"
+    return None
+
+
+_OVERLOAD_REASONS = ("rate_limited", "timeout")
+
+
+class LLMGateway:
+    """
+    Single path to the LLM provider: request and token rate limits, an
+    adaptive in-flight limit, retries with jittered backoff (honoring
+    Retry-After) and a circuit breaker. Limits are per worker process.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        limiter: Optional[AdaptiveLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        max_attempts: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+    ):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.limiter = limiter or AdaptiveLimiter(initial=16)
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    async def call(self, stage: str, create: Callable[[], Awaitable[Any]], estimated_tokens: int = 0,
+                   retry_timeouts: bool = True) -> Any:
+        """
+        Run `create` (one provider request) under the gateway's limits.
+        Raises CircuitOpenError without calling the provider while it is
+        unhealthy; callers fall back as they would on any other failure.
+        With `retry_timeouts` off a timeout is raised at once, for callers
+        that have a faster alternative.
+        """
+        response, epoch = await self._attempt(stage, create, estimated_tokens, retry_timeouts)
+        self._release(epoch, "ok", estimated_tokens, getattr(response, "usage", None))
+        return response
+
+    @asynccontextmanager
+    async def stream(self, stage: str, create: Callable[[], Awaitable[Any]], estimated_tokens: int = 0,
+                     retry_timeouts: bool = True) -> AsyncIterator[Any]:
+        """
+        Like `call` for streaming responses; the concurrency slot is held
+        until the stream is consumed. Only opening the stream is retried.
+        """
+        stream, epoch = await self._attempt(stage, create, estimated_tokens, retry_timeouts)
+        outcome = "ok"
+        try:
+            yield stream
+        except BaseException as e:
+            reason = failure_reason(e)
+            outcome = "overload" if reason in _OVERLOAD_REASONS else None
+            if reason:
+                self.breaker.record_failure()
+            raise
+        finally:
+            self.limiter.release(epoch, outcome)
+
+    async def _attempt(self, stage: str, create: Callable[[], Awaitable[Any]], estimated_tokens: int,
+                       retry_timeouts: bool) -> Tuple[Any, int]:
+        """Returns the response with its concurrency slot still held; the caller releases it"""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                record_llm_rejected(stage)
+                raise
+
+            waited = time.perf_counter()
+            try:
+                if self.requests is not None:
+                    await self.requests.acquire(1)
+                if self.tokens is not None and estimated_tokens:
+                    await self.tokens.acquire(estimated_tokens)
+                epoch = await self.limiter.acquire()
+            except BaseException:
+                self.breaker.record_neutral()
+                raise
+            record_llm_throttle_wait(time.perf_counter() - waited)
+
+            try:
+                response = await create()
+            except BaseException as e:
+                reason = failure_reason(e)
+                if reason is None:
+                    self.breaker.record_neutral()
+                    self._release(epoch, None, estimated_tokens, None)
+                    raise
+                self.breaker.record_failure()
+                self._release(epoch, "overload" if reason in _OVERLOAD_REASONS else None, estimated_tokens, None)
+                if attempt >= self.max_attempts or (reason == "timeout" and not retry_timeouts):
+                    raise
+                delay = self._retry_delay(attempt, e)
+                record_llm_retry(stage, reason)
+                logger.info("Retrying LLM call", extra={
+                    "stage": stage,
+                    "reason": reason,
+                    "attempt": attempt,
+                    "delay_s": round(delay, 2)
+                })
+                await asyncio.sleep(delay)
+                continue
+
+            self.breaker.record_success()
+            return response, epoch
+
+    def _retry_delay(self, attempt: int, error: BaseException) -> float:
+        requested = retry_after(error)
+        if requested is not None:
+            # Never earlier than asked, spread out so retries do not arrive together
+            return min(self.backoff_max, requested * random.uniform(1.0, 1.5))
+        # Full jitter keeps retries from many requests from lining up
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _release(self, epoch: int, outcome: Optional[str], estimated_tokens: int, usage) -> None:
+        self.limiter.release(epoch, outcome)
+        if self.tokens is None:
+            return
+        if usage is not None:
+            # Settle the estimate against what the call actually used
+            self.tokens.adjust(usage.total_tokens - min(estimated_tokens, self.tokens.capacity))
+        elif outcome is None and estimated_tokens:
+            # Rejected requests are not billed against the limit
+            self.tokens.adjust(-min(estimated_tokens, self.tokens.capacity))
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """
+    Return the process-wide gateway. LLM_RPM_LIMIT / LLM_TPM_LIMIT (0 to
+    disable) should be the account limits divided by the number of workers.
+    """
+    global _gateway
+    if _gateway is None:
+        settings = get_settings()
+        _gateway = LLMGateway(
+            requests_per_minute=settings.llm_rpm_limit,
+            tokens_per_minute=settings.llm_tpm_limit,
+            limiter=AdaptiveLimiter(
+                initial=settings.llm_concurrency_initial,
+                minimum=settings.llm_concurrency_min,
+                maximum=settings.llm_concurrency_max,
+            ),
+            breaker=CircuitBreaker(
+                failure_threshold=settings.llm_circuit_failures,
+                reset_timeout=settings.llm_circuit_reset,
+            ),
+            max_attempts=settings.llm_max_attempts,
+        )
+    return _gateway
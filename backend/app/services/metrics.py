@@ -0,0 +1,270 @@
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# USD per 1K (prompt, completion) tokens. Models are matched by longest prefix.
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-32k": (0.06, 0.12),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4-1106-preview": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+# LLM calls take seconds, everything else milliseconds
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90)
+
+STAGE_DURATION = Histogram(
+    "visa_guru_stage_duration_seconds",
+    "Duration of consultation pipeline stages",
+    ["stage", "status"],
+    buckets=_LATENCY_BUCKETS,
+)
+CONSULTATION_DURATION = Histogram(
+    "visa_guru_consultation_duration_seconds",
+    "End-to-end consultation generation time",
+    buckets=_LATENCY_BUCKETS,
+)
+LLM_DURATION = Histogram(
+    "visa_guru_llm_request_duration_seconds",
+    "LLM provider call latency",
+    ["stage", "model"],
+    buckets=_LATENCY_BUCKETS,
+)
+LLM_REQUESTS = Counter(
+    "visa_guru_llm_requests_total",
+    "LLM provider calls",
+    ["stage", "model", "outcome"],
+)
+LLM_TOKENS = Counter(
+    "visa_guru_llm_tokens_total",
+    "LLM tokens consumed",
+    ["stage", "model", "kind"],
+)
+LLM_COST = Counter(
+    "visa_guru_llm_cost_usd_total",
+    "Estimated LLM spend in USD",
+    ["stage", "model"],
+)
+ROUTE_DURATION = Histogram(
+    "visa_guru_route_duration_seconds",
+    "Latency of routed LLM stages including any fallback; outcome is ok, fallback or error",
+    ["stage", "route", "model", "outcome"],
+    buckets=_LATENCY_BUCKETS,
+)
+LLM_RETRIES = Counter(
+    "visa_guru_llm_retries_total",
+    "LLM provider calls retried by the gateway",
+    ["stage", "reason"],
+)
+LLM_REJECTED = Counter(
+    "visa_guru_llm_rejected_total",
+    "LLM calls failed fast by the open circuit breaker",
+    ["stage"],
+)
+LLM_THROTTLE_WAIT = Histogram(
+    "visa_guru_llm_throttle_wait_seconds",
+    "Time spent waiting for rate limits and a concurrency slot",
+    buckets=_LATENCY_BUCKETS,
+)
+EVENT_LOOP_LAG = Histogram(
+    "visa_guru_event_loop_lag_seconds",
+    "How late the event loop ran a timer; sustained lag means blocking work on the loop",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+SINGLE_FLIGHT_CALLS = Counter(
+    "visa_guru_single_flight_calls_total",
+    "Calls through a single-flight group; coalesced calls shared an in-flight result",
+    ["operation", "role"],
+)
+
+
+def model_pricing(model: str) -> Optional[Tuple[float, float]]:
+    matches = [name for name in MODEL_PRICING if model.startswith(name)]
+    return MODEL_PRICING[max(matches, key=len)] if matches else None
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    pricing = model_pricing(model)
+    if pricing is None:
+        return 0.0
+    return (prompt_tokens * pricing[0] + completion_tokens * pricing[1]) / 1000
+
+
+def record_llm_call(stage: str, model: str, duration: float, outcome: str,
+                    prompt_tokens: int = 0, completion_tokens: int = 0) -> float:
+    """
+    Record one provider call; returns its estimated cost in USD
+    """
+    LLM_DURATION.labels(stage, model).observe(duration)
+    LLM_REQUESTS.labels(stage, model, outcome).inc()
+    if not (prompt_tokens or completion_tokens):
+        return 0.0
+    LLM_TOKENS.labels(stage, model, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(stage, model, "completion").inc(completion_tokens)
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    LLM_COST.labels(stage, model).inc(cost)
+    return cost
+
+
+def record_route_call(route, model: str, outcome: str, duration: float) -> None:
+    ROUTE_DURATION.labels(route.stage, route.name, model, outcome).observe(duration)
+
+
+def record_llm_retry(stage: str, reason: str) -> None:
+    LLM_RETRIES.labels(stage, reason).inc()
+
+
+def record_llm_rejected(stage: str) -> None:
+    LLM_REJECTED.labels(stage).inc()
+
+
+def record_llm_throttle_wait(seconds: float) -> None:
+    LLM_THROTTLE_WAIT.observe(seconds)
+
+
+def record_single_flight(operation: str, role: str) -> None:
+    SINGLE_FLIGHT_CALLS.labels(operation, role).inc()
+
+
+def observe_stage(stage: str, duration: float, status: str = "ok") -> None:
+    STAGE_DURATION.labels(stage, status).observe(duration)
+
+
+@contextmanager
+def stage_span(stage: str):
+    """
+    Time a block as a pipeline stage; failures are recorded as "failed"
+    """
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "failed"
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - start, status)
+
+
+async def monitor_event_loop(interval: float = 0.05) -> None:
+    """
+    Sample event-loop lag until cancelled: sleep `interval` and record how
+    much later than requested the loop woke up
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - expected))
+
+
+def observe_pipeline(run) -> None:
+    """
+    Record stage and end-to-end durations of a finished PipelineRun
+    """
+    for name, timing in run.timings.items():
+        observe_stage(name, timing.duration, timing.status)
+    CONSULTATION_DURATION.observe(run.total)
+
+
+class RuntimeCollector:
+    """
+    Reads counters kept by the services (cache, job queue, checklist parsing,
+    LLM gateway, model routes) at scrape time, so the hot path does no extra bookkeeping for them
+    """
+
+    def describe(self):
+        # Lets the registry check names without touching the services, which
+        # may not be imported yet
+        yield CounterMetricFamily("visa_guru_cache_hits", "Stage cache hits", labels=["stage"])
+        yield CounterMetricFamily("visa_guru_cache_misses", "Stage cache misses", labels=["stage"])
+        yield GaugeMetricFamily("visa_guru_cache_hit_ratio", "Stage cache hit ratio", labels=["stage"])
+        yield CounterMetricFamily("visa_guru_checklist_parses", "Checklist response parse outcomes", labels=["outcome"])
+        yield GaugeMetricFamily("visa_guru_job_queue_depth", "Jobs waiting for a worker")
+        yield GaugeMetricFamily("visa_guru_jobs_running", "Jobs currently running")
+        yield GaugeMetricFamily("visa_guru_llm_concurrency_limit", "Adaptive LLM concurrency limit")
+        yield GaugeMetricFamily("visa_guru_llm_in_flight", "LLM calls in flight")
+        yield GaugeMetricFamily("visa_guru_llm_circuit_open", "1 while the LLM circuit breaker is open or probing")
+        yield GaugeMetricFamily("visa_guru_route_latency_target_seconds", "Configured latency target per route", labels=["stage", "route"])
+        yield GaugeMetricFamily("visa_guru_route_cost_target_usd", "Configured cost target per call per route", labels=["stage", "route"])
+
+    def collect(self):
+        # Imported lazily: these modules import this one
+        from app.services import ai_service, job_queue, llm_gateway, model_router
+
+        service = ai_service._service
+        if service is not None:
+            hits = CounterMetricFamily("visa_guru_cache_hits", "Stage cache hits", labels=["stage"])
+            misses = CounterMetricFamily("visa_guru_cache_misses", "Stage cache misses", labels=["stage"])
+            hit_rate = GaugeMetricFamily("visa_guru_cache_hit_ratio", "Stage cache hit ratio", labels=["stage"])
+            for stage, stats in service.cache.stats().items():
+                hits.add_metric([stage], stats["hits"])
+                misses.add_metric([stage], stats["misses"])
+                hit_rate.add_metric([stage], stats["hit_rate"])
+            yield hits
+            yield misses
+            yield hit_rate
+
+            checklist = service.checklist_stats
+            parses = CounterMetricFamily("visa_guru_checklist_parses", "Checklist response parse outcomes", labels=["outcome"])
+            parses.add_metric(["success"], checklist.parsed)
+            parses.add_metric(["failure"], checklist.parse_failures)
+            yield parses
+
+        queue = job_queue._queue
+        depth = GaugeMetricFamily("visa_guru_job_queue_depth", "Jobs waiting for a worker")
+        running = GaugeMetricFamily("visa_guru_jobs_running", "Jobs currently running")
+        depth.add_metric([], queue.depth if queue is not None else 0)
+        running.add_metric([], queue.running if queue is not None else 0)
+        yield depth
+        yield running
+
+        gateway = llm_gateway._gateway
+        if gateway is not None:
+            limit = GaugeMetricFamily("visa_guru_llm_concurrency_limit", "Adaptive LLM concurrency limit")
+            in_flight = GaugeMetricFamily("visa_guru_llm_in_flight", "LLM calls in flight")
+            circuit = GaugeMetricFamily("visa_guru_llm_circuit_open", "1 while the LLM circuit breaker is open or probing")
+            limit.add_metric([], int(gateway.limiter.limit))
+            in_flight.add_metric([], gateway.limiter.in_flight)
+            circuit.add_metric([], 0 if gateway.breaker.state == llm_gateway.CircuitState.CLOSED else 1)
+            yield limit
+            yield in_flight
+            yield circuit
+
+        router = model_router._router
+        if router is not None:
+            latency = GaugeMetricFamily("visa_guru_route_latency_target_seconds", "Configured latency target per route", labels=["stage", "route"])
+            cost = GaugeMetricFamily("visa_guru_route_cost_target_usd", "Configured cost target per call per route", labels=["stage", "route"])
+            for route in router.all_routes():
+                if route.latency_target_ms is not None:
+                    latency.add_metric([route.stage, route.name], route.latency_target_ms / 1000)
+                if route.cost_target_usd is not None:
+                    cost.add_metric([route.stage, route.name], route.cost_target_usd)
+            yield latency
+            yield cost
+
+
+_runtime_collector = RuntimeCollector()
+REGISTRY.register(_runtime_collector)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    # Set by gunicorn.conf.py for multi-worker deployments. Read from the real
+    # environment, as prometheus_client does when it is imported.
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        # Counters and histograms summed over all workers; the runtime gauges
+        # are those of the worker answering the scrape
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=multiproc_dir)
+        registry.register(_runtime_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+from app.models.consultation import ConsultationRequest
+from app.services.prompts import count_tokens
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROUTES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "model_routes.json")
+
+STANDARD = "standard"
+COMPLEX = "complex"
+
+# Used when a stage has no configured route
+DEFAULT_MODEL = "gpt-4"
+
+
+@dataclass(frozen=True)
+class Route:
+    """
+    Model choice for one stage and profile complexity. `timeout` bounds a
+    single call to the primary model before the fallback model takes over;
+    the targets are exported for alerting, not enforced.
+    """
+    stage: str
+    name: str
+    model: str
+    fallback: Optional[str] = None
+    timeout: Optional[float] = None
+    latency_target_ms: Optional[float] = None
+    cost_target_usd: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, stage: str, name: str, data: Dict) -> "Route":
+        return cls(
+            stage=stage,
+            name=name,
+            model=data["model"],
+            fallback=data.get("fallback"),
+            timeout=data.get("timeout"),
+            latency_target_ms=data.get("latency_target_ms"),
+            cost_target_usd=data.get("cost_target_usd"),
+        )
+
+
+class ModelRouter:
+    """
+    Picks the model for each LLM stage from a JSON routing table: profiles
+    with prior rejections, a second nationality or a long free-text note are
+    escalated to the "complex" route.
+    """
+
+    def __init__(self, path: str = DEFAULT_ROUTES_PATH):
+        self.path = path
+        self.escalation: Dict = {}
+        self.routes: Dict[str, Dict[str, Route]] = {}
+        self.load()
+
+    def load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.escalation = data.get("escalation", {})
+        self.routes = {
+            stage: {name: Route.from_dict(stage, name, route) for name, route in routes.items()}
+            for stage, routes in data.get("routes", {}).items()
+        }
+
+    def complexity(self, request: ConsultationRequest) -> str:
+        rules = self.escalation
+        if rules.get("previous_rejections") and request.previous_rejections:
+            return COMPLEX
+        if rules.get("dual_citizenship") and request.dual_citizenship:
+            return COMPLEX
+        info_budget = rules.get("additional_info_tokens")
+        if info_budget and request.additional_info and count_tokens(request.additional_info) > info_budget:
+            return COMPLEX
+        return STANDARD
+
+    def route(self, stage: str, request: ConsultationRequest) -> Route:
+        routes = self.routes.get(stage)
+        if not routes:
+            return Route(stage=stage, name="default", model=DEFAULT_MODEL)
+        return routes.get(self.complexity(request)) or routes.get(STANDARD) or next(iter(routes.values()))
+
+    def all_routes(self):
+        for routes in self.routes.values():
+            yield from routes.values()
+
+
+_router: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    """
+    Return the process-wide router. MODEL_ROUTES_PATH points at an
+    alternative routing table, so models can be re-tuned without a release.
+    """
+    global _router
+    if _router is None:
+        _router = ModelRouter(get_settings().model_routes_path or DEFAULT_ROUTES_PATH)
+    return _router
@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape as xml_escape
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from typing import AsyncIterator, Dict, Optional
+import aiofiles
+import aiofiles.os
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup, escape
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from app.models.consultation import ConsultationResult
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the template or layout changes; cached PDFs of other versions are discarded
+TEMPLATE_VERSION = "1"
+TEMPLATE_NAME = "consultation_report.xml.j2"
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# Markup the template may use inside <para> and <cell>
+INLINE_TAGS = {"b", "i", "u", "br"}
+
+
+# --- Rendering (runs inside worker processes) ---
+
+def _paragraphs(text: str):
+    return [block.strip() for block in re.split(r"\n\s*\n", text or "") if block.strip()]
+
+
+def _nl2br(text: str) -> Markup:
+    return Markup("<br/>").join(escape(line) for line in text.split("\n"))
+
+
+@lru_cache(maxsize=1)
+def _environment() -> Environment:
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=select_autoescape(default=True, default_for_string=True),
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+    env.filters["paragraphs"] = _paragraphs
+    env.filters["nl2br"] = _nl2br
+    return env
+
+
+@lru_cache(maxsize=1)
+def _styles() -> Dict[str, ParagraphStyle]:
+    sample = getSampleStyleSheet()
+    styles = {name: sample[name] for name in ("Title", "Heading2", "BodyText", "Normal")}
+    styles["Meta"] = ParagraphStyle("Meta", parent=sample["Normal"], fontSize=8, textColor=colors.grey)
+    styles["Bullet"] = ParagraphStyle("Bullet", parent=sample["BodyText"], leftIndent=12, bulletIndent=2)
+    styles["Letter"] = ParagraphStyle("Letter", parent=sample["BodyText"], spaceAfter=8, leading=15)
+    styles["Cell"] = ParagraphStyle("Cell", parent=sample["BodyText"], fontSize=9, leading=11)
+    return styles
+
+
+def _inner_markup(element: ET.Element) -> str:
+    """
+    Paragraph markup inside an element, inline tags (<b>, <i>, <u>, <br/>)
+    included. ElementTree has unescaped the text, so it is escaped again:
+    user text reaches reportlab as text, never as markup.
+    """
+    parts = [xml_escape(element.text or "")]
+    for child in element:
+        if child.tag not in INLINE_TAGS:
+            raise ValueError(f"Unknown inline element <{child.tag}>")
+        parts.append("<br/>" if child.tag == "br" else f"<{child.tag}>{_inner_markup(child)}</{child.tag}>")
+        parts.append(xml_escape(child.tail or ""))
+    return "".join(parts)
+
+
+def _table(element: ET.Element, available_width: float) -> Table:
+    styles = _styles()
+    rows = [
+        [Paragraph(_inner_markup(cell).strip(), styles["Cell"]) for cell in row.findall("cell")]
+        for row in element.findall("row")
+    ]
+    # Fixed widths in points, "*" takes whatever is left
+    widths = element.get("widths", "").split(",") if element.get("widths") else []
+    fixed = sum(float(w) for w in widths if w != "*")
+    stretch = widths.count("*")
+    col_widths = [
+        (available_width - fixed) / stretch if w == "*" else float(w) for w in widths
+    ] or None
+
+    header_rows = int(element.get("header", "0"))
+    table = Table(rows, colWidths=col_widths, repeatRows=header_rows)
+    commands = [
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+        ("LINEBELOW", (0, 0), (-1, -1), 0.25, colors.lightgrey),
+    ]
+    if header_rows:
+        commands.append(("BACKGROUND", (0, 0), (-1, header_rows - 1), colors.whitesmoke))
+    table.setStyle(TableStyle(commands))
+    return table
+
+
+def _flowables(root: ET.Element, available_width: float):
+    styles = _styles()
+    for element in root:
+        if element.tag == "para":
+            yield Paragraph(
+                _inner_markup(element).strip(),
+                styles[element.get("style", "BodyText")],
+                bulletText=element.get("bullet"),
+            )
+        elif element.tag == "spacer":
+            yield Spacer(1, float(element.get("height", "6")))
+        elif element.tag == "pagebreak":
+            yield PageBreak()
+        elif element.tag == "table":
+            yield _table(element, available_width)
+        else:
+            raise ValueError(f"Unknown report element <{element.tag}>")
+
+
+def render_report(result: Dict) -> bytes:
+    """
+    Render a consultation result (as a dict, so it pickles cheaply) to PDF
+    bytes. CPU-bound; called in a worker process.
+    """
+    markup = _environment().get_template(TEMPLATE_NAME).render(
+        result=result,
+        generated_on=time.strftime("%d %B %Y"),
+    )
+    root = ET.fromstring(markup)
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        leftMargin=20 * mm,
+        rightMargin=20 * mm,
+        topMargin=20 * mm,
+        bottomMargin=20 * mm,
+        title=root.get("title", "Visa Consultation"),
+        author="Visa Guru",
+    )
+
+    def footer(canvas, document):
+        canvas.saveState()
+        canvas.setFont("Helvetica", 8)
+        canvas.setFillColor(colors.grey)
+        canvas.drawString(document.leftMargin, 10 * mm, "Visa Guru - not legal advice")
+        canvas.drawRightString(A4[0] - document.rightMargin, 10 * mm, f"Page {document.page}")
+        canvas.restoreState()
+
+    doc.build(list(_flowables(root, doc.width)), onFirstPage=footer, onLaterPages=footer)
+    return buffer.getvalue()
+
+
+# --- Service (runs on the event loop) ---
+
+class PDFReportRenderer:
+    """
+    Renders consultation PDFs in a process pool so the event loop never runs
+    reportlab, and keeps rendered files on disk keyed by consultation id and
+    template version. Concurrent requests for the same report share one render.
+    """
+
+    def __init__(self, cache_dir: str, workers: int = 2):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that already runs threads (aiosqlite,
+            # to_thread workers) can deadlock the child
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def path_for(self, consultation_id: str) -> str:
+        if not _SAFE_ID.match(consultation_id):
+            raise ValueError(f"Invalid consultation id: {consultation_id!r}")
+        return os.path.join(self.cache_dir, f"{consultation_id}.v{TEMPLATE_VERSION}.pdf")
+
+    def _prune(self) -> int:
+        """Remove cached PDFs rendered with an older template version"""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        current = f".v{TEMPLATE_VERSION}.pdf"
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pdf") and not name.endswith(current):
+                os.remove(os.path.join(self.cache_dir, name))
+                removed += 1
+        return removed
+
+    async def start(self) -> None:
+        removed = await asyncio.to_thread(self._prune)
+        if removed:
+            logger.info("Pruned stale PDF reports", extra={"removed": removed})
+
+    async def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def get_report(self, result: ConsultationResult) -> str:
+        """
+        Return the path of the rendered PDF, rendering it on first request
+        """
+        path = self.path_for(result.consultation_id)
+        if await aiofiles.os.path.exists(path):
+            return path
+
+        pending = self._inflight.get(path)
+        if pending is None:
+            pending = asyncio.ensure_future(self._render_to(path, result))
+            self._inflight[path] = pending
+            pending.add_done_callback(lambda _: self._inflight.pop(path, None))
+        # Shielded so one client disconnecting does not abort the shared render
+        return await asyncio.shield(pending)
+
+    async def _render_to(self, path: str, result: ConsultationResult) -> str:
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        pdf = await loop.run_in_executor(self._get_executor(), render_report, result.model_dump())
+
+        await aiofiles.os.makedirs(self.cache_dir, exist_ok=True)
+        # Written under a temporary name so readers never see a partial file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        async with aiofiles.open(tmp_path, "wb") as f:
+            await f.write(pdf)
+        await aiofiles.os.replace(tmp_path, path)
+
+        logger.info("Rendered PDF report", extra={
+            "consultation_id": result.consultation_id,
+            "bytes": len(pdf),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+        return path
+
+
+async def iter_file(path: str, chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    async with aiofiles.open(path, "rb") as f:
+        while chunk := await f.read(chunk_size):
+            yield chunk
+
+
+_renderer: Optional[PDFReportRenderer] = None
+
+
+def get_pdf_renderer() -> PDFReportRenderer:
+    """
+    Return the process-wide renderer. PDF_WORKERS sets the render process
+    count, PDF_CACHE_DIR where rendered reports are kept.
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = PDFReportRenderer(
+            cache_dir=get_settings().pdf_cache_dir,
+            workers=get_settings().pdf_workers,
+        )
+    return _renderer
+
+
+async def close_pdf_renderer() -> None:
+    global _renderer
+    if _renderer is not None:
+        await _renderer.close()
+        _renderer = None
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stage:
+    """
+    A single step of a pipeline. `func` receives the results of the stages it
+    depends on, keyed by stage name.
+    """
+    name: str
+    func: Callable[[Dict[str, Any]], Awaitable[Any]]
+    depends_on: Tuple[str, ...] = ()
+    timeout: Optional[float] = None
+    fallback: Optional[Callable[[], Any]] = None
+
+
+@dataclass
+class StageTiming:
+    started: float
+    finished: float
+    status: str  # "ok", "fallback", "failed"
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+
+@dataclass
+class PipelineRun:
+    results: Dict[str, Any] = field(default_factory=dict)
+    timings: Dict[str, StageTiming] = field(default_factory=dict)
+    total: float = 0.0
+
+    def summary(self) -> Dict[str, float]:
+        """Stage durations in milliseconds, plus the end-to-end total"""
+        durations = {name: round(t.duration * 1000, 1) for name, t in self.timings.items()}
+        durations["total"] = round(self.total * 1000, 1)
+        return durations
+
+
+class Pipeline:
+    """
+    Minimal dependency-graph executor: every stage starts as soon as the
+    stages it depends on have finished, so independent stages run concurrently.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Pipeline stage names must be unique")
+        self._check_graph()
+
+    def _check_graph(self) -> None:
+        visiting, done = set(), set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a dependency cycle at '{name}'")
+            if name not in self.stages:
+                raise ValueError(f"Unknown pipeline stage '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    async def run(self) -> PipelineRun:
+        run = PipelineRun()
+        tasks: Dict[str, asyncio.Task] = {}
+        start = time.perf_counter()
+
+        async def execute(stage: Stage) -> Any:
+            deps = {}
+            for dep in stage.depends_on:
+                deps[dep] = await tasks[dep]
+
+            started = time.perf_counter()
+            status = "ok"
+            try:
+                if stage.timeout is not None:
+                    result = await asyncio.wait_for(stage.func(deps), stage.timeout)
+                else:
+                    result = await stage.func(deps)
+            except Exception as e:
+                if stage.fallback is None:
+                    run.timings[stage.name] = StageTiming(started, time.perf_counter(), "failed")
+                    raise
+                logger.warning("Pipeline stage failed, using fallback: %r", e, extra={"stage": stage.name})
+                status = "fallback"
+                result = stage.fallback()
+
+            run.timings[stage.name] = StageTiming(started, time.perf_counter(), status)
+            run.results[stage.name] = result
+            return result
+
+        # Stages are created in declaration order; dependencies are resolved by
+        # awaiting the dependency's task, so creation order does not matter.
+        for stage in self.stages.values():
+            tasks[stage.name] = asyncio.ensure_future(execute(stage))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            run.total = time.perf_counter() - start
+
+        return run
+
+
+class SharedTasks:
+    """
+    Runs each keyed coroutine once per scope and hands every caller the same
+    result (or exception). Unlike SingleFlight, finished results are kept
+    until the scope is closed, so callers arriving later reuse them too.
+    Callers are shielded: one timing out does not cancel work others await.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self.requested = 0
+
+    @property
+    def executed(self) -> int:
+        return len(self._tasks)
+
+    def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Awaitable[Any]:
+        self.requested += 1
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            # Mark the exception retrieved even if every caller went away
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._tasks[key] = task
+        return asyncio.shield(task)
+
+    async def close(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
@@ -0,0 +1,288 @@
+"""
+Precomputed consultation previews.
+
+Previews are built offline per corridor (nationality x destination x travel
+purpose) from the visa rules index and the scoring model, and served
+from an in-memory table: no LLM call and no I/O on the request path. Rebuild
+the table after changing rules or scoring with
+
+    python -m app.services.preview_engine
+
+Running workers pick up the new file on their next reload check.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from itertools import product
+from typing import Dict, Optional, Tuple
+from app.models.consultation import ConsultationRequest, TravelPurpose
+from app.services.scoring import CorridorKey, ScoringModel, get_scoring_model
+from app.services.visa_rules import WILDCARD, VisaRulesIndex, get_visa_rules
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the table layout or the document lists change
+PREVIEW_TABLE_VERSION = "1"
+
+MAX_SAMPLE_DOCUMENTS = 5
+
+PREVIEW_NOTE = "Full personalized checklist, cover letter, and strategic guidance available with complete consultation."
+
+PURPOSE_DOCUMENTS: Dict[str, Tuple[str, ...]] = {
+    "tourism": ("Travel itinerary", "Accommodation bookings"),
+    "business": ("Invitation letter from the host company", "Employer letter confirming the trip"),
+    "work": ("Employment contract or job offer", "Work permit approval"),
+    "study": ("Letter of acceptance from the institution", "Proof of tuition payment"),
+    "transit": ("Onward travel ticket", "Visa for the final destination, if required"),
+    "family_visit": ("Invitation letter from your family member", "Proof of relationship"),
+    "other": ("Documents supporting the purpose of your trip",),
+}
+
+@dataclass(frozen=True, slots=True)
+class CorridorPreview:
+    visa_required: bool
+    processing_time: str
+    documents: Tuple[str, ...]
+    # Confidence score range over residency statuses, without / with previous rejections
+    band: Tuple[int, int]
+    band_with_rejections: Tuple[int, int]
+
+
+def _sample_documents(visa_required: bool, purpose: str) -> Tuple[str, ...]:
+    documents = ["Valid passport (6+ months validity)"]
+    if visa_required:
+        documents += ["Visa application form", "Passport photographs"]
+    documents += PURPOSE_DOCUMENTS.get(purpose, PURPOSE_DOCUMENTS["other"])
+    documents += ["Financial documentation", "Proof of residency status"]
+    return tuple(documents[:MAX_SAMPLE_DOCUMENTS])
+
+
+def build_table(rules: VisaRulesIndex, scorer: ScoringModel) -> Dict:
+    """
+    Compute the preview of every corridor the rules index knows about, plus
+    wildcard corridors for unknown nationalities and destinations. Returns the
+    serialized table; document lists are stored once and referenced by index.
+    """
+    keys = rules.keys()
+    nationalities = sorted({key[0] for key in keys} | {WILDCARD})
+    destinations = sorted({key[3] for key in keys} | {WILDCARD})
+
+    resolved = []
+    for nationality, destination, purpose in product(nationalities, destinations, [p.value for p in TravelPurpose]):
+        rule = rules.resolve((nationality, WILDCARD, WILDCARD, destination, purpose))
+        if rule is not None:
+            resolved.append(((nationality, destination, purpose), rule))
+
+    # Every corridor's score bands in one vectorized pass
+    bands = scorer.bands([key for key, _ in resolved]).tolist()
+    document_index: Dict[Tuple[str, ...], int] = {}
+    corridors = []
+    for ((nationality, destination, purpose), rule), (band, band_with_rejections) in zip(resolved, bands):
+        documents = _sample_documents(rule.visa_required, purpose)
+        corridors.append([
+            nationality,
+            destination,
+            purpose,
+            rule.visa_required,
+            rule.processing_time,
+            document_index.setdefault(documents, len(document_index)),
+            band,
+            band_with_rejections,
+        ])
+
+    return {
+        "version": PREVIEW_TABLE_VERSION,
+        "rules_version": rules.version,
+        "scoring_version": scorer.version,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "documents": [list(documents) for documents in document_index],
+        "corridors": corridors,
+    }
+
+
+def write_table(table: Dict, path: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(table, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+class PreviewEngine:
+    """
+    In-memory preview table keyed by corridor.
+
+    Loaded from the file written by the batch job; if the file is missing or
+    was built from other rules or scoring, the table is built at startup
+    instead so a fresh deploy still serves personalized previews.
+    """
+
+    def __init__(self, path: str, rules: VisaRulesIndex, scorer: ScoringModel):
+        self.path = path
+        self.rules = rules
+        self.scorer = scorer
+        self.built_at: Optional[str] = None
+        self._table: Dict[CorridorKey, CorridorPreview] = {}
+        self._mtime: Optional[float] = None
+        self._reload_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def _compatible(self, table: Dict) -> bool:
+        return (
+            table.get("version") == PREVIEW_TABLE_VERSION
+            and table.get("rules_version") == self.rules.version
+            and table.get("scoring_version") == self.scorer.version
+        )
+
+    def _install(self, table: Dict) -> None:
+        documents = [tuple(docs) for docs in table["documents"]]
+        corridors = {}
+        for nationality, destination, purpose, visa_required, processing, docs, band, band_rej in table["corridors"]:
+            corridors[(nationality, destination, purpose)] = CorridorPreview(
+                visa_required=visa_required,
+                processing_time=processing,
+                documents=documents[docs],
+                band=tuple(band),
+                band_with_rejections=tuple(band_rej),
+            )
+        # Single dict swap so concurrent lookups never see a partial table
+        self._table = corridors
+        self.built_at = table["built_at"]
+
+    def load(self) -> bool:
+        """
+        Load the table file if it exists and matches the current rules and
+        scoring. Returns whether a table was installed.
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path) as f:
+                table = json.load(f)
+        except FileNotFoundError:
+            return False
+        self._mtime = mtime
+        if not self._compatible(table):
+            logger.warning("Preview table is out of date, ignoring it", extra={
+                "path": self.path,
+                "rules_version": table.get("rules_version"),
+                "scoring_version": table.get("scoring_version"),
+            })
+            return False
+        self._install(table)
+        return True
+
+    def rebuild(self) -> None:
+        table = build_table(self.rules, self.scorer)
+        self._install(table)
+        try:
+            write_table(table, self.path)
+            self._mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            logger.warning("Could not save preview table: %s", e, extra={"path": self.path})
+
+    async def start(self, reload_interval: float) -> None:
+        if not await asyncio.to_thread(self.load):
+            await asyncio.to_thread(self.rebuild)
+        logger.info("Preview table ready", extra={"corridors": len(self._table), "built_at": self.built_at})
+        if self._reload_task is None and reload_interval > 0:
+            self._reload_task = asyncio.create_task(self._reload_loop(reload_interval))
+
+    async def _reload_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                mtime = os.path.getmtime(self.path)
+                if mtime != self._mtime and await asyncio.to_thread(self.load):
+                    logger.info("Preview table reloaded", extra={"corridors": len(self._table), "built_at": self.built_at})
+            except FileNotFoundError:
+                pass
+            except Exception:
+                logger.exception("Preview table reload error")
+
+    def lookup(self, request: ConsultationRequest) -> Optional[CorridorPreview]:
+        key = self.rules.key_for(request)
+        nationality, destination, purpose = key[0], key[3], key[4]
+        for probe in (
+            (nationality, destination, purpose),
+            (WILDCARD, destination, purpose),
+            (nationality, WILDCARD, purpose),
+            (WILDCARD, WILDCARD, purpose),
+        ):
+            preview = self._table.get(probe)
+            if preview is not None:
+                return preview
+        return None
+
+    def preview(self, request: ConsultationRequest) -> Dict:
+        """
+        Personalized preview for the request's corridor
+        """
+        corridor = self.lookup(request)
+        if corridor is None:
+            # Only possible before the table is built
+            raise LookupError("Preview table not loaded")
+
+        low, high = corridor.band_with_rejections if request.previous_rejections else corridor.band
+        purpose = TravelPurpose(request.travel_purpose).value.replace("_", " ")
+        requirement = "usually need a visa" if corridor.visa_required else "may not need a visa"
+        scores = f"around {low}" if low == high else f"between {low} and {high}"
+        return {
+            "summary": f"{request.nationality} passport holders travelling to {request.destination_country} "
+                       f"for {purpose} {requirement}. Typical processing: {corridor.processing_time}.",
+            "visa_required": corridor.visa_required,
+            "sample_documents": list(corridor.documents),
+            "estimated_processing": corridor.processing_time,
+            "confidence_band": {"low": low, "high": high},
+            "confidence_preview": f"Applicants with a profile like yours typically score {scores} out of 100.",
+            "note": PREVIEW_NOTE,
+        }
+
+    async def close(self) -> None:
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+            await asyncio.gather(self._reload_task, return_exceptions=True)
+            self._reload_task = None
+
+
+_engine: Optional[PreviewEngine] = None
+
+
+def get_preview_engine() -> PreviewEngine:
+    """
+    Return the process-wide preview engine
+    """
+    global _engine
+    if _engine is None:
+        _engine = PreviewEngine(get_settings().preview_table_path, get_visa_rules(), get_scoring_model())
+    return _engine
+
+
+async def close_preview_engine() -> None:
+    global _engine
+    if _engine is not None:
+        await _engine.close()
+        _engine = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the precomputed preview table")
+    parser.add_argument("--output", default=get_settings().preview_table_path)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    table = build_table(get_visa_rules(), get_scoring_model())
+    write_table(table, args.output)
+    print(
+        f"Wrote {len(table['corridors'])} corridors ({len(table['documents'])} document lists) "
+        f"to {args.output} in {(time.perf_counter() - start) * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
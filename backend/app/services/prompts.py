@@ -0,0 +1,193 @@
+import logging
+from dataclasses import dataclass
+from enum import Enum
+from functools import lru_cache
+from typing import Dict, List
+from app.models.consultation import ConsultationRequest
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - token counts fall back to an estimate
+    tiktoken = None
+
+# Token budget for the free-text `additional_info` field inside a prompt
+ADDITIONAL_INFO_TOKEN_BUDGET = 400
+
+TRUNCATION_MARKER = " [...truncated]"
+
+# Function the checklist prompt asks the model to call
+CHECKLIST_TOOL_NAME = "record_document_checklist"
+
+# Prompts are laid out as one static system message (role + instructions,
+# byte-identical for every request so providers can reuse the cached prefix)
+# followed by a user message holding only the applicant's fields.
+
+CHECKLIST_SYSTEM_PROMPT = """You are a visa application expert who specializes in complex immigration scenarios. Provide detailed, personalized guidance.
+
+You will be given an applicant profile. Generate a personalized visa document checklist, prioritized as:
+1. HIGH priority (absolutely required)
+2. MEDIUM priority (strongly recommended)
+3. LOW priority (helpful but optional)
+
+For each document, provide:
+- Clear name
+- Specific requirements/notes for this applicant's situation
+- Why it's important for their specific case
+
+Focus on edge cases and nuances that generic checklists miss.
+Return the checklist by calling """ + CHECKLIST_TOOL_NAME + "."
+
+CHECKLIST_PROFILE_TEMPLATE = """Applicant Profile:
+- Nationality: {nationality}
+- Dual Citizenship: {dual_citizenship}
+- Current Country: {current_country}
+- Residency Status: {residency_status}
+- Destination: {destination_country}
+- Travel Purpose: {travel_purpose}
+- Duration: {duration}
+- Previous Rejections: {previous_rejections}
+
+Additional Context: {additional_info}"""
+
+COVER_LETTER_SYSTEM_PROMPT = """You are an immigration consultant who writes compelling visa application cover letters. Focus on addressing visa officer concerns while highlighting applicant strengths.
+
+You will be given an applicant profile. Write a professional visa application cover letter that addresses:
+- Why they want to visit the destination country
+- Their ties to their current country (why they will return)
+- Their specific situation given their nationality and residency status
+- Financial capability and travel planning
+
+Write a compelling but honest letter that addresses potential visa officer concerns.
+Keep it professional, concise (1-2 pages), and specific to their situation."""
+
+COVER_LETTER_PROFILE_TEMPLATE = """Applicant: {nationality} citizen
+Current Status: {residency_status} in {current_country}
+Applying for: {destination_country} visa
+Purpose: {travel_purpose}
+Duration: {duration}
+Travel Dates: {travel_dates}
+Previous rejections: {previous_rejections}
+
+Additional context: {additional_info}"""
+
+
+@lru_cache(maxsize=8)
+def _encoding_for(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use; without them,
+        # counts fall back to the estimate rather than failing the request
+        logger.warning("Tokenizer unavailable, estimating tokens: %s", e, extra={"model": model})
+        return None
+
+
+def warm_tokenizer(model: str = "gpt-4") -> None:
+    """
+    Load the encoding ahead of the first request (it may be downloaded)
+    """
+    _encoding_for(model)
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """
+    Token count for `text`; a ~4 characters/token estimate without tiktoken
+    """
+    encoding = _encoding_for(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def truncate_to_tokens(text: str, budget: int, model: str = "gpt-4") -> str:
+    """
+    Cut `text` down to at most `budget` tokens, marking the cut
+    """
+    encoding = _encoding_for(model)
+    if encoding is None:
+        limit = budget * 4
+        return text if len(text) <= limit else text[:limit].rstrip() + TRUNCATION_MARKER
+
+    tokens = encoding.encode(text)
+    if len(tokens) <= budget:
+        return text
+    return encoding.decode(tokens[:budget]).rstrip() + TRUNCATION_MARKER
+
+
+@dataclass
+class BuiltPrompt:
+    name: str
+    messages: List[Dict[str, str]]
+    prefix_tokens: int
+    profile_tokens: int
+    additional_info_truncated: bool
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prefix_tokens + self.profile_tokens
+
+    def token_counts(self) -> Dict[str, int]:
+        return {
+            "prefix": self.prefix_tokens,
+            "profile": self.profile_tokens,
+            "total": self.total_tokens,
+        }
+
+
+def _value(field) -> str:
+    return field.value if isinstance(field, Enum) else str(field)
+
+
+def _profile_fields(request: ConsultationRequest, model: str, default_info: str):
+    additional_info = request.additional_info or default_info
+    bounded_info = truncate_to_tokens(additional_info, ADDITIONAL_INFO_TOKEN_BUDGET, model)
+    fields = {
+        "nationality": request.nationality,
+        "dual_citizenship": request.dual_citizenship or "None",
+        "current_country": request.current_country,
+        "residency_status": _value(request.residency_status),
+        "destination_country": request.destination_country,
+        "travel_purpose": _value(request.travel_purpose),
+        "duration": request.duration,
+        "travel_dates": request.travel_dates,
+        "previous_rejections": "Yes" if request.previous_rejections else "No",
+        "additional_info": bounded_info,
+    }
+    return fields, bounded_info != additional_info
+
+
+@lru_cache(maxsize=32)
+def _prefix_tokens(system_prompt: str, model: str) -> int:
+    # The prefix never changes, so it is only counted once per model
+    return count_tokens(system_prompt, model)
+
+
+def _build(name: str, system_prompt: str, template: str, request: ConsultationRequest,
+           model: str, default_info: str) -> BuiltPrompt:
+    fields, truncated = _profile_fields(request, model, default_info)
+    profile = template.format(**fields)
+    return BuiltPrompt(
+        name=name,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": profile},
+        ],
+        prefix_tokens=_prefix_tokens(system_prompt, model),
+        profile_tokens=count_tokens(profile, model),
+        additional_info_truncated=truncated,
+    )
+
+
+def build_checklist_prompt(request: ConsultationRequest, model: str = "gpt-4") -> BuiltPrompt:
+    return _build("checklist", CHECKLIST_SYSTEM_PROMPT, CHECKLIST_PROFILE_TEMPLATE, request, model, "None")
+
+
+def build_cover_letter_prompt(request: ConsultationRequest, model: str = "gpt-4") -> BuiltPrompt:
+    return _build("cover_letter", COVER_LETTER_SYSTEM_PROMPT, COVER_LETTER_PROFILE_TEMPLATE, request, model, "Standard application")
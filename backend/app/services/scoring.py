@@ -0,0 +1,300 @@
+"""
+Applicant confidence scoring.
+
+A score is the base score plus weights for residency status, travel purpose
+and previous rejections (app/data/scoring_model.json), plus a corridor
+adjustment learned from historical outcomes: the corridor's approval rate,
+shrunk towards the overall rate when it has few applications, minus the
+overall rate, in percentage points. Without an outcomes table every corridor
+scores on the weights alone.
+
+Scoring works on feature arrays, so a batch of requests (or every corridor of
+the preview table) is one vectorized pass. Re-score an export of requests
+against the current model with
+
+    python -m app.services.scoring requests.jsonl --output scores.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models.consultation import ConsultationRequest, ResidencyStatus, TravelPurpose
+from app.services.visa_rules import WILDCARD, VisaRulesIndex, get_visa_rules
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when the scoring code changes. The model version also includes the
+# weights and outcomes versions; tables precomputed from the scores (the
+# preview table) are rebuilt when it differs.
+SCORING_VERSION = "2"
+
+CONFIDENCE_FLOOR = 30
+CONFIDENCE_CEILING = 95
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "scoring_model.json")
+
+# Feature codes are positions in these lists
+RESIDENCY_STATUSES = list(ResidencyStatus)
+TRAVEL_PURPOSES = list(TravelPurpose)
+_RESIDENCY_INDEX = {status: i for i, status in enumerate(RESIDENCY_STATUSES)}
+_PURPOSE_INDEX = {purpose: i for i, purpose in enumerate(TRAVEL_PURPOSES)}
+
+# Upper bound on remembered corridor spellings from requests
+MAX_CACHED_CORRIDORS = 10000
+
+# Columns read from the outcomes table; others are ignored
+OUTCOME_COLUMNS = ("nationality", "destination_country", "purpose", "applications", "approvals")
+
+# (nationality, destination_country, purpose), normalized as in the rules index
+CorridorKey = Tuple[str, str, str]
+
+
+def _corridor_probes(key: CorridorKey) -> Tuple[CorridorKey, ...]:
+    nationality, destination, purpose = key
+    return (key, (WILDCARD, destination, purpose), (WILDCARD, WILDCARD, purpose))
+
+
+class ScoringModel:
+    """
+    Confidence scores for applicant profiles.
+
+    Corridor base rates are computed once when the model loads, for every
+    corridor in the outcomes table and for the destination and purpose
+    aggregates used when a corridor has no history of its own.
+    """
+
+    def __init__(self, rules: VisaRulesIndex, model_path: str = DEFAULT_MODEL_PATH, outcomes_path: Optional[str] = None):
+        self.rules = rules
+        self.model_path = model_path
+        self.outcomes_path = outcomes_path
+        self.version = SCORING_VERSION
+        self.overall_rate: Optional[float] = None
+        self._base = 0.0
+        self._residency = np.zeros(len(RESIDENCY_STATUSES))
+        self._purpose = np.zeros(len(TRAVEL_PURPOSES))
+        self._residency_weights: List[float] = []
+        self._purpose_weights: List[float] = []
+        self._rejection = 0.0
+        self._base_rates: Dict[CorridorKey, float] = {}
+        self._adjustments: Dict[CorridorKey, float] = {}
+        self._request_adjustments: Dict[Tuple, float] = {}
+        self.load()
+
+    def load(self) -> None:
+        with open(self.model_path) as f:
+            model = json.load(f)
+        corridor = model.get("corridor", {})
+        prior_strength = float(corridor.get("prior_strength", 50))
+        max_adjustment = float(corridor.get("max_adjustment", 15))
+
+        base_rates: Dict[CorridorKey, float] = {}
+        overall_rate = None
+        outcomes_version = "none"
+        if self.outcomes_path:
+            with open(self.outcomes_path) as f:
+                outcomes = json.load(f)
+            outcomes_version = outcomes["version"]
+            base_rates, overall_rate = self._compute_base_rates(outcomes, prior_strength)
+
+        self._base = float(model["base"])
+        self._residency = np.array([model["residency_status"].get(s.value, 0) for s in RESIDENCY_STATUSES], dtype=np.float64)
+        self._purpose = np.array([model["travel_purpose"].get(p.value, 0) for p in TRAVEL_PURPOSES], dtype=np.float64)
+        self._residency_weights = self._residency.tolist()
+        self._purpose_weights = self._purpose.tolist()
+        self._rejection = float(model["previous_rejections"])
+        self._base_rates = base_rates
+        self._adjustments = {
+            key: float(np.clip(round((rate - overall_rate) * 100), -max_adjustment, max_adjustment))
+            for key, rate in base_rates.items()
+        }
+        self._request_adjustments = {}
+        self.overall_rate = overall_rate
+        self.version = f"{SCORING_VERSION}/{model['version']}/{outcomes_version}"
+        logger.info("Scoring model loaded", extra={"version": self.version, "corridors": len(base_rates)})
+
+    def _compute_base_rates(self, outcomes: Dict, prior_strength: float) -> Tuple[Dict[CorridorKey, float], Optional[float]]:
+        columns = outcomes.get("columns", list(OUTCOME_COLUMNS))
+        position = {name: columns.index(name) for name in OUTCOME_COLUMNS}
+        rows = outcomes["rows"]
+        applications = np.array([row[position["applications"]] for row in rows], dtype=np.float64)
+        approvals = np.array([row[position["approvals"]] for row in rows], dtype=np.float64)
+        if not rows or applications.sum() <= 0:
+            return {}, None
+        overall_rate = float(approvals.sum() / applications.sum())
+
+        keys = [
+            (
+                self.rules.normalize(row[position["nationality"]]),
+                self.rules.normalize(row[position["destination_country"]]),
+                self.rules.normalize(row[position["purpose"]]),
+            )
+            for row in rows
+        ]
+        base_rates: Dict[CorridorKey, float] = {}
+        # Corridors, then destination x purpose, then purpose aggregates
+        for level in range(3):
+            grouped = [_corridor_probes(key)[level] for key in keys]
+            groups = list(dict.fromkeys(grouped))
+            group_index = {key: i for i, key in enumerate(groups)}
+            index = np.fromiter((group_index[key] for key in grouped), dtype=np.intp, count=len(grouped))
+            group_applications = np.bincount(index, weights=applications, minlength=len(groups))
+            group_approvals = np.bincount(index, weights=approvals, minlength=len(groups))
+            rates = (group_approvals + prior_strength * overall_rate) / (group_applications + prior_strength)
+            for key, rate in zip(groups, rates.tolist()):
+                # Rows recorded against a wildcard already are aggregates themselves
+                base_rates.setdefault(key, rate)
+        return base_rates, overall_rate
+
+    def corridor_key(self, request: ConsultationRequest) -> CorridorKey:
+        normalize = self.rules.normalize
+        return normalize(request.nationality), normalize(request.destination_country), normalize(request.travel_purpose)
+
+    def base_rate(self, key: CorridorKey) -> Optional[float]:
+        """
+        Smoothed historical approval rate for the corridor, falling back to its
+        destination and purpose aggregates and then the overall rate; None
+        without an outcomes table
+        """
+        for probe in _corridor_probes(key):
+            rate = self._base_rates.get(probe)
+            if rate is not None:
+                return rate
+        return self.overall_rate
+
+    def corridor_adjustment(self, key: CorridorKey) -> float:
+        for probe in _corridor_probes(key):
+            adjustment = self._adjustments.get(probe)
+            if adjustment is not None:
+                return adjustment
+        return 0.0
+
+    def request_adjustment(self, request: ConsultationRequest) -> float:
+        # Keyed by the request's own spelling, skipping normalization for
+        # corridors seen before
+        spelling = (request.nationality, request.destination_country, request.travel_purpose)
+        adjustment = self._request_adjustments.get(spelling)
+        if adjustment is None:
+            adjustment = self.corridor_adjustment(self.corridor_key(request))
+            if len(self._request_adjustments) < MAX_CACHED_CORRIDORS:
+                self._request_adjustments[spelling] = adjustment
+        return adjustment
+
+    def score_features(
+        self,
+        residency: np.ndarray,
+        purpose: np.ndarray,
+        rejections: np.ndarray,
+        adjustment: np.ndarray,
+    ) -> np.ndarray:
+        """
+        Scores for arrays of feature codes (indexes into RESIDENCY_STATUSES and
+        TRAVEL_PURPOSES), rejection flags and corridor adjustments. Arrays
+        broadcast against each other.
+        """
+        scores = self._base + self._residency[residency] + self._purpose[purpose] + self._rejection * rejections + adjustment
+        return np.clip(np.rint(scores), CONFIDENCE_FLOOR, CONFIDENCE_CEILING).astype(np.int64)
+
+    def score_many(self, requests: Sequence[ConsultationRequest]) -> np.ndarray:
+        count = len(requests)
+        residency = np.fromiter((_RESIDENCY_INDEX[ResidencyStatus(r.residency_status)] for r in requests), dtype=np.intp, count=count)
+        purpose = np.fromiter((_PURPOSE_INDEX[TravelPurpose(r.travel_purpose)] for r in requests), dtype=np.intp, count=count)
+        rejections = np.fromiter((r.previous_rejections for r in requests), dtype=np.float64, count=count)
+        adjustment = np.fromiter((self.request_adjustment(r) for r in requests), dtype=np.float64, count=count)
+        return self.score_features(residency, purpose, rejections, adjustment)
+
+    def score(self, request: ConsultationRequest) -> int:
+        """
+        Confidence score for an applicant profile, between CONFIDENCE_FLOOR and
+        CONFIDENCE_CEILING
+        """
+        # Same as score_features, without the array overhead for one request
+        score = (
+            self._base
+            + self._residency_weights[_RESIDENCY_INDEX[ResidencyStatus(request.residency_status)]]
+            + self._purpose_weights[_PURPOSE_INDEX[TravelPurpose(request.travel_purpose)]]
+            + self._rejection * request.previous_rejections
+            + self.request_adjustment(request)
+        )
+        return int(min(CONFIDENCE_CEILING, max(CONFIDENCE_FLOOR, round(score))))
+
+    def bands(self, keys: Sequence[CorridorKey]) -> np.ndarray:
+        """
+        Score range over residency statuses for each corridor, without and
+        with previous rejections: shape (len(keys), 2, 2) holding
+        [[low, high], [low_with_rejections, high_with_rejections]]
+        """
+        purpose = np.array([_PURPOSE_INDEX[TravelPurpose(key[2])] for key in keys], dtype=np.intp)
+        adjustment = np.array([self.corridor_adjustment(key) for key in keys], dtype=np.float64)
+        scores = self.score_features(
+            np.arange(len(RESIDENCY_STATUSES))[None, None, :],
+            purpose[:, None, None],
+            np.array([0.0, 1.0])[None, :, None],
+            adjustment[:, None, None],
+        )
+        return np.stack([scores.min(axis=2), scores.max(axis=2)], axis=-1)
+
+
+_model: Optional[ScoringModel] = None
+
+
+def get_scoring_model() -> ScoringModel:
+    """
+    Return the process-wide scoring model, loading it on first use
+    """
+    global _model
+    if _model is None:
+        settings = get_settings()
+        _model = ScoringModel(
+            get_visa_rules(),
+            model_path=settings.scoring_model_path or DEFAULT_MODEL_PATH,
+            outcomes_path=settings.scoring_outcomes_path,
+        )
+    return _model
+
+
+def _read_requests(path: str) -> List[ConsultationRequest]:
+    with open(path) as f:
+        return [ConsultationRequest.model_validate_json(line) for line in f if line.strip()]
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Re-score consultation requests with the current scoring model")
+    parser.add_argument("input", help="JSON lines file of consultation requests")
+    parser.add_argument("--output", help="write one JSON line per request with its new and baseline scores")
+    parser.add_argument("--model", default=settings.scoring_model_path or DEFAULT_MODEL_PATH)
+    parser.add_argument("--outcomes", default=settings.scoring_outcomes_path)
+    parser.add_argument("--baseline-outcomes", help="outcomes table to compare against (default: weights only)")
+    args = parser.parse_args()
+
+    requests = _read_requests(args.input)
+    rules = get_visa_rules()
+    model = ScoringModel(rules, args.model, args.outcomes)
+    baseline = ScoringModel(rules, args.model, args.baseline_outcomes)
+
+    start = time.perf_counter()
+    scores = model.score_many(requests)
+    elapsed = time.perf_counter() - start
+    baseline_scores = baseline.score_many(requests)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            for index, (score, previous) in enumerate(zip(scores.tolist(), baseline_scores.tolist())):
+                f.write(json.dumps({"index": index, "confidence_score": score, "baseline_score": previous}) + "\n")
+
+    shift = scores - baseline_scores
+    print(f"Scored {len(requests)} requests with model {model.version} in {elapsed * 1000:.1f} ms")
+    if len(requests):
+        print(f"  mean score {scores.mean():.1f} (baseline {baseline.version}: {baseline_scores.mean():.1f})")
+        print(f"  changed {int(np.count_nonzero(shift))}, mean |shift| {np.abs(shift).mean():.2f}, "
+              f"range {int(shift.min())}..{int(shift.max())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import stripe
+from app.settings import get_settings
+
+# The Stripe SDK is synchronous. Calls run on a small dedicated thread pool
+# (STRIPE_MAX_WORKERS) so slow Stripe round trips never block the event loop
+# or starve the default executor; RequestsClient keeps one keep-alive session
+# per thread, so the pool size also bounds open connections.
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def configure_stripe() -> None:
+    settings = get_settings()
+    stripe.api_key = settings.stripe_secret_key
+    # Allows pointing the SDK at a local stub server
+    if settings.stripe_api_base:
+        stripe.api_base = settings.stripe_api_base
+    # POSTs are retried with an idempotency key, so retries are safe
+    stripe.max_network_retries = settings.stripe_max_network_retries
+    stripe.default_http_client = stripe.RequestsClient(timeout=settings.stripe_timeout)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        # Configured on first use so importing the app needs no Stripe keys
+        configure_stripe()
+        _executor = ThreadPoolExecutor(max_workers=get_settings().stripe_max_workers, thread_name_prefix="stripe")
+    return _executor
+
+
+async def call_stripe(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking Stripe SDK call off the event loop
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def close_stripe() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
@@ -0,0 +1,315 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+from app.models.consultation import ConsultationRequest
+from app.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+WILDCARD = "*"
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "visa_rules.json")
+
+# (nationality, residency_status, current_country, destination_country, purpose)
+RuleKey = Tuple[str, str, str, str, str]
+
+# Key positions relaxed to the wildcard, most specific first. Every lookup is
+# a fixed number of dict probes regardless of table size.
+_LOOKUP_MASKS = (
+    (),
+    (4,),
+    (1, 2),
+    (1, 2, 4),
+    (0, 1, 2),
+    (0, 1, 2, 4),
+    (0, 1, 2, 3, 4),
+)
+
+# Upper bound on remembered lookups without a specific entry
+MAX_MISSING_KEYS = 10000
+
+
+@dataclass(frozen=True, slots=True)
+class VisaRule:
+    visa_required: bool
+    processing_time: str
+    validity: str
+    entry_type: str
+    sources: Tuple[str, ...]
+    fetched_at: float
+
+    def to_research(self, version: str) -> Dict:
+        return {
+            "visa_required": self.visa_required,
+            "processing_time": self.processing_time,
+            "validity": self.validity,
+            "entry_type": self.entry_type,
+            "sources": list(self.sources),
+            "rules_version": version,
+            "last_verified": _format_time(self.fetched_at),
+        }
+
+
+def _parse_time(value: str) -> float:
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def _format_time(value: float) -> str:
+    return datetime.fromtimestamp(value, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _rule_from_entry(entry: Dict) -> VisaRule:
+    return VisaRule(
+        visa_required=bool(entry["visa_required"]),
+        processing_time=entry["processing_time"],
+        validity=entry["validity"],
+        entry_type=entry["entry_type"],
+        sources=tuple(entry.get("sources", ())),
+        fetched_at=_parse_time(entry["fetched_at"]) if "fetched_at" in entry else time.time(),
+    )
+
+
+def _entry_from_rule(key: RuleKey, rule: VisaRule) -> Dict:
+    return {
+        "nationality": key[0],
+        "residency_status": key[1],
+        "current_country": key[2],
+        "destination_country": key[3],
+        "purpose": key[4],
+        "visa_required": rule.visa_required,
+        "processing_time": rule.processing_time,
+        "validity": rule.validity,
+        "entry_type": rule.entry_type,
+        "sources": list(rule.sources),
+        "fetched_at": _format_time(rule.fetched_at),
+    }
+
+
+class RuleFetcher:
+    """
+    Source of fresh rule data for the refresh job (web search, partner API, ...)
+    """
+
+    async def fetch(self, key: RuleKey, current: Optional[VisaRule]) -> Optional[Dict]:
+        """
+        Return a rule entry for `key`, or None if nothing new is known.
+        `current` is the entry stored for exactly this key, if any.
+        """
+        raise NotImplementedError
+
+
+class StubRuleFetcher(RuleFetcher):
+    """
+    Local stand-in until a search-backed fetcher exists: re-confirms
+    existing entries and learns nothing about new keys
+    """
+
+    async def fetch(self, key: RuleKey, current: Optional[VisaRule]) -> Optional[Dict]:
+        if current is None:
+            return None
+        return _entry_from_rule(key, replace(current, fetched_at=time.time()))
+
+
+class VisaRulesIndex:
+    """
+    In-memory index of visa requirements keyed by applicant corridor.
+
+    Loaded from the versioned data file shipped with the app, plus an optional
+    overlay file holding entries refreshed since. Lookups never touch the
+    network; stale and missing entries are re-fetched by `refresh`.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_RULES_PATH,
+        overlay_path: Optional[str] = None,
+        fetcher: Optional[RuleFetcher] = None,
+        max_age: float = 7 * 86400,
+    ):
+        self.path = path
+        self.overlay_path = overlay_path
+        self.fetcher = fetcher or StubRuleFetcher()
+        self.max_age = max_age
+        self.version = "unknown"
+        self._rules: Dict[RuleKey, VisaRule] = {}
+        self._overlay: Dict[RuleKey, VisaRule] = {}
+        self._aliases: Dict[str, str] = {}
+        self._missing: Dict[RuleKey, None] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def keys(self) -> List[RuleKey]:
+        return list(self._rules)
+
+    def load(self) -> None:
+        with open(self.path) as f:
+            data = json.load(f)
+        self.version = data["version"]
+        self._aliases = {alias.lower(): name for alias, name in data.get("aliases", {}).items()}
+
+        rules = {self._entry_key(entry): _rule_from_entry(entry) for entry in data["entries"]}
+
+        overlay = {}
+        if self.overlay_path and os.path.exists(self.overlay_path):
+            with open(self.overlay_path) as f:
+                overlay_data = json.load(f)
+            # Refreshes made against an older data file are discarded
+            if overlay_data.get("base_version") == self.version:
+                overlay = {self._entry_key(entry): _rule_from_entry(entry) for entry in overlay_data["entries"]}
+        rules.update(overlay)
+
+        self._rules = rules
+        self._overlay = overlay
+
+    def normalize(self, value) -> str:
+        if isinstance(value, Enum):
+            value = value.value
+        value = " ".join(str(value or "").split()).lower()
+        return self._aliases.get(value, value)
+
+    def _entry_key(self, entry: Dict) -> RuleKey:
+        return (
+            self.normalize(entry["nationality"]),
+            self.normalize(entry["residency_status"]),
+            self.normalize(entry["current_country"]),
+            self.normalize(entry["destination_country"]),
+            self.normalize(entry["purpose"]),
+        )
+
+    def key_for(self, request: ConsultationRequest) -> RuleKey:
+        return (
+            self.normalize(request.nationality),
+            self.normalize(request.residency_status),
+            self.normalize(request.current_country),
+            self.normalize(request.destination_country),
+            self.normalize(request.travel_purpose),
+        )
+
+    def resolve(self, key: RuleKey) -> Optional[VisaRule]:
+        for mask in _LOOKUP_MASKS:
+            probe = key if not mask else tuple(WILDCARD if i in mask else part for i, part in enumerate(key))
+            rule = self._rules.get(probe)
+            if rule is not None:
+                return rule
+        return None
+
+    def lookup(self, request: ConsultationRequest) -> Optional[VisaRule]:
+        """
+        Most specific rule for the request's corridor
+        """
+        key = self.key_for(request)
+        rule = self._rules.get(key)
+        if rule is not None:
+            return rule
+
+        # Remember the corridor so the refresh job can try to learn it
+        if key not in self._missing and len(self._missing) < MAX_MISSING_KEYS:
+            self._missing[key] = None
+        return self.resolve(key)
+
+    def stale_keys(self, now: Optional[float] = None) -> List[RuleKey]:
+        now = now if now is not None else time.time()
+        stale = [key for key, rule in self._rules.items() if now - rule.fetched_at > self.max_age]
+        stale.sort(key=lambda key: self._rules[key].fetched_at)
+        return stale
+
+    async def refresh(self, limit: int = 100, concurrency: int = 4) -> int:
+        """
+        Re-fetch stale entries and corridors seen without a specific entry.
+        Returns the number of entries updated.
+        """
+        keys = self.stale_keys() + list(self._missing)
+        keys = list(dict.fromkeys(keys))[:limit]
+        if not keys:
+            return 0
+
+        semaphore = asyncio.Semaphore(concurrency)
+        updates: Dict[RuleKey, VisaRule] = {}
+
+        async def refresh_key(key: RuleKey) -> None:
+            async with semaphore:
+                try:
+                    entry = await self.fetcher.fetch(key, self._rules.get(key))
+                except Exception as e:
+                    logger.warning("Visa rule refresh error: %s", e, extra={"rule_key": list(key)})
+                    return
+            self._missing.pop(key, None)
+            if entry is not None:
+                updates[key] = _rule_from_entry(entry)
+
+        await asyncio.gather(*(refresh_key(key) for key in keys))
+
+        if updates:
+            # Single dict swap so concurrent lookups never see a partial update
+            rules = dict(self._rules)
+            rules.update(updates)
+            self._rules = rules
+            self._overlay.update(updates)
+            await asyncio.to_thread(self._save_overlay)
+        return len(updates)
+
+    def _save_overlay(self) -> None:
+        if not self.overlay_path:
+            return
+        data = {
+            "base_version": self.version,
+            "entries": [_entry_from_rule(key, rule) for key, rule in self._overlay.items()],
+        }
+        tmp_path = f"{self.overlay_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.overlay_path)
+
+    async def _refresh_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                updated = await self.refresh()
+                if updated:
+                    logger.info("Visa rules refreshed", extra={"updated": updated})
+            except Exception:
+                logger.exception("Visa rules refresh error")
+
+    def start_refresh(self, interval: float) -> None:
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop(interval))
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+
+
+_index: Optional[VisaRulesIndex] = None
+
+
+def get_visa_rules() -> VisaRulesIndex:
+    """
+    Return the process-wide rules index, loading it on first use
+    """
+    global _index
+    if _index is None:
+        settings = get_settings()
+        _index = VisaRulesIndex(
+            path=settings.visa_rules_path or DEFAULT_RULES_PATH,
+            overlay_path=settings.visa_rules_overlay_path,
+            max_age=settings.visa_rules_max_age,
+        )
+    return _index
+
+
+async def close_visa_rules() -> None:
+    global _index
+    if _index is not None:
+        await _index.close()
+        _index = None
@@ -0,0 +1,153 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+from dotenv import load_dotenv
+
+
+def _env(name: str, default: Optional[str] = None) -> Optional[str]:
+    # Empty values (NAME= in .env) count as unset
+    return os.getenv(name) or default
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Process configuration, read from the environment (and .env) once.
+    Variables are documented in .env.example.
+    """
+    # OpenAI
+    openai_api_key: Optional[str] = None
+    openai_base_url: Optional[str] = None
+    openai_timeout: float = 60.0
+    openai_connect_timeout: float = 5.0
+    openai_max_connections: int = 100
+    openai_max_keepalive: int = 20
+    openai_keepalive_expiry: float = 30.0
+
+    # Stripe
+    stripe_secret_key: Optional[str] = None
+    stripe_webhook_secret: Optional[str] = None
+    stripe_api_base: Optional[str] = None
+    stripe_max_network_retries: int = 2
+    stripe_max_workers: int = 8
+    stripe_timeout: float = 20.0
+    frontend_url: str = "http://localhost:3000"
+
+    # Stage cache
+    cache_backend: str = "memory"
+    cache_ttl: float = 86400.0
+    cache_size: int = 1024
+    cache_path: str = "consultation_cache.db"
+
+    # Consultation storage and background jobs
+    store_backend: str = "sqlite"
+    db_path: str = "consultations.db"
+    job_workers: int = 4
+    job_max_attempts: int = 3
+
+    # Batch consultations
+    batch_max_size: int = 100
+    batch_concurrency: int = 4
+
+    # Visa rules index
+    visa_rules_path: Optional[str] = None
+    visa_rules_overlay_path: Optional[str] = None
+    visa_rules_max_age: float = 7 * 86400.0
+    visa_rules_refresh_interval: float = 3600.0
+
+    # Precomputed previews
+    preview_table_path: str = "preview_table.json"
+    preview_reload_interval: float = 300.0
+
+    # Confidence scoring
+    scoring_model_path: Optional[str] = None
+    scoring_outcomes_path: Optional[str] = None
+
+    # Response compression
+    compression_min_size: int = 1000
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    # Logging
+    log_format: str = "json"
+    log_level: str = "INFO"
+
+    # PDF reports
+    pdf_workers: int = 2
+    pdf_cache_dir: str = "pdf_cache"
+
+    # LLM gateway and model routing
+    llm_rpm_limit: float = 500.0
+    llm_tpm_limit: float = 150000.0
+    llm_concurrency_initial: int = 16
+    llm_concurrency_min: int = 2
+    llm_concurrency_max: int = 64
+    llm_max_attempts: int = 3
+    llm_circuit_failures: int = 5
+    llm_circuit_reset: float = 30.0
+    model_routes_path: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        d = cls()
+        return cls(
+            openai_api_key=_env("OPENAI_API_KEY"),
+            openai_base_url=_env("OPENAI_BASE_URL"),
+            openai_timeout=float(_env("OPENAI_TIMEOUT", str(d.openai_timeout))),
+            openai_connect_timeout=float(_env("OPENAI_CONNECT_TIMEOUT", str(d.openai_connect_timeout))),
+            openai_max_connections=int(_env("OPENAI_MAX_CONNECTIONS", str(d.openai_max_connections))),
+            openai_max_keepalive=int(_env("OPENAI_MAX_KEEPALIVE", str(d.openai_max_keepalive))),
+            openai_keepalive_expiry=float(_env("OPENAI_KEEPALIVE_EXPIRY", str(d.openai_keepalive_expiry))),
+            stripe_secret_key=_env("STRIPE_SECRET_KEY"),
+            stripe_webhook_secret=_env("STRIPE_WEBHOOK_SECRET"),
+            stripe_api_base=_env("STRIPE_API_BASE"),
+            stripe_max_network_retries=int(_env("STRIPE_MAX_NETWORK_RETRIES", str(d.stripe_max_network_retries))),
+            stripe_max_workers=int(_env("STRIPE_MAX_WORKERS", str(d.stripe_max_workers))),
+            stripe_timeout=float(_env("STRIPE_TIMEOUT", str(d.stripe_timeout))),
+            frontend_url=_env("FRONTEND_URL", d.frontend_url),
+            cache_backend=_env("CONSULTATION_CACHE_BACKEND", d.cache_backend).lower(),
+            cache_ttl=float(_env("CONSULTATION_CACHE_TTL", str(d.cache_ttl))),
+            cache_size=int(_env("CONSULTATION_CACHE_SIZE", str(d.cache_size))),
+            cache_path=_env("CONSULTATION_CACHE_PATH", d.cache_path),
+            store_backend=_env("CONSULTATION_STORE", d.store_backend).lower(),
+            db_path=_env("CONSULTATION_DB_PATH", d.db_path),
+            job_workers=int(_env("JOB_WORKERS", str(d.job_workers))),
+            job_max_attempts=int(_env("JOB_MAX_ATTEMPTS", str(d.job_max_attempts))),
+            batch_max_size=int(_env("BATCH_MAX_SIZE", str(d.batch_max_size))),
+            batch_concurrency=int(_env("BATCH_CONCURRENCY", str(d.batch_concurrency))),
+            visa_rules_path=_env("VISA_RULES_PATH"),
+            visa_rules_overlay_path=_env("VISA_RULES_OVERLAY_PATH"),
+            visa_rules_max_age=float(_env("VISA_RULES_MAX_AGE", str(d.visa_rules_max_age))),
+            visa_rules_refresh_interval=float(_env("VISA_RULES_REFRESH_INTERVAL", str(d.visa_rules_refresh_interval))),
+            preview_table_path=_env("PREVIEW_TABLE_PATH", d.preview_table_path),
+            preview_reload_interval=float(_env("PREVIEW_RELOAD_INTERVAL", str(d.preview_reload_interval))),
+            scoring_model_path=_env("SCORING_MODEL_PATH"),
+            scoring_outcomes_path=_env("SCORING_OUTCOMES_PATH"),
+            compression_min_size=int(_env("COMPRESSION_MIN_SIZE", str(d.compression_min_size))),
+            compression_gzip_level=int(_env("COMPRESSION_GZIP_LEVEL", str(d.compression_gzip_level))),
+            compression_brotli_quality=int(_env("COMPRESSION_BROTLI_QUALITY", str(d.compression_brotli_quality))),
+            log_format=_env("LOG_FORMAT", d.log_format).lower(),
+            log_level=_env("LOG_LEVEL", d.log_level).upper(),
+            pdf_workers=int(_env("PDF_WORKERS", str(d.pdf_workers))),
+            pdf_cache_dir=_env("PDF_CACHE_DIR", d.pdf_cache_dir),
+            llm_rpm_limit=float(_env("LLM_RPM_LIMIT", str(d.llm_rpm_limit))),
+            llm_tpm_limit=float(_env("LLM_TPM_LIMIT", str(d.llm_tpm_limit))),
+            llm_concurrency_initial=int(_env("LLM_CONCURRENCY_INITIAL", str(d.llm_concurrency_initial))),
+            llm_concurrency_min=int(_env("LLM_CONCURRENCY_MIN", str(d.llm_concurrency_min))),
+            llm_concurrency_max=int(_env("LLM_CONCURRENCY_MAX", str(d.llm_concurrency_max))),
+            llm_max_attempts=int(_env("LLM_MAX_ATTEMPTS", str(d.llm_max_attempts))),
+            llm_circuit_failures=int(_env("LLM_CIRCUIT_FAILURES", str(d.llm_circuit_failures))),
+            llm_circuit_reset=float(_env("LLM_CIRCUIT_RESET", str(d.llm_circuit_reset))),
+            model_routes_path=_env("MODEL_ROUTES_PATH"),
+        )
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Return the process-wide settings, loading .env on first use. Values in
+    the real environment take precedence over .env.
+    """
+    load_dotenv()
+    return Settings.from_env()
@@ -0,0 +1,12 @@
+from uvicorn.workers import UvicornWorker as BaseUvicornWorker
+
+
+class UvicornWorker(BaseUvicornWorker):
+    """
+    Gunicorn worker serving the app on uvloop with the httptools parser.
+    Both are pinned rather than "auto" so a broken install fails at boot
+    instead of silently falling back to the slower pure-Python versions, and
+    a failing lifespan startup stops the worker instead of serving without
+    its clients.
+    """
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
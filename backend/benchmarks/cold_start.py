@@ -0,0 +1,128 @@
+"""
+Cold-start benchmark: how long a fresh process takes to import the app and
+how long the server takes from launch until every worker has finished its
+lifespan startup and /api/health answers. Run from the backend directory:
+
+    python -m benchmarks.cold_start --runs 5 --server uvicorn gunicorn --workers 2
+
+Workers report their own startup time in the "Worker started" log line;
+those are summarised too. No LLM or Stripe calls are made.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.load_test import BACKEND_DIR, free_port
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print((time.perf_counter() - t) * 1000)"
+
+
+def measure_import(env: Dict[str, str]) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_boot(server: str, workers: int, env: Dict[str, str], timeout: float = 60.0) -> Dict:
+    port = free_port()
+    if server == "gunicorn":
+        args = [sys.executable, "-m", "gunicorn", "app.main:app", "-c", "gunicorn.conf.py"]
+        env = dict(env, PORT=str(port), WEB_CONCURRENCY=str(workers))
+    else:
+        args = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+
+    started_workers: List[float] = []
+    launched = time.perf_counter()
+    process = subprocess.Popen(args, cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+    def read_logs():
+        for line in process.stdout:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get("message") == "Worker started":
+                started_workers.append(entry["startup_ms"])
+
+    reader = threading.Thread(target=read_logs, daemon=True)
+    reader.start()
+
+    expected = workers if server == "gunicorn" else 1
+    first_healthy = None
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{server} exited with {process.returncode}")
+            if first_healthy is None:
+                try:
+                    if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                        first_healthy = time.perf_counter() - launched
+                except httpx.HTTPError:
+                    pass
+            if first_healthy is not None and len(started_workers) >= expected:
+                return {
+                    "first_healthy_ms": first_healthy * 1000,
+                    "all_workers_ms": (time.perf_counter() - launched) * 1000,
+                    "lifespan_ms": list(started_workers),
+                }
+            time.sleep(0.02)
+        raise RuntimeError(f"{server} did not start {expected} workers within {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def summarise(label: str, values: List[float]) -> None:
+    print(f"  {label:<22} median {statistics.median(values):8.1f} ms   max {max(values):8.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure app import and server boot time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--server", nargs="+", choices=["uvicorn", "gunicorn"], default=["uvicorn", "gunicorn"])
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="visa-guru-coldstart-")
+    env = dict(
+        os.environ,
+        # Placeholder credentials: startup builds the clients but calls nothing
+        OPENAI_API_KEY=os.getenv("OPENAI_API_KEY", "sk-cold-start"),
+        CONSULTATION_DB_PATH=os.path.join(workdir, "consultations.db"),
+        PDF_CACHE_DIR=os.path.join(workdir, "pdf_cache"),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, "metrics"),
+        LOG_FORMAT="json",
+        LOG_LEVEL="INFO",
+    )
+    os.makedirs(env["PROMETHEUS_MULTIPROC_DIR"])
+
+    imports = [measure_import(env) for _ in range(args.runs)]
+    print("import app.main")
+    summarise("import", imports)
+
+    for server in args.server:
+        boots = [measure_boot(server, args.workers, env) for _ in range(args.runs)]
+        label = f"{server} ({args.workers} workers)" if server == "gunicorn" else server
+        print(label)
+        summarise("first healthy", [b["first_healthy_ms"] for b in boots])
+        summarise("all workers started", [b["all_workers_ms"] for b in boots])
+        summarise("lifespan (per worker)", [ms for b in boots for ms in b["lifespan_ms"]])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Fake OpenAI and Stripe APIs for benchmarks and local testing.
+
+Serves just enough of both APIs for the backend: chat completions (plain,
+tool calls and streaming) and Checkout Session create/retrieve. Latency and
+error rates are configurable so the backend can be measured against a slow
+or flaky provider:
+
+    python -m benchmarks.fake_services --port 9100 --llm-latency-ms 800 --llm-jitter-ms 400 --llm-error-rate 0.02
+
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:9100/v1 and
+STRIPE_API_BASE=http://127.0.0.1:9100.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_COVER_LETTER = (
+    "Dear Visa Officer,\n\n"
+    "I am writing to apply for a visa for my upcoming trip. I have attached all required "
+    "documents, including proof of employment, financial statements and my travel itinerary.\n\n"
+    "I will return home at the end of my stay to resume my position and family commitments.\n\n"
+    "Sincerely,\nApplicant"
+)
+
+_CHECKLIST = {
+    "documents": [
+        {"name": "Valid Passport", "priority": "high", "description": "Valid for 6 months beyond stay", "notes": None},
+        {"name": "Bank Statements", "priority": "high", "description": "Last 3 months", "notes": "Show stable balance"},
+        {"name": "Employment Letter", "priority": "medium", "description": "Confirms leave and return", "notes": None},
+        {"name": "Travel Itinerary", "priority": "medium", "description": "Flights and accommodation", "notes": None},
+    ]
+}
+
+
+@dataclass
+class FaultProfile:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    # Share of injected errors that are 429s (with Retry-After) rather than 500s
+    rate_limit_share: float = 0.7
+
+    async def delay(self, scale: float = 1.0) -> None:
+        latency = max(0.0, random.gauss(self.latency_ms, self.jitter_ms / 2) if self.jitter_ms else self.latency_ms)
+        if latency:
+            await asyncio.sleep(latency * scale / 1000)
+
+    def fault(self):
+        if self.error_rate and random.random() < self.error_rate:
+            if random.random() < self.rate_limit_share:
+                return JSONResponse(
+                    {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                    status_code=429,
+                    headers={"retry-after-ms": "250"},
+                )
+            return JSONResponse({"error": {"message": "Upstream overloaded", "type": "server_error"}}, status_code=500)
+        return None
+
+
+def create_app(llm: FaultProfile, stripe: FaultProfile, stream_chunks: int = 20) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI / Stripe")
+    counts: Dict[str, int] = {"chat": 0, "chat_errors": 0, "stripe": 0, "stripe_errors": 0}
+    sessions: Dict[str, Dict] = {}
+    ids = itertools.count(1)
+
+    @app.get("/stats")
+    async def stats():
+        return counts
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        counts["chat"] += 1
+        fault = llm.fault()
+        if fault is not None:
+            counts["chat_errors"] += 1
+            await llm.delay(0.1)
+            return fault
+
+        model = body.get("model", "gpt-4")
+        if body.get("stream"):
+            if body.get("tools"):
+                # Tool-call arguments arrive in pieces, like the real API streams them
+                arguments = json.dumps(_CHECKLIST)
+                size = max(1, len(arguments) // stream_chunks)
+                deltas = [
+                    {"tool_calls": [{"index": 0, "function": {"arguments": arguments[start:start + size]}}]}
+                    for start in range(0, len(arguments), size)
+                ]
+                deltas[0]["tool_calls"][0].update(
+                    id="call_fake", type="function", function={
+                        "name": body["tools"][0]["function"]["name"], "arguments": arguments[:size],
+                    }
+                )
+            else:
+                words = _COVER_LETTER.split(" ")
+                per_chunk = max(1, len(words) // stream_chunks)
+                deltas = [
+                    {"content": " ".join(words[start:start + per_chunk]) + " "}
+                    for start in range(0, len(words), per_chunk)
+                ]
+
+            async def chunks():
+                for delta in deltas:
+                    await llm.delay(1.0 / stream_chunks)
+                    chunk = {
+                        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(chunks(), media_type="text/event-stream")
+
+        await llm.delay()
+        if body.get("tools"):
+            message = {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{
+                    "id": "call_fake",
+                    "type": "function",
+                    "function": {"name": body["tools"][0]["function"]["name"], "arguments": json.dumps(_CHECKLIST)},
+                }],
+            }
+        else:
+            message = {"role": "assistant", "content": _COVER_LETTER}
+        return {
+            "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 600, "completion_tokens": 300, "total_tokens": 900},
+        }
+
+    @app.post("/v1/checkout/sessions")
+    async def create_checkout_session(request: Request):
+        form = await request.form()
+        counts["stripe"] += 1
+        await stripe.delay()
+        fault = stripe.fault()
+        if fault is not None:
+            counts["stripe_errors"] += 1
+            return fault
+        session_id = f"cs_test_{next(ids)}"
+        sessions[session_id] = {
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"https://checkout.stripe.test/{session_id}",
+            # Paid straight away so verify/webhook flows can be exercised
+            "payment_status": "paid",
+            "customer_email": form.get("customer_email"),
+            "metadata": {"consultation_id": form.get("metadata[consultation_id]")},
+        }
+        return sessions[session_id]
+
+    @app.get("/v1/checkout/sessions/{session_id}")
+    async def retrieve_checkout_session(session_id: str):
+        counts["stripe"] += 1
+        await stripe.delay()
+        if session_id not in sessions:
+            return JSONResponse({"error": {"message": "No such checkout.session", "type": "invalid_request_error"}}, status_code=404)
+        return sessions[session_id]
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI and Stripe APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-jitter-ms", type=float, default=300)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--stripe-latency-ms", type=float, default=300)
+    parser.add_argument("--stripe-error-rate", type=float, default=0.0)
+    parser.add_argument("--stream-chunks", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app(
+        FaultProfile(args.llm_latency_ms, args.llm_jitter_ms, args.llm_error_rate),
+        FaultProfile(args.stripe_latency_ms, args.stripe_latency_ms / 4, args.stripe_error_rate),
+        stream_chunks=args.stream_chunks,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,382 @@
+"""
+Load test for the API against fake OpenAI and Stripe backends.
+
+Boots benchmarks.fake_services and the API (uvicorn app.main:app) as
+subprocesses, drives each scenario at a fixed concurrency and reports
+requests/s, p50/p95/p99 latency per endpoint and the server's event-loop lag
+(read from /api/metrics). Run from the backend directory:
+
+    python -m benchmarks.load_test --concurrency 20 --duration 20
+    python -m benchmarks.load_test --compare           # exit 1 on regression against the baseline
+    python -m benchmarks.load_test --update-baseline   # record this machine's numbers
+
+Scenarios:
+    analyze   POST /api/consultation/analyze (full LLM pipeline)
+    preview   POST /api/consultation/preview
+    payment   preview, then /payment/create-checkout, a signed webhook and /payment/verify
+
+Baselines are only comparable on the same machine and settings; the
+settings are stored next to the numbers and a mismatch is reported.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from prometheus_client.parser import text_string_to_metric_families
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(BACKEND_DIR, "benchmarks", "baseline.json")
+WEBHOOK_SECRET = "whsec_benchmark"
+LOOP_LAG_METRIC = "visa_guru_event_loop_lag_seconds"
+
+NATIONALITIES = ["India", "China", "Nigeria", "Brazil", "Philippines", "Mexico", "Vietnam", "Germany"]
+DESTINATIONS = ["United States", "United Kingdom", "Canada", "Japan", "Germany", "Australia"]
+PURPOSES = ["tourism", "business", "study", "work", "family_visit"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_profile(index: int, distinct_profiles: int) -> Dict:
+    """
+    Applicant profile for request `index`. With distinct_profiles=0 every
+    request is unique, so neither the stage cache nor single-flight help.
+    """
+    n = index % distinct_profiles if distinct_profiles else index
+    return {
+        "nationality": NATIONALITIES[n % len(NATIONALITIES)],
+        "current_country": "United States",
+        "residency_status": "temporary_worker",
+        "destination_country": DESTINATIONS[n % len(DESTINATIONS)],
+        "travel_purpose": PURPOSES[n % len(PURPOSES)],
+        "travel_dates": "March 2027",
+        "duration": "2 weeks",
+        "previous_rejections": n % 7 == 0,
+        "additional_info": f"Benchmark applicant {n}",
+        "email": f"applicant{n}@example.com",
+    }
+
+
+def sign_webhook(payload: str, secret: str = WEBHOOK_SECRET) -> str:
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            raise
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            self.errors[name] += 1
+            response.raise_for_status()
+        self.samples[name].append(elapsed)
+        return response
+
+
+async def scenario_analyze(client, recorder: Recorder, index: int, profiles: int) -> None:
+    await recorder.call(client, "analyze", "POST", "/api/consultation/analyze", json=make_profile(index, profiles))
+
+
+async def scenario_preview(client, recorder: Recorder, index: int, profiles: int) -> None:
+    await recorder.call(client, "preview", "POST", "/api/consultation/preview", json=make_profile(index, profiles))
+
+
+async def scenario_payment(client, recorder: Recorder, index: int, profiles: int) -> None:
+    profile = make_profile(index, profiles)
+    preview = await recorder.call(client, "preview", "POST", "/api/consultation/preview", json=profile)
+    consultation_id = preview.json()["consultation_id"]
+
+    checkout = await recorder.call(
+        client, "create_checkout", "POST", "/api/payment/create-checkout",
+        json={"consultation_id": consultation_id, "email": profile["email"]},
+    )
+    session_id = checkout.json()["session_id"]
+
+    event = json.dumps({
+        "id": f"evt_bench_{index}_{session_id}",
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {"object": {
+            "id": session_id,
+            "object": "checkout.session",
+            "payment_status": "paid",
+            "metadata": {"consultation_id": consultation_id},
+        }},
+    })
+    await recorder.call(
+        client, "webhook", "POST", "/api/payment/webhook",
+        content=event, headers={"stripe-signature": sign_webhook(event), "content-type": "application/json"},
+    )
+    await recorder.call(client, "verify", "POST", "/api/payment/verify", params={"session_id": session_id})
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "analyze": scenario_analyze,
+    "preview": scenario_preview,
+    "payment": scenario_payment,
+}
+
+
+def loop_lag_buckets(metrics_text: str) -> Dict[float, float]:
+    buckets = {}
+    for family in text_string_to_metric_families(metrics_text):
+        if family.name != LOOP_LAG_METRIC:
+            continue
+        for sample in family.samples:
+            if sample.name == LOOP_LAG_METRIC + "_bucket":
+                buckets[float(sample.labels["le"])] = sample.value
+    return buckets
+
+
+def histogram_quantile(q: float, before: Dict[float, float], after: Dict[float, float]) -> Optional[float]:
+    """Quantile of the observations made between two scrapes, as Prometheus' histogram_quantile"""
+    bounds = sorted(after)
+    counts = [after[b] - before.get(b, 0.0) for b in bounds]
+    if not counts or counts[-1] <= 0:
+        return None
+    rank = q * counts[-1]
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, count in zip(bounds, counts):
+        if count >= rank:
+            if bound == float("inf"):
+                return lower_bound
+            width = count - lower_count
+            return lower_bound + (bound - lower_bound) * ((rank - lower_count) / width if width else 0.0)
+        lower_bound, lower_count = bound, count
+    return None
+
+
+async def run_scenario(base_url: str, name: str, concurrency: int, duration: float, profiles: int) -> Dict:
+    scenario = SCENARIOS[name]
+    recorder = Recorder()
+    counter = iter(range(10 ** 9))
+    # Unique indexes per run so repeated runs do not hit earlier results
+    offset = int(time.time() * 1000) % 10 ** 6 * 1000
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        before = loop_lag_buckets((await client.get("/api/metrics")).text)
+        deadline = time.perf_counter() + duration
+        start = time.perf_counter()
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                try:
+                    await scenario(client, recorder, offset + next(counter), profiles)
+                except httpx.HTTPError:
+                    pass
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+        after = loop_lag_buckets((await client.get("/api/metrics")).text)
+
+    endpoints = {}
+    for endpoint in sorted(set(recorder.samples) | set(recorder.errors)):
+        samples = recorder.samples[endpoint]
+        endpoints[endpoint] = {
+            "requests": len(samples),
+            "errors": recorder.errors[endpoint],
+            "rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(samples, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(samples, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 1),
+        }
+    lag_p50 = histogram_quantile(0.50, before, after)
+    lag_p99 = histogram_quantile(0.99, before, after)
+    return {
+        "endpoints": endpoints,
+        "loop_lag_p50_ms": round(lag_p50 * 1000, 2) if lag_p50 is not None else None,
+        "loop_lag_p99_ms": round(lag_p99 * 1000, 2) if lag_p99 is not None else None,
+    }
+
+
+def start_process(args: List[str], env: Dict[str, str], ready_url: str, timeout: float = 60.0) -> subprocess.Popen:
+    process = subprocess.Popen(args, cwd=BACKEND_DIR, env=env)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(args)} exited with {process.returncode}")
+        try:
+            if httpx.get(ready_url, timeout=1).status_code < 500:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{' '.join(args)} did not become ready within {timeout}s")
+
+
+def stop_process(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def print_report(results: Dict) -> None:
+    print(f"{'scenario':<9} {'endpoint':<16} {'reqs':>6} {'errs':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for scenario, result in results.items():
+        for endpoint, stats in result["endpoints"].items():
+            print(
+                f"{scenario:<9} {endpoint:<16} {stats['requests']:>6} {stats['errors']:>5} {stats['rps']:>8.2f} "
+                f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}"
+            )
+        print(f"{scenario:<9} {'(event loop lag)':<16} p50 {result['loop_lag_p50_ms']} ms, p99 {result['loop_lag_p99_ms']} ms")
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float, latency_slack_ms: float) -> List[str]:
+    """
+    Regressions beyond `tolerance` (relative) in throughput or p95 latency.
+    Latency must also grow by more than `latency_slack_ms`, since the
+    percentiles of millisecond endpoints swing widely between runs.
+    """
+    regressions = []
+    for scenario, result in results.items():
+        expected = baseline.get("results", {}).get(scenario)
+        if expected is None:
+            continue
+        for endpoint, stats in result["endpoints"].items():
+            base = expected["endpoints"].get(endpoint)
+            if base is None:
+                continue
+            if stats["rps"] < base["rps"] * (1 - tolerance):
+                regressions.append(f"{scenario}/{endpoint}: {stats['rps']} rps vs baseline {base['rps']}")
+            if stats["p95_ms"] > max(base["p95_ms"] * (1 + tolerance), base["p95_ms"] + latency_slack_ms):
+                regressions.append(f"{scenario}/{endpoint}: p95 {stats['p95_ms']} ms vs baseline {base['p95_ms']}")
+            if stats["errors"] > base["errors"]:
+                regressions.append(f"{scenario}/{endpoint}: {stats['errors']} errors vs baseline {base['errors']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the API against fake OpenAI/Stripe backends")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=["analyze", "preview", "payment"])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per scenario")
+    parser.add_argument("--profiles", type=int, default=0, help="distinct applicant profiles (0: every request unique)")
+    parser.add_argument("--app-workers", type=int, default=1)
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-jitter-ms", type=float, default=300)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--stripe-latency-ms", type=float, default=300)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", action="store_true", help="exit 1 if results regress against the baseline")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--latency-slack-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    settings = {
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "profiles": args.profiles,
+        "app_workers": args.app_workers,
+        "llm_latency_ms": args.llm_latency_ms,
+        "llm_jitter_ms": args.llm_jitter_ms,
+        "llm_error_rate": args.llm_error_rate,
+        "stripe_latency_ms": args.stripe_latency_ms,
+    }
+
+    fake_port, app_port = free_port(), free_port()
+    workdir = tempfile.mkdtemp(prefix="visa-guru-bench-")
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="sk-benchmark",
+        OPENAI_BASE_URL=f"http://127.0.0.1:{fake_port}/v1",
+        STRIPE_SECRET_KEY="sk_test_benchmark",
+        STRIPE_API_BASE=f"http://127.0.0.1:{fake_port}",
+        STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET,
+        CONSULTATION_DB_PATH=os.path.join(workdir, "consultations.db"),
+        CONSULTATION_CACHE_PATH=os.path.join(workdir, "stage_cache.db"),
+        PDF_CACHE_DIR=os.path.join(workdir, "pdf_cache"),
+        # The fake provider has no account limits to respect
+        LLM_RPM_LIMIT="0",
+        LLM_TPM_LIMIT="0",
+        LOG_LEVEL="WARNING",
+    )
+
+    fake = start_process(
+        [sys.executable, "-m", "benchmarks.fake_services", "--port", str(fake_port),
+         "--llm-latency-ms", str(args.llm_latency_ms), "--llm-jitter-ms", str(args.llm_jitter_ms),
+         "--llm-error-rate", str(args.llm_error_rate), "--stripe-latency-ms", str(args.stripe_latency_ms)],
+        env, f"http://127.0.0.1:{fake_port}/stats",
+    )
+    try:
+        api = start_process(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port),
+             "--workers", str(args.app_workers), "--log-level", "warning"],
+            env, f"http://127.0.0.1:{app_port}/api/health",
+        )
+        try:
+            results = {}
+            for name in args.scenarios:
+                results[name] = asyncio.run(
+                    run_scenario(f"http://127.0.0.1:{app_port}", name, args.concurrency, args.duration, args.profiles)
+                )
+        finally:
+            stop_process(api)
+    finally:
+        stop_process(fake)
+
+    print_report(results)
+    report = {"settings": settings, "results": results}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != settings:
+            print(f"Warning: baseline was recorded with different settings: {baseline.get('settings')}")
+        regressions = compare(results, baseline, args.tolerance, args.latency_slack_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+PDF rendering throughput under concurrency.
+
+Renders a batch of synthetic consultation reports through the same process
+pool the API uses and reports reports/s, pages/s and the worst event-loop
+stall seen while rendering. `--workers 0` renders inline on the event loop
+for comparison. Run from the backend directory:
+
+    python -m benchmarks.pdf_render --reports 200 --workers 0 1 2 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.models.consultation import ConsultationResult, DocumentItem
+from app.services.pdf_report import render_report
+
+
+def sample_result(index: int, documents: int) -> dict:
+    return ConsultationResult(
+        consultation_id=f"bench-{index}",
+        risk_assessment="Medium",
+        confidence_score=72,
+        documents_required=[
+            DocumentItem(
+                name=f"Supporting document {n}",
+                priority=("high", "medium", "low")[n % 3],
+                description="Certified copy issued within the last three months, "
+                            "translated into the destination country's official language. " * 2,
+                notes="Bring the original to the appointment" if n % 2 else None,
+            )
+            for n in range(documents)
+        ],
+        cover_letter="\n\n".join(
+            ["Dear Visa Officer,"]
+            + ["I am writing to apply for a visitor visa. " * 8] * 6
+            + ["Sincerely,\nApplicant"]
+        ),
+        strategic_notes=["Apply at least 6 weeks before travel", "Show proof of strong ties to home country"],
+        sources=["Official embassy website", "Immigration department guidelines"],
+        estimated_processing_time="2-4 weeks",
+    ).model_dump()
+
+
+def count_pages(pdf: bytes) -> int:
+    return pdf.count(b"/Type /Page\n")
+
+
+async def monitor_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Largest delay between when a sleep should have woken and when it did"""
+    worst = 0.0
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, loop.time() - expected)
+    return worst
+
+
+async def render_inline(payloads) -> list:
+    pdfs = []
+    for payload in payloads:
+        pdfs.append(render_report(payload))
+        # Let the lag monitor run between reports, as concurrent requests would
+        await asyncio.sleep(0)
+    return pdfs
+
+
+async def run(reports: int, workers: int, documents: int) -> dict:
+    payloads = [sample_result(i, documents) for i in range(reports)]
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+
+    if workers == 0:
+        render_report(payloads[0])
+        lag = asyncio.create_task(monitor_lag(stop))
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        pdfs = await render_inline(payloads)
+        elapsed = time.perf_counter() - start
+        stop.set()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            # Start the workers and load reportlab/jinja before timing
+            await asyncio.gather(*[loop.run_in_executor(executor, render_report, payloads[0]) for _ in range(workers)])
+
+            lag = asyncio.create_task(monitor_lag(stop))
+            start = time.perf_counter()
+            pdfs = await asyncio.gather(*[loop.run_in_executor(executor, render_report, p) for p in payloads])
+            elapsed = time.perf_counter() - start
+            stop.set()
+
+    pages = sum(count_pages(pdf) for pdf in pdfs)
+    return {
+        "workers": workers,
+        "reports": reports,
+        "pages": pages,
+        "seconds": elapsed,
+        "reports_per_s": reports / elapsed,
+        "pages_per_s": pages / elapsed,
+        "max_loop_lag_ms": await lag * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reports", type=int, default=100)
+    parser.add_argument("--documents", type=int, default=12, help="checklist items per report")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'reports':>7} {'pages':>6} {'seconds':>8} {'reports/s':>10} {'pages/s':>8} {'max lag ms':>10}")
+    for workers in args.workers:
+        r = asyncio.run(run(args.reports, workers, args.documents))
+        print(
+            f"{r['workers']:>7} {r['reports']:>7} {r['pages']:>6} {r['seconds']:>8.2f} "
+            f"{r['reports_per_s']:>10.1f} {r['pages_per_s']:>8.1f} {r['max_loop_lag_ms']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Production server settings:
+
+    gunicorn app.main:app -c gunicorn.conf.py
+
+Each worker is a separate process with its own event loop, LLM client, stage
+cache and job queue. LLM_RPM_LIMIT / LLM_TPM_LIMIT apply per worker, so set
+them to the account limits divided by WEB_CONCURRENCY.
+"""
+import os
+import shutil
+import tempfile
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+
+# One worker by default: the job queue, its idempotency aliases, single-flight
+# and queued store writes live in the worker process. With several workers a
+# status poll on another worker reports awaiting_payment, payment verify and
+# the Stripe webhook on different workers each generate the consultation, and
+# a fresh consultation 404s elsewhere until its write is flushed. Requests
+# mostly await the LLM and Stripe, so one async worker serves many at once.
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "app.worker.UvicornWorker"
+
+# Import the app once in the master and fork the workers from it. Clients,
+# pools and background tasks are created per worker in the lifespan.
+preload_app = True
+
+# Uvicorn workers heartbeat from their event loop, so this only restarts a
+# worker whose loop has been blocked this long, not one serving a slow request
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+# Time for in-flight consultations and queued store writes to finish on shutdown
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+accesslog = None
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+# Metrics from all workers are merged through files in this directory. It
+# must be set before prometheus_client is imported, and leftovers from a
+# previous run would be counted again.
+_metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "visa-guru-metrics")
+)
+shutil.rmtree(_metrics_dir, ignore_errors=True)
+os.makedirs(_metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
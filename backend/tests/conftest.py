@@ -0,0 +1,77 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+import uvicorn
+
+from benchmarks.fake_services import FaultProfile, create_app
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class FakeProvider:
+    """
+    benchmarks.fake_services served in-process. Adjust `llm` (latency,
+    error_rate, rate_limit_share) between calls to inject faults.
+    """
+
+    def __init__(self):
+        self.llm = FaultProfile()
+        self.stripe = FaultProfile()
+        self.app = create_app(self.llm, self.stripe)
+        self.server = None
+        self._serving = None
+        self._connect("http://fake", httpx.ASGITransport(app=self.app))
+
+    def _connect(self, base_url: str, transport=None) -> None:
+        self.http = httpx.AsyncClient(transport=transport, base_url=base_url)
+        # Retries are the gateway's job, not the SDK's
+        self.client = openai.AsyncOpenAI(api_key="sk-test", base_url=f"{base_url}/v1", max_retries=0, http_client=self.http)
+
+    async def serve(self) -> None:
+        """
+        Serve over a local socket instead. ASGITransport buffers whole
+        responses, so streamed completions only stream over a connection.
+        """
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=0, lifespan="off", ws="none", log_level="warning"))
+        self._serving = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.01)
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        await self.http.aclose()
+        self._connect(f"http://127.0.0.1:{port}")
+
+    async def close(self) -> None:
+        await self.http.aclose()
+        if self.server is not None:
+            self.server.should_exit = True
+            await self._serving
+
+    def rate_limit_everything(self) -> None:
+        self.llm.error_rate = 1.0
+        self.llm.rate_limit_share = 1.0
+
+    def recover(self) -> None:
+        self.llm.error_rate = 0.0
+
+    async def stats(self) -> dict:
+        return (await self.http.get("/stats")).json()
+
+
+@pytest.fixture
+async def fake_provider():
+    provider = FakeProvider()
+    yield provider
+    await provider.close()
+
+
+@pytest.fixture
+async def served_provider():
+    provider = FakeProvider()
+    await provider.serve()
+    yield provider
+    await provider.close()
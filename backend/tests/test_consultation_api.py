@@ -0,0 +1,142 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import consultation
+from app.models.consultation import ConsultationRequest
+from app.services import consultation_store
+from app.services.ai_service import AIService
+from app.services.cache import ConsultationCache, MemoryCache
+from app.services.consultation_store import InMemoryConsultationRepository
+from app.services.llm_gateway import LLMGateway
+from app.services.visa_rules import get_visa_rules
+
+pytestmark = pytest.mark.anyio
+
+CONCURRENT_REQUESTS = 8
+
+
+def _profile(index: int) -> dict:
+    # Distinct profiles, so neither single-flight nor the stage cache merges them
+    return {
+        "nationality": "India",
+        "current_country": "Canada",
+        "residency_status": "permanent_resident",
+        "destination_country": "Japan",
+        "travel_purpose": "tourism",
+        "travel_dates": "May 2027",
+        "duration": f"{index + 1} weeks",
+        "email": f"applicant{index}@example.com",
+    }
+
+
+@pytest.fixture
+async def api(fake_provider, monkeypatch):
+    service = AIService(client=fake_provider.client, cache=ConsultationCache(MemoryCache()), gateway=LLMGateway())
+    monkeypatch.setattr(consultation, "get_ai_service", lambda: service)
+    monkeypatch.setattr(consultation_store, "_store", InMemoryConsultationRepository())
+    app = FastAPI()
+    app.include_router(consultation.router, prefix="/api")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def _analyze(api, index: int) -> float:
+    start = time.perf_counter()
+    response = await api.post("/api/consultation/analyze", json=_profile(index))
+    assert response.status_code == 200
+    assert response.json()["result"]["cover_letter"].startswith("Dear Visa Officer")
+    return time.perf_counter() - start
+
+
+async def test_concurrent_analyses_overlap(api, fake_provider):
+    # Slow enough that LLM latency, not in-process CPU work, dominates
+    fake_provider.llm.latency_ms = 500
+
+    single = await _analyze(api, 0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(_analyze(api, index) for index in range(1, CONCURRENT_REQUESTS + 1)))
+    elapsed = time.perf_counter() - start
+
+    # N at once take about as long as one, nowhere near N times as long; the
+    # slack covers the app and the fake service sharing this process's CPU
+    assert elapsed < single * 2.5
+    assert (await fake_provider.stats())["chat"] >= 2 * (CONCURRENT_REQUESTS + 1)
+
+
+async def test_batch_shares_stages_between_applicants(api, fake_provider):
+    applicants = [
+        _profile(0),
+        # Same trip as the first applicant: research and both LLM stages are shared
+        {**_profile(0), "email": "partner@example.com"},
+        _profile(1),
+        {**_profile(2), "destination_country": "France"},
+    ]
+
+    response = await api.post("/api/consultation/batch", json={"applicants": applicants})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    start, items, summary = records[0], records[1:-1], records[-1]
+
+    assert start["type"] == "start"
+    assert start["count"] == len(applicants)
+    assert sorted(item["index"] for item in items) == list(range(len(applicants)))
+    for item in items:
+        assert item["type"] == "item"
+        assert item["consultation_id"] == start["consultation_ids"][item["index"]]
+        assert item["status"] == "ok"
+        assert item["stages"] == {"research": "ok", "checklist": "ok", "cover_letter": "ok"}
+        rule = get_visa_rules().lookup(ConsultationRequest(**applicants[item["index"]]))
+        assert item["result"]["sources"] == list(rule.sources)
+    assert summary == {**summary, "type": "summary", "total": 4, "ok": 4, "degraded": 0, "failed": 0}
+
+    # Three distinct profiles, a checklist and a cover letter each
+    assert (await fake_provider.stats())["chat"] == 3 * 2 < len(applicants) * 2
+
+
+async def test_identical_concurrent_analyses_share_one_run(api, fake_provider):
+    fake_provider.llm.latency_ms = 200
+
+    first, second = await asyncio.gather(*(
+        api.post("/api/consultation/analyze", json=_profile(0)) for _ in range(2)
+    ))
+
+    assert first.status_code == second.status_code == 200
+    assert first.json()["consultation_id"] == second.json()["consultation_id"]
+    # One pipeline: a single checklist and cover letter call
+    assert (await fake_provider.stats())["chat"] == 2
+
+
+async def test_failed_analysis_reaches_both_callers_and_is_retried(api, fake_provider, monkeypatch):
+    fake_provider.llm.latency_ms = 200
+    saves = []
+    store = consultation_store.get_consultation_store()
+    save = store.save
+
+    async def failing_save(result):
+        saves.append(result.consultation_id)
+        if len(saves) == 1:
+            raise RuntimeError("disk full")
+        await save(result)
+
+    monkeypatch.setattr(store, "save", failing_save)
+
+    responses = await asyncio.gather(*(
+        api.post("/api/consultation/analyze", json=_profile(0)) for _ in range(2)
+    ))
+
+    assert [response.status_code for response in responses] == [500, 500]
+    assert all("disk full" in response.json()["detail"] for response in responses)
+    assert len(saves) == 1
+
+    # Not remembered: the next identical request runs again
+    retried = await api.post("/api/consultation/analyze", json=_profile(0))
+    assert retried.status_code == 200
+    assert len(saves) == 2
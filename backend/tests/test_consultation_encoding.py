@@ -0,0 +1,122 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import consultation
+from app.compression import CompressionMiddleware
+from app.models.consultation import ConsultationResult, DocumentItem
+from app.services import consultation_store
+from app.services.ai_service import AIService
+from app.services.cache import ConsultationCache, MemoryCache
+from app.services.consultation_store import InMemoryConsultationRepository
+from app.services.llm_gateway import LLMGateway
+
+pytestmark = pytest.mark.anyio
+
+RESULT = ConsultationResult(
+    consultation_id="consultation-1",
+    risk_assessment="Good chance of approval if properly documented.",
+    confidence_score=88,
+    documents_required=[
+        DocumentItem(name="Valid Passport", priority="high", description="Valid for 6 months beyond stay"),
+    ],
+    # Long enough to be compressed
+    cover_letter="Dear Visa Officer,\n\n" + "I am writing to apply for a tourist visa. " * 60,
+    strategic_notes=["Apply early"],
+    sources=["Embassy website"],
+    estimated_processing_time="5-7 business days",
+)
+
+PROFILE = {
+    "nationality": "India",
+    "current_country": "Canada",
+    "residency_status": "permanent_resident",
+    "destination_country": "Japan",
+    "travel_purpose": "tourism",
+    "travel_dates": "May 2027",
+    "duration": "2 weeks",
+    "email": "applicant@example.com",
+}
+
+
+@pytest.fixture
+async def api(fake_provider, monkeypatch):
+    service = AIService(client=fake_provider.client, cache=ConsultationCache(MemoryCache()), gateway=LLMGateway())
+    store = InMemoryConsultationRepository()
+    await store.save(RESULT)
+    monkeypatch.setattr(consultation, "get_ai_service", lambda: service)
+    monkeypatch.setattr(consultation_store, "_store", store)
+    app = FastAPI()
+    app.include_router(consultation.router, prefix="/api")
+    app.add_middleware(CompressionMiddleware, minimum_size=1000)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def test_fields_select_part_of_the_result(api):
+    response = await api.get("/api/consultation/consultation-1", params={"fields": "confidence_score, sources"})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "consultation_id": "consultation-1",
+        "status": "completed",
+        "result": {"consultation_id": "consultation-1", "confidence_score": 88, "sources": ["Embassy website"]},
+    }
+
+
+async def test_analyze_returns_selected_fields(api):
+    response = await api.post("/api/consultation/analyze", params={"fields": "confidence_score"}, json=PROFILE)
+
+    assert response.status_code == 200
+    assert set(response.json()["result"]) == {"consultation_id", "confidence_score"}
+
+
+async def test_unknown_fields_are_rejected(api):
+    response = await api.get("/api/consultation/consultation-1", params={"fields": "sources,secret"})
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Unknown fields: secret"
+
+
+async def test_matching_etag_gets_not_modified(api):
+    first = await api.get("/api/consultation/consultation-1")
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    revalidated = await api.get("/api/consultation/consultation-1", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+
+    # Another selection is another representation
+    partial = await api.get(
+        "/api/consultation/consultation-1", params={"fields": "sources"}, headers={"If-None-Match": etag}
+    )
+    assert partial.status_code == 200
+    assert partial.headers["etag"] != etag
+
+
+@pytest.mark.parametrize("accept, encoding", [("gzip", "gzip"), ("br", "br"), ("gzip, br", "br"), ("identity", None)])
+async def test_response_encoding_is_negotiated(api, accept, encoding):
+    response = await api.get("/api/consultation/consultation-1", headers={"Accept-Encoding": accept})
+
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == encoding
+    assert "Accept-Encoding" in response.headers["vary"]
+    # Decoded by the client
+    assert response.json()["result"]["cover_letter"] == RESULT.cover_letter
+    if encoding is not None:
+        assert int(response.headers["content-length"]) < len(response.content)
+
+
+async def test_small_and_event_stream_responses_are_not_compressed(api):
+    small = await api.get(
+        "/api/consultation/consultation-1", params={"fields": "sources"}, headers={"Accept-Encoding": "gzip, br"}
+    )
+    assert "content-encoding" not in small.headers
+
+    stream = await api.post("/api/consultation/stream", json=PROFILE, headers={"Accept-Encoding": "gzip, br"})
+    assert stream.headers["content-type"].startswith("text/event-stream")
+    assert "content-encoding" not in stream.headers
+    assert "event: result" in stream.text
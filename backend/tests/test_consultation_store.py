@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+from app.models.consultation import ConsultationResult
+from app.services import consultation_store
+from app.services.consultation_store import SQLiteConsultationRepository
+
+pytestmark = pytest.mark.anyio
+
+
+def _result(consultation_id: str) -> ConsultationResult:
+    return ConsultationResult(
+        consultation_id=consultation_id,
+        risk_assessment="Low",
+        confidence_score=80,
+        documents_required=[],
+        cover_letter="Dear Officer",
+        strategic_notes=[],
+        sources=[],
+        estimated_processing_time="5 days",
+    )
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(consultation_store, "WRITE_RETRY_DELAY", 0.01)
+
+
+def _fail_writes(repo: SQLiteConsultationRepository, times: int) -> list:
+    """Make the next `times` batch writes fail as if another process held the lock"""
+    executemany = repo._conn.executemany
+    calls = []
+
+    async def flaky_executemany(sql, rows):
+        calls.append(len(rows))
+        if len(calls) <= times:
+            raise sqlite3.OperationalError("database is locked")
+        return await executemany(sql, rows)
+
+    repo._conn.executemany = flaky_executemany
+    return calls
+
+
+async def _stored_ids(path: str) -> set:
+    reader = SQLiteConsultationRepository(path)
+    await reader.start()
+    async with reader._conn.execute("SELECT consultation_id FROM consultations") as cursor:
+        ids = {row[0] for row in await cursor.fetchall()}
+    await reader.close()
+    return ids
+
+
+async def test_failed_batch_is_retried(tmp_path):
+    path = str(tmp_path / "store.db")
+    repo = SQLiteConsultationRepository(path)
+    await repo.start()
+    calls = _fail_writes(repo, times=3)
+
+    await repo.save(_result("a"))
+    # Readable from memory while the writes keep failing
+    assert (await repo.get("a")).consultation_id == "a"
+
+    while repo._pending:
+        await consultation_store.asyncio.sleep(0.01)
+    assert len(calls) == 4
+    await repo.close()
+    assert await _stored_ids(path) == {"a"}
+
+
+async def test_close_flushes_results_the_writer_gave_up_on(tmp_path):
+    path = str(tmp_path / "store.db")
+    repo = SQLiteConsultationRepository(path)
+    await repo.start()
+    # Every attempt the writer makes while closing fails; close's own flush succeeds
+    _fail_writes(repo, times=consultation_store.CLOSE_WRITE_ATTEMPTS)
+
+    await repo.save(_result("a"))
+    await repo.save(_result("b"))
+    await repo.close()
+
+    assert await _stored_ids(path) == {"a", "b"}
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import consultation
+from app.services import consultation_store
+from app.services.ai_service import AIService, _ChecklistItemParser
+from app.services.cache import ConsultationCache, MemoryCache
+from app.services.consultation_store import InMemoryConsultationRepository
+from app.services.llm_gateway import LLMGateway
+from benchmarks.fake_services import _CHECKLIST
+
+pytestmark = pytest.mark.anyio
+
+PROFILE = {
+    "nationality": "India",
+    "current_country": "Canada",
+    "residency_status": "permanent_resident",
+    "destination_country": "Japan",
+    "travel_purpose": "tourism",
+    "travel_dates": "May 2027",
+    "duration": "2 weeks",
+    "email": "applicant@example.com",
+}
+
+
+@pytest.fixture
+def service(served_provider, monkeypatch) -> AIService:
+    service = AIService(client=served_provider.client, cache=ConsultationCache(MemoryCache()), gateway=LLMGateway())
+    monkeypatch.setattr(consultation, "get_ai_service", lambda: service)
+    monkeypatch.setattr(consultation_store, "_store", InMemoryConsultationRepository())
+    return service
+
+
+@pytest.fixture
+def app(service) -> FastAPI:
+    app = FastAPI()
+    app.include_router(consultation.router, prefix="/api")
+    return app
+
+
+def test_checklist_parser_emits_each_document_once_complete():
+    arguments = json.dumps({"documents": [
+        {"name": "Bank {statements}", "priority": "high", "description": "Quoted \"[3 months]\"", "notes": None},
+        {"name": "Itinerary", "priority": "medium", "description": "Flights and hotels"},
+    ]})
+    parser = _ChecklistItemParser()
+
+    # Fed one character at a time, as small as stream deltas can get
+    emitted = [(index, document.name) for index, char in enumerate(arguments) for document in parser.feed(char)]
+
+    assert [name for _, name in emitted] == ["Bank {statements}", "Itinerary"]
+    assert emitted[0][0] < arguments.index("Itinerary")
+
+
+def _sse_events(text: str) -> list:
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+async def test_stream_sends_documents_as_they_are_generated(app, served_provider):
+    served_provider.llm.latency_ms = 200
+
+    # Buffered by ASGITransport, but the event order is what the server sent
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as api:
+        response = await api.post("/api/consultation/stream", json=PROFILE)
+
+    assert response.status_code == 200
+    events = _sse_events(response.text)
+    names = [event for event, _ in events]
+    assert names[:2] == ["start", "research"]
+    assert names[-1] == "result"
+    documents = [data for event, data in events if event == "document"]
+    assert [document["name"] for document in documents] == [item["name"] for item in _CHECKLIST["documents"]]
+    # Items arrive while the cover letter streams, not in one burst at the end
+    first, last = names.index("document"), len(names) - 1 - names[::-1].index("document")
+    assert "cover_letter" in names[first:last]
+    result = events[-1][1]
+    assert result["documents_required"] == documents
+    assert result["cover_letter"] == "".join(data["delta"] for event, data in events if event == "cover_letter")
+
+
+async def test_stream_stops_generating_when_the_client_disconnects(app, service, served_provider):
+    # A full stream would take two seconds
+    served_provider.llm.latency_ms = 2000
+    disconnected = asyncio.Event()
+    bodies = []
+    messages = [{"type": "http.request", "body": json.dumps(PROFILE).encode(), "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        body = message.get("body", b"")
+        bodies.append(body)
+        if b"event: document" in body:
+            disconnected.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/api/consultation/stream", "raw_path": b"/api/consultation/stream",
+        "query_string": b"", "root_path": "", "client": ("test", 1), "server": ("test", 80),
+        "headers": [(b"host", b"test"), (b"content-type", b"application/json")],
+    }
+
+    start = time.perf_counter()
+    await asyncio.wait_for(app(scope, receive, send), 5)
+
+    assert time.perf_counter() - start < 1.5
+    assert not any(b"event: result" in body for body in bodies)
+    # Both producers were cancelled and gave back their gateway slots
+    assert service.gateway.limiter.in_flight == 0
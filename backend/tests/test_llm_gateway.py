@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import pytest
+
+from app.models.consultation import ConsultationRequest
+from app.services.ai_service import AIService
+from app.services.cache import ConsultationCache, MemoryCache
+from app.services.llm_gateway import AdaptiveLimiter, CircuitBreaker, CircuitOpenError, CircuitState, LLMGateway
+
+pytestmark = pytest.mark.anyio
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def _gateway(**kwargs) -> LLMGateway:
+    kwargs.setdefault("limiter", AdaptiveLimiter(initial=8, minimum=1, maximum=16))
+    kwargs.setdefault("breaker", CircuitBreaker(failure_threshold=100, reset_timeout=30))
+    kwargs.setdefault("max_attempts", 1)
+    return LLMGateway(**kwargs)
+
+
+async def _complete(gateway: LLMGateway, provider, timeout: float = 10.0):
+    return await gateway.call(
+        "checklist",
+        lambda: provider.client.chat.completions.create(model="gpt-4", messages=MESSAGES, timeout=timeout),
+    )
+
+
+async def test_rate_limits_halve_the_concurrency_limit_once_per_window(fake_provider):
+    gateway = _gateway()
+    fake_provider.rate_limit_everything()
+    # Slow enough that the burst's calls are all in flight together
+    fake_provider.llm.latency_ms = 100
+
+    # A burst of 429s from calls started in the same window is one signal
+    results = await asyncio.gather(*(_complete(gateway, fake_provider) for _ in range(4)), return_exceptions=True)
+    assert all(type(r).__name__ == "RateLimitError" for r in results)
+    assert gateway.limiter.limit == 4.0
+
+    # A call started after the decrease can trigger the next one
+    with pytest.raises(Exception):
+        await _complete(gateway, fake_provider)
+    assert gateway.limiter.limit == 2.0
+
+    # Additive increase on success
+    fake_provider.recover()
+    await _complete(gateway, fake_provider)
+    assert gateway.limiter.limit == pytest.approx(2.5)
+    assert gateway.limiter.in_flight == 0
+
+
+async def test_retry_waits_at_least_retry_after(fake_provider):
+    # No exponential backoff: any wait comes from the 429's retry-after-ms (250 ms)
+    gateway = _gateway(max_attempts=2, backoff_base=0.0)
+    fake_provider.rate_limit_everything()
+
+    start = time.perf_counter()
+    with pytest.raises(Exception):
+        await _complete(gateway, fake_provider)
+    elapsed = time.perf_counter() - start
+
+    assert 0.25 <= elapsed < 1.0
+    assert (await fake_provider.stats())["chat"] == 2
+
+
+async def test_breaker_opens_then_probes_half_open(fake_provider):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    gateway = _gateway(breaker=breaker)
+    fake_provider.rate_limit_everything()
+
+    for _ in range(2):
+        with pytest.raises(Exception):
+            await _complete(gateway, fake_provider)
+    assert breaker.state == CircuitState.OPEN
+
+    # Open: fails fast without reaching the provider
+    calls = (await fake_provider.stats())["chat"]
+    with pytest.raises(CircuitOpenError):
+        await _complete(gateway, fake_provider)
+    assert (await fake_provider.stats())["chat"] == calls
+
+    # After the reset timeout one slow probe goes through; others still fail fast
+    await asyncio.sleep(0.25)
+    fake_provider.recover()
+    fake_provider.llm.latency_ms = 200
+    probe = asyncio.create_task(_complete(gateway, fake_provider))
+    await asyncio.sleep(0.05)
+    assert breaker.state == CircuitState.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        await _complete(gateway, fake_provider)
+
+    await probe
+    assert breaker.state == CircuitState.CLOSED
+
+
+async def test_failed_probe_reopens_the_circuit(fake_provider):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    gateway = _gateway(breaker=breaker)
+    fake_provider.rate_limit_everything()
+
+    with pytest.raises(Exception):
+        await _complete(gateway, fake_provider)
+    await asyncio.sleep(0.15)
+    with pytest.raises(Exception):
+        await _complete(gateway, fake_provider)
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(CircuitOpenError):
+        await _complete(gateway, fake_provider)
+
+
+async def test_checklist_fails_fast_to_the_static_checklist(fake_provider):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    gateway = _gateway(breaker=breaker)
+    service = AIService(client=fake_provider.client, cache=ConsultationCache(MemoryCache()), gateway=gateway)
+    request = ConsultationRequest(
+        nationality="India",
+        current_country="Canada",
+        residency_status="permanent_resident",
+        destination_country="Japan",
+        travel_purpose="tourism",
+        travel_dates="May 2027",
+        duration="2 weeks",
+        email="applicant@example.com",
+    )
+
+    fake_provider.rate_limit_everything()
+    first = await service.generate_document_checklist(request, {})
+    assert breaker.state == CircuitState.OPEN
+
+    start = time.perf_counter()
+    second = await service.generate_document_checklist(request, {})
+    assert time.perf_counter() - start < 0.1
+
+    expected = [document.name for document in service._static_documents(request)]
+    assert [document.name for document in first] == expected
+    assert [document.name for document in second] == expected
+    assert len(expected) > 1
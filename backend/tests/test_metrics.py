@@ -0,0 +1,16 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from app.api import metrics
+
+
+def test_metrics_content_type_has_one_charset():
+    app = FastAPI()
+    app.include_router(metrics.router, prefix="/api")
+
+    response = TestClient(app).get("/api/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE_LATEST
+    assert response.headers["content-type"].count("charset") == 1
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import time
+
+import httpx
+import openai
+import pytest
+
+from app.models.consultation import ConsultationRequest
+from app.services import ai_service
+from app.services.ai_service import AIService
+from app.services.cache import ConsultationCache
+from app.services.llm_gateway import CircuitBreaker, LLMGateway
+from app.services.model_router import ModelRouter
+
+pytestmark = pytest.mark.anyio
+
+REQUEST = ConsultationRequest(
+    nationality="India",
+    current_country="Canada",
+    residency_status="permanent_resident",
+    destination_country="Japan",
+    travel_purpose="tourism",
+    travel_dates="May 2027",
+    duration="2 weeks",
+    email="applicant@example.com",
+)
+
+
+class TimingOutClient:
+    """
+    Chat client in front of the fake provider: models in `slow` hang until
+    their timeout and then raise like the SDK does
+    """
+
+    def __init__(self, provider, slow):
+        self.provider = provider
+        self.slow = set(slow)
+        self.calls = []
+        self.chat = self
+        self.completions = self
+
+    async def create(self, model, timeout, **kwargs):
+        self.calls.append((model, timeout))
+        if model in self.slow:
+            await asyncio.sleep(timeout)
+            raise openai.APITimeoutError(request=httpx.Request("POST", "http://fake/v1/chat/completions"))
+        return await self.provider.client.chat.completions.create(model=model, timeout=timeout, **kwargs)
+
+
+@pytest.fixture
+def stage_budget(monkeypatch):
+    monkeypatch.setitem(ai_service.STAGE_TIMEOUTS, "cover_letter", 1.8)
+    return 1.8
+
+
+def _service(tmp_path, client) -> AIService:
+    routes = tmp_path / "routes.json"
+    routes.write_text(json.dumps({"routes": {"cover_letter": {"standard": {
+        "model": "primary", "fallback": "fallback", "timeout": 0.3,
+    }}}}))
+    gateway = LLMGateway(breaker=CircuitBreaker(failure_threshold=100), max_attempts=3, backoff_base=0.0)
+    return AIService(client=client, cache=ConsultationCache(None), gateway=gateway, router=ModelRouter(str(routes)))
+
+
+async def test_fallback_gets_the_rest_of_the_stage_budget(tmp_path, fake_provider, stage_budget):
+    client = TimingOutClient(fake_provider, slow={"primary"})
+    service = _service(tmp_path, client)
+
+    letter = await asyncio.wait_for(service.generate_cover_letter(REQUEST, {}), stage_budget)
+
+    assert letter.startswith("Dear Visa Officer")
+    (primary, primary_timeout), (fallback, fallback_timeout) = client.calls
+    assert (primary, fallback) == ("primary", "fallback")
+    assert primary_timeout == 0.3
+    assert 0 < fallback_timeout <= stage_budget - primary_timeout - ai_service.FALLBACK_BUDGET_MARGIN
+
+
+async def test_slow_fallback_times_out_inside_the_stage(tmp_path, fake_provider, stage_budget):
+    client = TimingOutClient(fake_provider, slow={"primary", "fallback"})
+    service = _service(tmp_path, client)
+
+    start = time.perf_counter()
+    # Not cancelled by the stage timeout: the fallback's own timeout fires first
+    letter = await asyncio.wait_for(service.generate_cover_letter(REQUEST, {}), stage_budget)
+
+    assert time.perf_counter() - start < stage_budget - ai_service.FALLBACK_BUDGET_MARGIN + 0.2
+    assert "could not be generated" in letter
+    # Timeouts of the fallback are not retried
+    assert [model for model, _ in client.calls] == ["primary", "fallback"]
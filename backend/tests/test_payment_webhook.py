@@ -0,0 +1,109 @@
+import hashlib
+import hmac
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import payment
+from app.services import consultation_store
+from app.services.consultation_store import InMemoryConsultationRepository
+from app.services.job_queue import JobPriority
+from app.settings import Settings
+
+pytestmark = pytest.mark.anyio
+
+WEBHOOK_SECRET = "whsec_test"
+
+
+def _sign(payload: bytes, secret: str = WEBHOOK_SECRET) -> str:
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+@pytest.fixture
+def fulfilled(monkeypatch):
+    """
+    Consultations queued by the webhook, with an in-memory store for events
+    """
+    queued = []
+
+    async def enqueue_consultation(consultation_id, priority, aliases):
+        queued.append((consultation_id, priority, list(aliases)))
+        return payment.Job(consultation_id, None, priority=priority)
+
+    monkeypatch.setattr(payment, "enqueue_consultation", enqueue_consultation)
+    monkeypatch.setattr(consultation_store, "_store", InMemoryConsultationRepository())
+    return queued
+
+
+@pytest.fixture
+async def api(monkeypatch):
+    monkeypatch.setattr(payment, "get_settings", lambda: Settings(stripe_webhook_secret=WEBHOOK_SECRET))
+    app = FastAPI()
+    app.include_router(payment.router, prefix="/api")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def _completed_event(fake_provider, event_id: str = "evt_1") -> bytes:
+    # The checkout session as the Stripe stub returns it
+    session = (await fake_provider.http.post("/v1/checkout/sessions", data={
+        "customer_email": "applicant@example.com",
+        "metadata[consultation_id]": "consultation-1",
+    })).json()
+    return json.dumps({
+        "id": event_id,
+        "object": "event",
+        "type": "checkout.session.completed",
+        "data": {"object": session},
+    }).encode()
+
+
+async def _deliver(api, payload: bytes, signature: str) -> httpx.Response:
+    return await api.post("/api/payment/webhook", content=payload, headers={"stripe-signature": signature})
+
+
+async def test_completed_checkout_is_fulfilled(api, fake_provider, fulfilled):
+    payload = await _completed_event(fake_provider)
+
+    response = await _deliver(api, payload, _sign(payload))
+
+    assert response.status_code == 200
+    assert response.json() == {"received": True}
+    session_id = json.loads(payload)["data"]["object"]["id"]
+    assert fulfilled == [("consultation-1", JobPriority.PAID, [session_id])]
+
+
+async def test_redelivered_event_is_processed_once(api, fake_provider, fulfilled):
+    payload = await _completed_event(fake_provider)
+
+    first = await _deliver(api, payload, _sign(payload))
+    second = await _deliver(api, payload, _sign(payload))
+
+    assert first.json() == {"received": True}
+    assert second.json() == {"received": True, "duplicate": True}
+    assert len(fulfilled) == 1
+
+
+async def test_bad_signature_is_rejected(api, fake_provider, fulfilled):
+    payload = await _completed_event(fake_provider)
+
+    response = await _deliver(api, payload, _sign(payload, secret="whsec_other"))
+
+    assert response.status_code == 400
+    assert fulfilled == []
+    assert not await consultation_store.get_consultation_store().has_event("evt_1")
+
+
+async def test_unconfigured_secret_is_service_unavailable(api, fake_provider, fulfilled, monkeypatch):
+    monkeypatch.setattr(payment, "get_settings", lambda: Settings())
+    payload = await _completed_event(fake_provider)
+
+    response = await _deliver(api, payload, _sign(payload))
+
+    assert response.status_code == 503
+    assert fulfilled == []
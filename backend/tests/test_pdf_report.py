@@ -0,0 +1,41 @@
+import xml.etree.ElementTree as ET
+
+from app.models.consultation import ConsultationResult, DocumentItem
+from app.services.pdf_report import _environment, _inner_markup, render_report, TEMPLATE_NAME
+
+MARKUP_LIKE = '<script>alert(1)</script> <i>unbalanced & <a href="https://evil.example">link</a>'
+
+
+def _result(**overrides) -> dict:
+    fields = dict(
+        consultation_id="abc-123",
+        risk_assessment=MARKUP_LIKE,
+        confidence_score=72,
+        documents_required=[
+            DocumentItem(name=MARKUP_LIKE, priority="high", description="<b>bold?", notes="</i> stray"),
+        ],
+        cover_letter=f"Dear Officer,\n\n{MARKUP_LIKE}\nline two <br>\n\nSincerely",
+        strategic_notes=[MARKUP_LIKE],
+        sources=["<font size=40>big</font>"],
+        estimated_processing_time="5 <days>",
+    )
+    fields.update(overrides)
+    return ConsultationResult(**fields).model_dump()
+
+
+def test_markup_like_user_text_renders():
+    pdf = render_report(_result())
+    assert pdf.startswith(b"%PDF")
+
+
+def test_user_text_is_escaped_and_template_tags_kept():
+    markup = _environment().get_template(TEMPLATE_NAME).render(result=_result(), generated_on="today")
+    root = ET.fromstring(markup)
+    details = root.findall("table")[1].findall("row")[1].findall("cell")[2]
+
+    inner = _inner_markup(details)
+    assert inner == "&lt;b&gt;bold?<br/><i>&lt;/i&gt; stray</i>"
+
+    risk = _inner_markup(root.find("table").findall("row")[0].findall("cell")[1])
+    assert "<a" not in risk and "<script>" not in risk
+    assert "&lt;a href=" in risk
@@ -0,0 +1,121 @@
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+from app.models.consultation import ConsultationRequest
+from app.services.preview_engine import build_table
+from app.services.scoring import (
+    CONFIDENCE_CEILING,
+    CONFIDENCE_FLOOR,
+    RESIDENCY_STATUSES,
+    TRAVEL_PURPOSES,
+    ScoringModel,
+)
+from app.services.visa_rules import get_visa_rules
+
+# 152 approvals in 210 applications: an overall rate of 0.7238
+OUTCOMES = {
+    "version": "test-1",
+    "columns": ["nationality", "destination_country", "purpose", "applications", "approvals"],
+    "rows": [
+        ["India", "Japan", "tourism", 100, 90],
+        ["Mexico", "Japan", "tourism", 100, 60],
+        ["India", "France", "business", 10, 2],
+    ],
+}
+
+
+def _request(**overrides) -> ConsultationRequest:
+    profile = {
+        "nationality": "India",
+        "current_country": "Canada",
+        "residency_status": "student",
+        "destination_country": "Japan",
+        "travel_purpose": "tourism",
+        "travel_dates": "May 2027",
+        "duration": "2 weeks",
+        "email": "applicant@example.com",
+    }
+    return ConsultationRequest(**{**profile, **overrides})
+
+
+@pytest.fixture
+def weights_only() -> ScoringModel:
+    return ScoringModel(get_visa_rules())
+
+
+@pytest.fixture
+def model(tmp_path) -> ScoringModel:
+    outcomes = tmp_path / "outcomes.json"
+    outcomes.write_text(json.dumps(OUTCOMES))
+    return ScoringModel(get_visa_rules(), outcomes_path=str(outcomes))
+
+
+def test_known_profile_scores(model, weights_only):
+    # base 75 + student 0 + tourism 5
+    assert weights_only.score(_request()) == 80
+    # India -> Japan approves (90 + 50 * 0.7238) / 150 = 0.8413: +12 points
+    assert model.base_rate(("india", "japan", "tourism")) == pytest.approx(0.8413, abs=1e-4)
+    assert model.score(_request()) == 92
+    assert model.score(_request(previous_rejections=True)) == 72
+    assert model.version == "2/2026.10.1/test-1"
+
+
+def test_scores_and_rates_stay_in_range(model):
+    requests = [
+        _request(residency_status=status, travel_purpose=purpose, previous_rejections=rejected, nationality=nationality)
+        for status, purpose, rejected, nationality in itertools.product(
+            RESIDENCY_STATUSES, TRAVEL_PURPOSES, (False, True), ("India", "Mexico", "Chile")
+        )
+    ]
+
+    scores = model.score_many(requests)
+
+    assert scores.min() >= CONFIDENCE_FLOOR
+    assert scores.max() <= CONFIDENCE_CEILING
+    # The vectorized and scalar paths agree
+    assert scores.tolist() == [model.score(request) for request in requests]
+    assert all(0.0 <= rate <= 1.0 for rate in model._base_rates.values())
+
+
+def test_bands_are_ordered(model):
+    keys = [
+        ("india", "japan", "tourism"),
+        ("mexico", "japan", "tourism"),
+        ("india", "france", "business"),
+        ("chile", "peru", "study"),
+    ]
+
+    bands = model.bands(keys)
+
+    assert bands.shape == (len(keys), 2, 2)
+    # Low end at most the high end, and previous rejections never score higher
+    assert np.all(bands[:, :, 0] <= bands[:, :, 1])
+    assert np.all(bands[:, 1, :] <= bands[:, 0, :])
+
+
+def test_unknown_corridor_falls_back(model, weights_only):
+    # Unknown nationality: the destination and purpose aggregate
+    japan_tourism = (90 + 60 + 50 * model.overall_rate) / 250
+    assert model.base_rate(("chile", "japan", "tourism")) == pytest.approx(japan_tourism)
+
+    # Nothing recorded for the purpose either: the overall rate, so no adjustment
+    unknown = _request(nationality="Chile", destination_country="Peru", travel_purpose="study")
+    assert model.base_rate(model.corridor_key(unknown)) == pytest.approx(152 / 210)
+    assert model.corridor_adjustment(model.corridor_key(unknown)) == 0.0
+    assert model.score(unknown) == weights_only.score(unknown)
+    assert weights_only.base_rate(model.corridor_key(unknown)) is None
+
+
+def test_preview_table_bands_match_scores(model):
+    table = build_table(get_visa_rules(), model)
+
+    assert table["scoring_version"] == model.version
+    for nationality, destination, purpose, *_, band, band_with_rejections in table["corridors"]:
+        assert CONFIDENCE_FLOOR <= band[0] <= band[1] <= CONFIDENCE_CEILING
+        assert band_with_rejections[1] <= band[1]
+    corridor = next(row for row in table["corridors"] if row[:3] == ["india", "japan", "tourism"])
+    # The student's 92 is the low end; citizens score 95 at the ceiling
+    assert corridor[6] == [92, 95]
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_leader_failure_reaches_every_waiter_and_is_not_kept():
+    flight = SingleFlight("test")
+    runs = 0
+    release = asyncio.Event()
+
+    async def fail():
+        nonlocal runs
+        runs += 1
+        await release.wait()
+        raise RuntimeError("provider down")
+
+    waiters = [asyncio.ensure_future(flight.do("key", fail)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert flight.in_flight == 1
+    release.set()
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+
+    assert runs == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len({id(result) for result in results}) == 1
+    assert flight.in_flight == 0
+
+    # The failure is not cached: the next caller runs the work again
+    async def succeed():
+        nonlocal runs
+        runs += 1
+        return "ok"
+
+    assert await flight.do("key", succeed) == "ok"
+    assert runs == 2
+
+
+async def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "done"
+
+    leader = asyncio.ensure_future(flight.do("key", work))
+    follower = asyncio.ensure_future(flight.do("key", work))
+    await asyncio.sleep(0)
+    leader.cancel()
+    release.set()
+
+    assert await follower == "done"
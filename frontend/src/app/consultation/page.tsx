@@ -40,7 +40,7 @@ export default function ConsultationPage() {
       
       // Then proceed to payment
       const checkoutResponse = await api.createCheckoutSession({
-        consultation_id: 'temp-' + Date.now(),
+        consultation_id: preview.consultation_id,
         email: formData.email!
       });
       
@@ -32,7 +32,7 @@ export const api = {
   
   // Consultation endpoints
   previewConsultation: (request: object) =>
-    apiRequest('/api/consultation/preview', {
+    apiRequest<{ consultation_id: string; preview: object }>('/api/consultation/preview', {
       method: 'POST',
       body: JSON.stringify(request),
     }),
@@ -43,8 +43,12 @@ export const api = {
       body: JSON.stringify(request),
     }),
   
-  getConsultation: (consultationId: string) =>
-    apiRequest(`/api/consultation/${consultationId}`),
+  // Pass `fields` to fetch only part of the result, e.g. ['documents_required']
+  getConsultation: (consultationId: string, fields?: string[]) =>
+    apiRequest(`/api/consultation/${consultationId}${fields?.length ? `?fields=${fields.join(',')}` : ''}`),
+  
+  getConsultationStatus: (consultationId: string) =>
+    apiRequest<{ consultation_id: string; status: string }>(`/api/consultation/${consultationId}/status`),
   
   // Payment endpoints
   createCheckoutSession: (data: { consultation_id: string; email: string }) =>